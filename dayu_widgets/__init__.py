@@ -1,4 +1,5 @@
 # Import built-in modules
+import importlib
 import os
 
 
@@ -12,62 +13,64 @@ dayu_theme = MTheme("dark", primary_color=MTheme.orange)
 # dayu_theme.default_size = dayu_theme.small
 # dayu_theme = MTheme('light')
 
-# Import local modules
-from dayu_widgets.alert import MAlert
-from dayu_widgets.avatar import MAvatar
-from dayu_widgets.badge import MBadge
-from dayu_widgets.breadcrumb import MBreadcrumb
-from dayu_widgets.browser import MClickBrowserFilePushButton
-from dayu_widgets.browser import MClickBrowserFileToolButton
-from dayu_widgets.browser import MClickBrowserFolderPushButton
-from dayu_widgets.browser import MClickBrowserFolderToolButton
-from dayu_widgets.browser import MDragFileButton
-from dayu_widgets.browser import MDragFolderButton
-from dayu_widgets.button_group import MCheckBoxGroup
-from dayu_widgets.button_group import MPushButtonGroup
-from dayu_widgets.button_group import MRadioButtonGroup
-from dayu_widgets.button_group import MToolButtonGroup
-from dayu_widgets.card import MCard
-from dayu_widgets.card import MMeta
-from dayu_widgets.carousel import MCarousel
-from dayu_widgets.check_box import MCheckBox
-from dayu_widgets.collapse import MCollapse
-from dayu_widgets.combo_box import MComboBox
-from dayu_widgets.divider import MDivider
-from dayu_widgets.field_mixin import MFieldMixin
-from dayu_widgets.flow_layout import MFlowLayout
-from dayu_widgets.item_model import MSortFilterModel
-from dayu_widgets.item_model import MTableModel
-from dayu_widgets.item_view import MBigView
-from dayu_widgets.item_view import MListView
-from dayu_widgets.item_view import MTableView
-from dayu_widgets.item_view import MTreeView
-from dayu_widgets.item_view_full_set import MItemViewFullSet
-from dayu_widgets.item_view_set import MItemViewSet
-from dayu_widgets.label import MLabel
-from dayu_widgets.line_edit import MLineEdit
-from dayu_widgets.line_tab_widget import MLineTabWidget
-from dayu_widgets.loading import MLoading
-from dayu_widgets.loading import MLoadingWrapper
-from dayu_widgets.menu import MMenu
-from dayu_widgets.menu_tab_widget import MMenuTabWidget
-from dayu_widgets.message import MMessage
-from dayu_widgets.page import MPage
-from dayu_widgets.progress_bar import MProgressBar
-from dayu_widgets.progress_circle import MProgressCircle
-from dayu_widgets.push_button import MPushButton
-from dayu_widgets.radio_button import MRadioButton
-from dayu_widgets.slider import MSlider
-from dayu_widgets.spin_box import MDateEdit
-from dayu_widgets.spin_box import MDateTimeEdit
-from dayu_widgets.spin_box import MDoubleSpinBox
-from dayu_widgets.spin_box import MSpinBox
-from dayu_widgets.spin_box import MTimeEdit
-from dayu_widgets.switch import MSwitch
-from dayu_widgets.tab_widget import MTabWidget
-from dayu_widgets.text_edit import MTextEdit
-from dayu_widgets.toast import MToast
-from dayu_widgets.tool_button import MToolButton
+# 控件在第一次用到时才导入，只用到部分控件时启动更快
+_LAZY_IMPORT_DICT = {
+    "MAlert": "dayu_widgets.alert",
+    "MAvatar": "dayu_widgets.avatar",
+    "MBadge": "dayu_widgets.badge",
+    "MBreadcrumb": "dayu_widgets.breadcrumb",
+    "MClickBrowserFilePushButton": "dayu_widgets.browser",
+    "MClickBrowserFileToolButton": "dayu_widgets.browser",
+    "MClickBrowserFolderPushButton": "dayu_widgets.browser",
+    "MClickBrowserFolderToolButton": "dayu_widgets.browser",
+    "MDragFileButton": "dayu_widgets.browser",
+    "MDragFolderButton": "dayu_widgets.browser",
+    "MCheckBoxGroup": "dayu_widgets.button_group",
+    "MPushButtonGroup": "dayu_widgets.button_group",
+    "MRadioButtonGroup": "dayu_widgets.button_group",
+    "MToolButtonGroup": "dayu_widgets.button_group",
+    "MCard": "dayu_widgets.card",
+    "MMeta": "dayu_widgets.card",
+    "MCarousel": "dayu_widgets.carousel",
+    "MCheckBox": "dayu_widgets.check_box",
+    "MCollapse": "dayu_widgets.collapse",
+    "MComboBox": "dayu_widgets.combo_box",
+    "MDivider": "dayu_widgets.divider",
+    "MFieldMixin": "dayu_widgets.field_mixin",
+    "MFlowLayout": "dayu_widgets.flow_layout",
+    "MSortFilterModel": "dayu_widgets.item_model",
+    "MTableModel": "dayu_widgets.item_model",
+    "MBigView": "dayu_widgets.item_view",
+    "MListView": "dayu_widgets.item_view",
+    "MTableView": "dayu_widgets.item_view",
+    "MTreeView": "dayu_widgets.item_view",
+    "MItemViewFullSet": "dayu_widgets.item_view_full_set",
+    "MItemViewSet": "dayu_widgets.item_view_set",
+    "MLabel": "dayu_widgets.label",
+    "MLineEdit": "dayu_widgets.line_edit",
+    "MLineTabWidget": "dayu_widgets.line_tab_widget",
+    "MLoading": "dayu_widgets.loading",
+    "MLoadingWrapper": "dayu_widgets.loading",
+    "MMenu": "dayu_widgets.menu",
+    "MMenuTabWidget": "dayu_widgets.menu_tab_widget",
+    "MMessage": "dayu_widgets.message",
+    "MPage": "dayu_widgets.page",
+    "MProgressBar": "dayu_widgets.progress_bar",
+    "MProgressCircle": "dayu_widgets.progress_circle",
+    "MPushButton": "dayu_widgets.push_button",
+    "MRadioButton": "dayu_widgets.radio_button",
+    "MSlider": "dayu_widgets.slider",
+    "MDateEdit": "dayu_widgets.spin_box",
+    "MDateTimeEdit": "dayu_widgets.spin_box",
+    "MDoubleSpinBox": "dayu_widgets.spin_box",
+    "MSpinBox": "dayu_widgets.spin_box",
+    "MTimeEdit": "dayu_widgets.spin_box",
+    "MSwitch": "dayu_widgets.switch",
+    "MTabWidget": "dayu_widgets.tab_widget",
+    "MTextEdit": "dayu_widgets.text_edit",
+    "MToast": "dayu_widgets.toast",
+    "MToolButton": "dayu_widgets.tool_button",
+}
 
 
 __all__ = [
@@ -127,3 +130,16 @@ __all__ = [
     "MToast",
     "MToolButton",
 ]
+
+
+def __getattr__(name):
+    module_name = _LAZY_IMPORT_DICT.get(name)
+    if module_name is None:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_IMPORT_DICT))
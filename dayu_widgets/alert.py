@@ -88,7 +88,7 @@ class MAlert(QtWidgets.QWidget):
         self._icon_label.set_dayu_image(
             MPixmap(
                 "{}_fill.svg".format(self._dayu_type),
-                vars(dayu_theme).get(self._dayu_type + "_color"),
+                dayu_theme.get(self._dayu_type + "_color"),
             )
         )
         self.style().polish(self)
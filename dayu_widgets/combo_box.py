@@ -60,6 +60,8 @@ class MComboBox(MComboBoxSearchMixin, QtWidgets.QComboBox):
 
         self._root_menu = None
         self._display_formatter = utils.display_formatter
+        # QApplication 设置了样式表时，下面的 setEditable 就会 polish 并读取 dayu_size
+        self._dayu_size = dayu_theme.default_size
         self.setEditable(True)
         line_edit = self.lineEdit()
         line_edit.setReadOnly(True)
@@ -71,7 +73,6 @@ class MComboBox(MComboBoxSearchMixin, QtWidgets.QComboBox):
         self.set_value("")
         self.set_placeholder(self.tr("Please Select"))
         self.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
-        self._dayu_size = dayu_theme.default_size
         dayu_theme.apply(self)
 
     def get_dayu_size(self):
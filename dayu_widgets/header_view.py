@@ -7,6 +7,7 @@ from qtpy import QtGui
 from qtpy import QtWidgets
 
 # Import local modules
+from dayu_widgets.item_model import MColumnarData
 from dayu_widgets.menu import MMenu
 import dayu_widgets.utils as utils
 
@@ -78,15 +79,19 @@ class MHeaderView(QtWidgets.QHeaderView):
         for row in range(current_model.rowCount()):
             real_index = utils.real_index(current_model.index(row, column))
             data_obj = real_index.internalPointer()
-            if state is None:
+            # 列式存储的所有行共用一个 MColumnarData，要按行号读写
+            if isinstance(data_obj, MColumnarData):
+                old_state = data_obj.get_value(real_index.row(), attr)
+            else:
                 old_state = utils.get_obj_value(data_obj, attr)
-                utils.set_obj_value(
-                    data_obj,
-                    attr,
-                    QtCore.Qt.Unchecked if old_state == QtCore.Qt.Checked else QtCore.Qt.Checked,
-                )
+            if state is None:
+                new_state = QtCore.Qt.Unchecked if old_state == QtCore.Qt.Checked else QtCore.Qt.Checked
+            else:
+                new_state = state
+            if isinstance(data_obj, MColumnarData):
+                data_obj.set_value(real_index.row(), attr, new_state)
             else:
-                utils.set_obj_value(data_obj, attr, state)
+                utils.set_obj_value(data_obj, attr, new_state)
         source_model.endResetModel()
         source_model.dataChanged.emit(None, None)
 
@@ -1,12 +1,16 @@
 # Import built-in modules
+import collections
+import collections.abc
 import re
+import threading
+import time
 
 # Import third-party modules
 from qtpy import QtCore
 from qtpy import QtGui
 
 # Import local modules
-from dayu_widgets.utils import apply_formatter
+from dayu_widgets.utils import compile_formatter
 from dayu_widgets.utils import display_formatter
 from dayu_widgets.utils import font_formatter
 from dayu_widgets.utils import get_obj_value
@@ -14,6 +18,9 @@ from dayu_widgets.utils import icon_formatter
 from dayu_widgets.utils import set_obj_value
 
 
+# MBigView 异步加载缩略图时，用这个 role 取图片的路径
+THUMBNAIL_ROLE = QtCore.Qt.UserRole + 1
+
 SETTING_MAP = {
     QtCore.Qt.BackgroundRole: {"config": "bg_color", "formatter": QtGui.QColor},
     QtCore.Qt.DisplayRole: {"config": "display", "formatter": display_formatter},
@@ -42,52 +49,541 @@ SETTING_MAP = {
         "formatter": lambda args: QtCore.QSize(*args),
     },
     QtCore.Qt.UserRole: {"config": "data"},  # anything
+    THUMBNAIL_ROLE: {"config": "thumbnail"},
 }
 
 
+_FEED_PENDING = object()
+_CACHE_MISS = object()
+CacheInfo = collections.namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+def is_async_iterator(obj):
+    """Return whether the given object can be consumed with `async for`."""
+    return isinstance(obj, collections.abc.AsyncIterator) or hasattr(obj, "__anext__")
+
+
+class _AsyncIteratorFeed(object):
+    """
+    Drain an async iterator into a thread-safe queue, so MTableModel can pull it like a normal iterator.
+    If an asyncio loop is running in the current thread (eg. qasync), consume it with a task on that loop,
+    otherwise consume it with a private loop in a daemon thread.
+    next() returns _FEED_PENDING when nothing has arrived yet,
+    and raises the exception of the async iterator after the items got before it.
+    """
+
+    def __init__(self, async_iterator):
+        super(_AsyncIteratorFeed, self).__init__()
+        self._queue = collections.deque()
+        self._finished = False
+        self._cancelled = False
+        self._error = None
+        self._task = None
+        # Import built-in modules
+        # asyncio 导入比较慢，用到时才导入
+        import asyncio
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            # 事件循环只保留 task 的弱引用，要自己持有，否则可能被回收
+            self._task = loop.create_task(self._consume(async_iterator))
+        else:
+            thread = threading.Thread(target=asyncio.run, args=(self._consume(async_iterator),))
+            thread.daemon = True
+            thread.start()
+
+    async def _consume(self, async_iterator):
+        try:
+            async for item in async_iterator:
+                if self._cancelled:
+                    break
+                self._queue.append(item)
+        except Exception as error:
+            # 在主线程的 next() 中再抛出
+            self._error = error
+        finally:
+            self._finished = True
+
+    def cancel(self):
+        self._cancelled = True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return self._queue.popleft()
+        except IndexError:
+            if self._finished and not self._queue:
+                if self._error is not None:
+                    error, self._error = self._error, None
+                    raise error
+                raise StopIteration
+            return _FEED_PENDING
+
+
+# 即使 header 中没有配置，这些 role 也要返回数据
+DEFAULT_ROLE_LIST = (QtCore.Qt.DisplayRole, QtCore.Qt.EditRole, QtCore.Qt.ToolTipRole)
+
+
+def _make_accessor(attr, formatter_from_config, formatter_from_model):
+    config_func = compile_formatter(formatter_from_config)
+    if formatter_from_model is None:
+        return lambda data_obj: config_func(get_obj_value(data_obj, attr), data_obj)
+    model_func = compile_formatter(formatter_from_model)
+    return lambda data_obj: model_func(config_func(get_obj_value(data_obj, attr), data_obj))
+
+
+def _make_check_state_accessor(attr):
+    checked_attr = "{}_checked".format(attr)
+
+    def accessor(data_obj):
+        state = get_obj_value(data_obj, checked_attr)
+        return QtCore.Qt.Unchecked if state is None else state
+
+    return accessor
+
+
+def _make_columnar_accessor(attr, formatter_from_config, formatter_from_model):
+    config_func = compile_formatter(formatter_from_config)
+    model_func = compile_formatter(formatter_from_model)
+    if callable(formatter_from_config):
+        # 回调函数需要整行数据，只有这种情况才构造行字典
+        return lambda column_data, row: model_func(
+            config_func(column_data.get_value(row, attr), column_data.get_row(row))
+        )
+    return lambda column_data, row: model_func(config_func(column_data.get_value(row, attr), None))
+
+
+def _make_columnar_check_state_accessor(attr):
+    checked_attr = "{}_checked".format(attr)
+
+    def accessor(column_data, row):
+        state = column_data.get_value(row, checked_attr)
+        return QtCore.Qt.Unchecked if state is None else state
+
+    return accessor
+
+
+def compile_column_accessors(attr_dict, columnar=False):
+    """
+    Compile the header setting of one column into a dict {role: accessor}.
+    The accessor takes the row data object and return the result for that role,
+    which equals to the result of applying the header formatter and the SETTING_MAP formatter.
+    Roles that have nothing to show for this column are not in the dict.
+    If columnar is True, the accessor takes (MColumnarData, row) instead.
+    """
+    attr = attr_dict.get("key")
+    make_accessor = _make_columnar_accessor if columnar else _make_accessor
+    result = {}
+    for role, setting in SETTING_MAP.items():
+        formatter_from_config = attr_dict.get(setting.get("config"))  # header中该role的配置
+        if not formatter_from_config and role not in DEFAULT_ROLE_LIST:
+            # 如果header中没有配置该role，而且也不是 DisplayRole/EditRole，直接返回None
+            continue
+        result[role] = make_accessor(attr, formatter_from_config, setting.get("formatter", None))
+    if attr_dict.get("checkable", False):
+        make_check_state_accessor = (
+            _make_columnar_check_state_accessor if columnar else _make_check_state_accessor
+        )
+        result[QtCore.Qt.CheckStateRole] = make_check_state_accessor(attr)
+    return result
+
+
+class MColumnarData(object):
+    """
+    Struct-of-arrays storage for flat tabular data, used by MTableModel.set_data_columns.
+    Each column is a sequence, eg. list, array.array or numpy.ndarray, all columns have the same length.
+    Compared with a list of dict, there is no dict and no _parent key for each row,
+    so it takes much less memory, especially when the columns are array.array or numpy.ndarray.
+    """
+
+    def __init__(self, columns):
+        super(MColumnarData, self).__init__()
+        self.columns = dict(columns)
+        length_set = {len(column) for column in self.columns.values()}
+        if len(length_set) > 1:
+            raise ValueError("All the columns should have the same length, but get {}".format(sorted(length_set)))
+        self._length = length_set.pop() if length_set else 0
+
+    def __len__(self):
+        return self._length
+
+    def get_value(self, row, key, default=None):
+        column = self.columns.get(key)
+        if column is None:
+            return default
+        return column[row]
+
+    def set_value(self, row, key, value):
+        column = self.columns.get(key)
+        if column is None:
+            column = self.columns[key] = [None] * self._length
+        column[row] = value
+
+    def get_row(self, row):
+        """Build a dict for the given row."""
+        return {key: column[row] for key, column in self.columns.items()}
+
+    def make_columns(self, row_list):
+        """
+        Convert the rows to a dict of {key: values} in the type of each column, for extend_columns.
+        It raises before any data is changed when a value does not fit the column, eg. None in an int array.
+        :param row_list: list of dict or object
+        :return: dict
+        """
+        value_dict = {}
+        for key, column in self.columns.items():
+            value_list = [get_obj_value(row_obj, key) for row_obj in row_list]
+            if hasattr(column, "typecode"):
+                # array.array
+                value_list = type(column)(column.typecode, value_list)
+            elif hasattr(column, "dtype"):
+                # numpy.ndarray 的构造函数的参数是 shape，要用 asarray 转换，并保持原来的 dtype
+                # Import third-party modules
+                import numpy
+
+                value_list = numpy.asarray(value_list, dtype=column.dtype)
+            value_dict[key] = value_list
+        return value_dict
+
+    def extend_columns(self, value_dict):
+        """Append the rows converted by make_columns."""
+        count = 0
+        for key, column in self.columns.items():
+            value_list = value_dict[key]
+            count = len(value_list)
+            if hasattr(column, "extend"):
+                column.extend(value_list)
+            elif hasattr(column, "dtype"):
+                # Import third-party modules
+                import numpy
+
+                self.columns[key] = numpy.concatenate([column, value_list])
+            else:
+                # tuple 等不能原地扩充的类型
+                self.columns[key] = type(column)(list(column) + list(value_list))
+        self._length += count
+
+    def extend(self, row_list):
+        """Append rows, each row is a dict or an object."""
+        self.extend_columns(self.make_columns(row_list))
+
+    def find_row(self, row_dict):
+        """Return the first row with the same values as row_dict, eg. a row got from get_row. -1 if not found."""
+        for row in range(self._length):
+            if all(row_dict.get(key) == column[row] for key, column in self.columns.items()):
+                return row
+        return -1
+
+    def remove(self, row):
+        """Remove the given row."""
+        for key, column in self.columns.items():
+            if hasattr(column, "dtype"):
+                # Import third-party modules
+                import numpy
+
+                self.columns[key] = numpy.delete(column, row)
+            elif isinstance(column, tuple):
+                self.columns[key] = column[:row] + column[row + 1 :]
+            else:
+                # list 和 array.array
+                del column[row]
+        self._length -= 1
+
+
 class MTableModel(QtCore.QAbstractItemModel):
     def __init__(self, parent=None):
         super(MTableModel, self).__init__(parent)
         self.origin_count = 0
         self.root_item = {"name": "root", "children": []}
         self.data_generator = None
+        self._row_map = {}  # id(item) -> row of the item in its parent's children
+        self.fetch_count = 5000
+        self.fetch_time_budget = 8  # ms of work in each event loop turn when streaming an iterator
         self.header_list = []
+        self._accessor_list = []
+        self._columnar_accessor_list = []
+        self._column_data = None
+        self._cache_size = 0
+        self._value_cache = collections.OrderedDict()  # (id(data_obj), column, role) -> value
+        self._cache_hits = 0
+        self._cache_misses = 0
         self.timer = QtCore.QTimer(self)
         self.timer.timeout.connect(self.fetchMore)
+        # 先于 view 连接，数据变化后 view 重绘之前就清掉过期的缓存
+        self.modelReset.connect(self._slot_clear_value_cache)
+        self.layoutChanged.connect(self._slot_clear_value_cache)
+        self.dataChanged.connect(self._slot_data_changed)
 
     def set_header_list(self, header_list):
+        """
+        Set the header setting list, and compile the role accessors of each column.
+        Call it again after changing the header setting.
+        """
         self.header_list = header_list
+        self._accessor_list = [compile_column_accessors(attr_dict) for attr_dict in header_list]
+        self._columnar_accessor_list = [compile_column_accessors(attr_dict, True) for attr_dict in header_list]
+        self._value_cache.clear()
+
+    def set_cache_size(self, size):
+        """
+        Enable the LRU cache of the formatted cell values when size > 0.
+        Useful when the formatters are expensive, eg. icon/font formatter.
+        The cache is invalidated by remove, and when the model emits modelReset, layoutChanged or dataChanged,
+        so if the data is changed without these signals, call clear_cache.
+        :param size: max count of the cached cell values, 0 to disable
+        :return: None
+        """
+        self._cache_size = max(0, size)
+        self.clear_cache()
+
+    def clear_cache(self):
+        self._value_cache.clear()
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+    def cache_info(self):
+        """Return the hits, misses, maxsize and currsize of the cell value cache, like functools.lru_cache."""
+        return CacheInfo(self._cache_hits, self._cache_misses, self._cache_size, len(self._value_cache))
+
+    @QtCore.Slot()
+    def _slot_clear_value_cache(self, *args):
+        self._value_cache.clear()
+
+    @QtCore.Slot(QtCore.QModelIndex, QtCore.QModelIndex)
+    def _slot_data_changed(self, top_left, bottom_right, *args):
+        if not self._value_cache:
+            return
+        if not top_left.isValid() or not bottom_right.isValid():
+            # 例如 dataChanged.emit(None, None)，不知道改了哪些行
+            self._value_cache.clear()
+            return
+        parent_index = top_left.parent()
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            data_obj = self.index(row, 0, parent_index).internalPointer()
+            self._invalidate_cache(data_obj, row if data_obj is self._column_data else None)
+
+    def _invalidate_cache(self, data_obj, row=None):
+        if not self._value_cache:
+            return
+        # 列式存储用行号作为缓存的 key
+        row_key = id(data_obj) if row is None else row
+        for column, accessor_dict in enumerate(self._accessor_list):
+            for role in accessor_dict:
+                self._value_cache.pop((row_key, column, role), None)
+
+    def set_fetch_time_budget(self, msec):
+        """Set the max milliseconds spent on pulling an iterator in each event loop turn."""
+        self.fetch_time_budget = msec
 
     def set_data_list(self, data_list):
-        if hasattr(data_list, "next"):
+        """
+        Set the data of the model.
+        Support list, iterator/generator (eg. a database cursor) and async iterator.
+        Iterators are drained in background slices of fetch_time_budget ms, rows are inserted in batch.
+        """
+        self._stop_feed()
+        self._column_data = None
+        if is_async_iterator(data_list) or isinstance(data_list, collections.abc.Iterator):
             self.beginResetModel()
             self.root_item["children"] = []
+            self._row_map = {}
             self.endResetModel()
-            self.data_generator = data_list
             self.origin_count = 0
-            self.timer.start()
+            if is_async_iterator(data_list):
+                # 异步数据没到之前不需要空转，每帧检查一次即可
+                self.data_generator = _AsyncIteratorFeed(data_list)
+                self.timer.start(16)
+            else:
+                self.data_generator = data_list
+                self.timer.start(0)
         else:
             self.beginResetModel()
             self.root_item["children"] = data_list if data_list is not None else []
+            self._row_map = {}
+            self._register_children(self.root_item)
             self.endResetModel()
-            self.data_generator = None
+
+    def set_data_columns(self, columns):
+        """
+        Set flat tabular data in columnar layout, instead of a list of dict.
+        eg. set_data_columns({"name": ["a", "b"], "frame": array.array("q", [1001, 1002])})
+        Use array.array or numpy.ndarray columns to cut the memory of large tables.
+        The header setting works the same, callable formatters get a dict of the row as the data object.
+        :param columns: dict of {key: sequence}
+        :return: None
+        """
+        self._stop_feed()
+        self.beginResetModel()
+        self._column_data = MColumnarData(columns)
+        self.root_item["children"] = self._column_data
+        self._row_map = {}
+        self.endResetModel()
+
+    def get_data_obj(self, index):
+        """Get the data object of the given source index. For columnar data, a dict of the row."""
+        data_obj = index.internalPointer()
+        if data_obj is not None and data_obj is self._column_data:
+            return data_obj.get_row(index.row())
+        return data_obj
+
+    def get_row_key(self, row, parent_index=None):
+        """
+        Return a hashable key of the row object, which keeps the same when other rows are inserted or removed.
+        Used by MSortFilterModel to index the rows without creating QModelIndex.
+        """
+        if parent_index is not None and parent_index.isValid():
+            parent_item = parent_index.internalPointer()
+        elif self._column_data is not None:
+            return row
+        else:
+            parent_item = self.root_item
+        return id(get_obj_value(parent_item, "children")[row])
+
+    def _register_children(self, parent_item, start=0):
+        """Write the _parent back-pointer and record the row of every descendant from the start row."""
+        stack = [(parent_item, start)]
+        while stack:
+            parent_item, start = stack.pop()
+            children_list = get_obj_value(parent_item, "children")
+            if not isinstance(children_list, list):
+                continue
+            for row in range(start, len(children_list)):
+                child_item = children_list[row]
+                if not child_item:
+                    continue
+                set_obj_value(child_item, "_parent", parent_item)
+                self._row_map[id(child_item)] = row
+                stack.append((child_item, 0))
+
+    def _unregister_item(self, item):
+        stack = [item]
+        while stack:
+            item = stack.pop()
+            self._row_map.pop(id(item), None)
+            self._invalidate_cache(item)
+            children_list = get_obj_value(item, "children")
+            if isinstance(children_list, list):
+                stack.extend(children_list)
+
+    def _get_row(self, parent_list, item):
+        row = self._row_map.get(id(item))
+        if row is None or row >= len(parent_list) or parent_list[row] is not item:
+            # 数据被外部修改过，回退到线性查找，并更新缓存
+            row = parent_list.index(item)
+            self._row_map[id(item)] = row
+        return row
+
+    def _stop_feed(self):
+        if isinstance(self.data_generator, _AsyncIteratorFeed):
+            self.data_generator.cancel()
+        self.data_generator = None
+        self.timer.stop()
 
     def clear(self):
+        self._stop_feed()
+        self._column_data = None
         self.beginResetModel()
         self.root_item["children"] = []
+        self._row_map = {}
         self.endResetModel()
 
     def get_data_list(self):
         return self.root_item["children"]
 
     def append(self, data_dict):
-        self.root_item["children"].append(data_dict)
-        self.fetchMore()
+        self.append_many([data_dict])
+
+    def append_many(self, data_list):
+        """
+        Append rows to the root item with a single beginInsertRows/endInsertRows pair.
+        Selection, scroll position and the sort state of the views are kept.
+        :param data_list: any iterable of row objects
+        :return: None
+        """
+        data_list = list(data_list)
+        if not data_list:
+            return
+        children_list = self.root_item["children"]
+        start = len(children_list)
+        if children_list is self._column_data:
+            # 先转换好每一列的数据，数据不合法时在 beginInsertRows 之前就报错
+            value_dict = self._column_data.make_columns(data_list)
+        self.beginInsertRows(QtCore.QModelIndex(), start, start + len(data_list) - 1)
+        if children_list is self._column_data:
+            self._column_data.extend_columns(value_dict)
+        else:
+            children_list.extend(data_list)
+            self._register_children(self.root_item, start)
+        self.endInsertRows()
+
+    def get_sort_key_list(self, column, parent_index=None, row_list=None):
+        """
+        Get the sort keys of the rows by the "sort_key" header setting of the column, used by MSortFilterModel.
+        The keys are extracted once from the raw data, instead of calling data() with the formatters
+        for every comparison. "sort_key" can be True to sort by the raw value, or a callable(value, data_obj).
+        :param column: int
+        :param parent_index: QModelIndex of the parent, None for the top level rows
+        :param row_list: the rows to get the keys of, None for all the children of the parent
+        :return: list of the sort key of each row in row_list, None if the column has no sort_key
+        """
+        if not 0 <= column < len(self.header_list):
+            return None
+        sort_key = self.header_list[column].get("sort_key")
+        if not sort_key:
+            return None
+        attr = self.header_list[column].get("key")
+        if parent_index is not None and parent_index.isValid():
+            children_list = get_obj_value(parent_index.internalPointer(), "children") or []
+        else:
+            children_list = self.root_item["children"]
+        if row_list is None:
+            row_list = range(len(children_list))
+        if children_list is self._column_data:
+            column_data = self._column_data.columns.get(attr)
+            if column_data is None:
+                column_data = [None] * len(children_list)
+            elif hasattr(column_data, "tolist"):
+                # array.array 和 numpy.ndarray 转成 python 的数字，get_sort_key 才能识别
+                if row_list is None:
+                    column_data = column_data.tolist()
+                else:
+                    column_data = {row: column_data[row : row + 1].tolist()[0] for row in row_list}
+            if sort_key is True:
+                return [get_sort_key(column_data[row]) for row in row_list]
+            return [sort_key(column_data[row], self._column_data.get_row(row)) for row in row_list]
+        if sort_key is True:
+            return [get_sort_key(get_obj_value(children_list[row], attr)) for row in row_list]
+        return [sort_key(get_obj_value(children_list[row], attr), children_list[row]) for row in row_list]
 
     def remove(self, data_dict):
-        row = self.root_item["children"].index(data_dict)
+        """
+        Remove the top level row of data_dict.
+        For columnar data, data_dict is a dict of the row, eg. from get_data_obj, the first row with the same values
+        is removed.
+        """
+        if self._column_data is not None:
+            row = self._column_data.find_row(data_dict)
+            if row < 0:
+                raise ValueError("{} is not in the columnar data".format(data_dict))
+            self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+            self._column_data.remove(row)
+            # 列式存储用行号作为缓存的 key，后面的行号都变了
+            self._value_cache.clear()
+            self.endRemoveRows()
+            return
+        children_list = self.root_item["children"]
+        row = self._get_row(children_list, data_dict)
         self.beginRemoveRows(QtCore.QModelIndex(), row, row)
-        self.root_item["children"].remove(data_dict)
+        del children_list[row]
+        self._unregister_item(data_dict)
+        # 后面的兄弟节点行号都前移了一位
+        for sibling_row in range(row, len(children_list)):
+            self._row_map[id(children_list[sibling_row])] = sibling_row
         self.endRemoveRows()
 
     def flags(self, index):
@@ -120,12 +616,20 @@ class MTableModel(QtCore.QAbstractItemModel):
             parent_item = parent_index.internalPointer()
         else:
             parent_item = self.root_item
+            if self._column_data is not None:
+                # 列式存储没有行对象，所有的 index 都指向同一个 MColumnarData
+                if 0 <= row < len(self._column_data):
+                    return self.createIndex(row, column, self._column_data)
+                return QtCore.QModelIndex()
 
         children_list = get_obj_value(parent_item, "children")
         if children_list and len(children_list) > row:
             child_item = children_list[row]
             if child_item:
-                set_obj_value(child_item, "_parent", parent_item)
+                # _parent 在加载数据时就写好了，这里只处理外部直接修改了数据的情况
+                if get_obj_value(child_item, "_parent") is not parent_item:
+                    set_obj_value(child_item, "_parent", parent_item)
+                    self._row_map[id(child_item)] = row
                 return self.createIndex(row, column, child_item)
         return QtCore.QModelIndex()
 
@@ -143,7 +647,7 @@ class MTableModel(QtCore.QAbstractItemModel):
         if grand_item is None:
             return QtCore.QModelIndex()
         parent_list = get_obj_value(grand_item, "children")
-        return self.createIndex(parent_list.index(parent_item), 0, parent_item)
+        return self.createIndex(self._get_row(parent_list, parent_item), 0, parent_item)
 
     def rowCount(self, parent_index=None):
         if parent_index and parent_index.isValid():
@@ -151,7 +655,7 @@ class MTableModel(QtCore.QAbstractItemModel):
         else:
             parent_item = self.root_item
         children_obj = get_obj_value(parent_item, "children")
-        if hasattr(children_obj, "next") or (children_obj is None):
+        if isinstance(children_obj, collections.abc.Iterator) or (children_obj is None):
             return 0
         else:
             return len(children_obj)
@@ -164,7 +668,7 @@ class MTableModel(QtCore.QAbstractItemModel):
         children_obj = get_obj_value(parent_data, "children")
         if children_obj is None:
             return False
-        if hasattr(children_obj, "next"):
+        if isinstance(children_obj, collections.abc.Iterator):
             return True
         else:
             return len(children_obj)
@@ -173,58 +677,77 @@ class MTableModel(QtCore.QAbstractItemModel):
         return len(self.header_list)
 
     def canFetchMore(self, index):
-        try:
-            if self.data_generator:
-                data = self.data_generator.next()
-                self.root_item["children"].append(data)
-                return True
-            return False
-        except StopIteration:
-            if self.timer.isActive():
-                self.timer.stop()
+        if index is not None and index.isValid():
             return False
+        return self.data_generator is not None
 
     def fetchMore(self, index=None):
-        self.beginResetModel()
-        self.endResetModel()
+        if self.data_generator is None:
+            return
+        # 在 fetch_time_budget 毫秒内，最多取 fetch_count 条，合并成一次插入，保证界面流畅
+        batch = []
+        deadline = time.perf_counter() + self.fetch_time_budget / 1000.0
+        try:
+            for _ in range(self.fetch_count):
+                data = next(self.data_generator)
+                if data is _FEED_PENDING:
+                    break
+                batch.append(data)
+                if time.perf_counter() > deadline:
+                    break
+        except StopIteration:
+            self._stop_feed()
+        except Exception:
+            # 迭代器出错时停止加载，否则定时器会一直调用 fetchMore，已经取出的行照常插入
+            self._stop_feed()
+            raise
+        finally:
+            self.append_many(batch)
 
     def data(self, index, role=QtCore.Qt.DisplayRole):
         if not index.isValid():
             return None
 
-        attr_dict = self.header_list[index.column()]  # 获取该列字段的配置
+        # 每一列每一种 role 的取值函数在 set_header_list 时已经编译好了
+        column = index.column()
         data_obj = index.internalPointer()
-        attr = attr_dict.get("key")
-        if role in SETTING_MAP.keys():
-            role_key = SETTING_MAP[role].get("config")  # role 配置的关键字
-            formatter_from_config = attr_dict.get(role_key)  # header中该role的配置
-            if not formatter_from_config and role not in [
-                QtCore.Qt.DisplayRole,
-                QtCore.Qt.EditRole,
-                QtCore.Qt.ToolTipRole,
-            ]:
-                # 如果header中没有配置该role，而且也不是 DisplayRole/EditRole，直接返回None
-                return None
-            else:
-                value = apply_formatter(
-                    formatter_from_config,
-                    get_obj_value(data_obj, attr),
-                    data_obj
-                )
-            formatter_from_model = SETTING_MAP[role].get("formatter", None)  # role 配置的转换函数
-            result = apply_formatter(formatter_from_model, value)
-            return result
-
-        if role == QtCore.Qt.CheckStateRole and attr_dict.get("checkable", False):
-            state = get_obj_value(data_obj, attr + "_checked")
-            return QtCore.Qt.Unchecked if state is None else state
-        return None
+        if data_obj is self._column_data:
+            accessor = self._columnar_accessor_list[column].get(role)
+            args = (data_obj, index.row())
+            row_key = index.row()
+        else:
+            accessor = self._accessor_list[column].get(role)
+            args = (data_obj,)
+            row_key = id(data_obj)
+        if accessor is None:
+            return None
+        if not self._cache_size:
+            return accessor(*args)
+
+        cache_key = (row_key, column, role)
+        value = self._value_cache.get(cache_key, _CACHE_MISS)
+        if value is not _CACHE_MISS:
+            self._value_cache.move_to_end(cache_key)
+            self._cache_hits += 1
+            return value
+        self._cache_misses += 1
+        value = accessor(*args)
+        self._value_cache[cache_key] = value
+        if len(self._value_cache) > self._cache_size:
+            self._value_cache.popitem(last=False)
+        return value
 
     def setData(self, index, value, role=QtCore.Qt.EditRole):
         if index.isValid() and role in [QtCore.Qt.CheckStateRole, QtCore.Qt.EditRole]:
             attr_dict = self.header_list[index.column()]
             key = attr_dict.get("key")
             data_obj = index.internalPointer()
+            if data_obj is self._column_data:
+                if role == QtCore.Qt.CheckStateRole and attr_dict.get("checkable", False):
+                    key += "_checked"
+                data_obj.set_value(index.row(), key, value)
+                self.dataChanged.emit(index, index)
+                return True
             if role == QtCore.Qt.CheckStateRole and attr_dict.get("checkable", False):
                 key += "_checked"
                 # 更新自己
@@ -264,53 +787,564 @@ class MTableModel(QtCore.QAbstractItemModel):
             return False
 
 
+REGEX_SPECIAL_CHARS = frozenset(".^$*+?{}[]\\|()")
+
+
+def is_plain_text(pattern):
+    """Return whether the pattern has no regex special characters, so it can be matched by substring."""
+    return not REGEX_SPECIAL_CHARS.intersection(pattern)
+
+
+ASYNC_SLICE_TIME = 0.008  # seconds of work on the GUI thread in each event loop turn
+
+
+def match_row(value_list, search_text, search_reg, search_column_list, filter_list):
+    """
+    Return whether the row matches the search and the column filters.
+    :param value_list: display data of every column
+    :param search_text: lower case plain text to search, None when not searching plain text
+    :param search_reg: compiled regex to search, None when not searching with regex
+    :param search_column_list: the searchable columns
+    :param filter_list: [(column, compiled regex)] of the column filters
+    :return: bool
+    """
+    # 如果search 栏有内容 先匹配 search 栏的内容
+    if search_text is not None:
+        for column in search_column_list:
+            value = value_list[column]
+            if value is not None and search_text in str(value).lower():
+                break
+        else:
+            return False
+    elif search_reg:
+        for column in search_column_list:
+            value = value_list[column]
+            if value is not None and search_reg.search(str(value)) is not None:
+                # 搜索匹配上了
+                break
+        else:
+            # 全部搜索完毕，没有一个匹配，直接返回 False
+            return False
+
+    # 再去匹配 filter 组合
+    for column, reg_exp in filter_list:
+        value = value_list[column]
+        if value is not None and not reg_exp.search(str(value)):
+            # 不符合筛选，直接返回 False
+            return False
+    return True
+
+
+def get_sort_key(value):
+    """Sort key of the display data, numbers before text, None first."""
+    if value is None:
+        return 0, 0
+    if isinstance(value, (int, float)):
+        return 1, value
+    return 2, str(value)
+
+
+class MFilterSortWorker(QtCore.QThread):
+    """
+    Compute the accepted rows and the sort keys of a snapshot in a worker thread, used by MSortFilterModel.
+    The snapshot is a list of (row_key, display data of every column, lower case search text) of the top level rows.
+    """
+
+    sig_progress = QtCore.Signal(int, int)
+    sig_result = QtCore.Signal(int, object)
+
+    def __init__(
+        self,
+        generation,
+        snapshot,
+        search_text,
+        search_reg,
+        search_column_list,
+        filter_list,
+        sort_column,
+        parent=None,
+    ):
+        super(MFilterSortWorker, self).__init__(parent)
+        self.generation = generation
+        self._snapshot = snapshot
+        self._search_text = search_text
+        self._search_reg = search_reg
+        self._search_column_list = search_column_list
+        self._filter_list = filter_list
+        self._sort_column = sort_column
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        accepted = None
+        row_count = len(self._snapshot)
+        if self._search_text is not None or self._search_reg or self._filter_list:
+            accepted = set()
+            progress = 0
+            for row, (row_key, value_list, search_text) in enumerate(self._snapshot):
+                if row % 2000 == 0:
+                    if self._cancelled:
+                        return
+                    # 进度有变化时才发信号，避免大量跨线程的信号
+                    if row * 90 // row_count != progress:
+                        progress = row * 90 // row_count
+                        self.sig_progress.emit(self.generation, progress)
+                if self._search_text is not None:
+                    if self._search_text not in search_text:
+                        continue
+                    search_reg = None
+                else:
+                    search_reg = self._search_reg
+                if match_row(value_list, None, search_reg, self._search_column_list, self._filter_list):
+                    accepted.add(row_key)
+
+        sort_key_list = None
+        if self._sort_column >= 0:
+            if self._cancelled:
+                return
+            # 只取出排序用的值，排序要由 proxy 在主线程完成
+            column = self._sort_column
+            sort_key_list = [get_sort_key(value_list[column]) for _, value_list, _ in self._snapshot]
+        if not self._cancelled:
+            self.sig_result.emit(self.generation, (accepted, sort_key_list))
+
+
 class MSortFilterModel(QtCore.QSortFilterProxyModel):
+    sig_loading_changed = QtCore.Signal(bool)
+    sig_progress = QtCore.Signal(int)
+
     def __init__(self, parent=None):
         super(MSortFilterModel, self).__init__(parent)
         if hasattr(self, "setRecursiveFilteringEnabled"):
             self.setRecursiveFilteringEnabled(True)
+        self._source_has_children = True
         self.header_list = []
         self.search_reg = None
+        self.search_text = None  # 不含正则特殊字符时，直接用小写的子串匹配
         # self.search_reg.setCaseSensitivity(QtCore.Qt.CaseInsensitive)
         # self.search_reg.setPatternSyntax(QtCore.QRegExp.Wildcard)
+        self._search_column_list = []
+        self._filter_list = []  # [(column, reg)]
+        # 搜索索引，row key -> [每一列的显示数据, 可搜索列的小写显示文字合并成的字符串, 上次搜索的文字, 上次是否匹配]
+        self._text_index = {}
+        # 设置了 sort_key 的列每一行的排序值，column 或 (column, id(parent item)) -> list，见 lessThan
+        self._sort_key_dict = {}
+        self._sort_key_enabled = False
+
+        self._async_enabled = False
+        self._async_generation = 0
+        self._async_accepted = None  # 异步模式下，通过筛选的顶层行的 row key
+        self._async_sort = (-1, QtCore.Qt.AscendingOrder)
+        self._async_sort_pending = False
+        self._async_loading = False
+        self._async_progress = 0
+        self._snapshot = []
+        self._worker_list = []
+        self._snapshot_timer = QtCore.QTimer(self)
+        self._snapshot_timer.timeout.connect(self._slot_build_snapshot)
+        self._async_delay_timer = QtCore.QTimer(self)
+        self._async_delay_timer.setSingleShot(True)
+        self._async_delay_timer.setInterval(200)
+        self._async_delay_timer.timeout.connect(self._start_async_job)
+
+    def setSourceModel(self, source_model):
+        old_model = self.sourceModel()
+        if source_model is old_model:
+            return
+        self._sort_key_enabled = isinstance(source_model, MTableModel)
+        # 丢掉旧 model 还没完成的后台任务和结果
+        self._cancel_async_job()
+        self._set_async_loading(False)
+        self._async_accepted = None
+        self._async_sort_pending = False
+        if old_model is not None:
+            old_model.modelReset.disconnect(self._slot_source_reset)
+            old_model.layoutChanged.disconnect(self._slot_source_layout_changed)
+            old_model.dataChanged.disconnect(self._slot_source_data_changed)
+            old_model.rowsInserted.disconnect(self._slot_source_rows_changed)
+            old_model.rowsAboutToBeRemoved.disconnect(self._slot_source_rows_changed)
+        self.clear_search_index()
+        if source_model is not None:
+            # 要在 QSortFilterProxyModel 处理这些信号之前更新索引，所以先连接
+            source_model.modelReset.connect(self._slot_source_reset)
+            source_model.layoutChanged.connect(self._slot_source_layout_changed)
+            source_model.dataChanged.connect(self._slot_source_data_changed)
+            source_model.rowsInserted.connect(self._slot_source_rows_changed)
+            source_model.rowsAboutToBeRemoved.connect(self._slot_source_rows_changed)
+        super(MSortFilterModel, self).setSourceModel(source_model)
+        self._update_recursive_filtering()
 
     def set_header_list(self, header_list):
         self.header_list = header_list
         for head in self.header_list:
             head.update({"reg": None})
+        self._search_column_list = [
+            column for column, data_dict in enumerate(self.header_list) if data_dict.get("searchable", False)
+        ]
+        self._filter_list = []
+        self.clear_search_index()
+
+    @QtCore.Slot()
+    def clear_search_index(self):
+        """Clear the search index and the sort keys, call it after changing the source data without signals."""
+        self._text_index = {}
+        self._sort_key_dict = {}
+        self._update_recursive_filtering()
+
+    @QtCore.Slot()
+    def _slot_source_reset(self):
+        self.clear_search_index()
+        if self._is_async():
+            if self._async_accepted is not None:
+                # 新数据的结果还没算出来之前，先都不显示
+                self._async_accepted = set()
+            self._schedule_async_job()
+
+    @QtCore.Slot()
+    def _slot_source_layout_changed(self, *args):
+        self.clear_search_index()
+        if self._is_async():
+            self._async_accepted = None if self._async_accepted is None else set()
+            self._schedule_async_job()
+
+    def _update_recursive_filtering(self, start=0):
+        """
+        Recursive filtering makes Qt walk the children of every rejected row,
+        which costs a lot when narrowing the search of a flat table. So only enable it when there are children.
+        """
+        model = self.sourceModel()
+        if not hasattr(self, "setRecursiveFilteringEnabled") or not isinstance(model, MTableModel):
+            return
+        data_list = model.get_data_list()
+        if start == 0:
+            has_children = not isinstance(data_list, MColumnarData) and any(
+                get_obj_value(data_obj, "children") for data_obj in data_list
+            )
+        elif self._source_has_children or isinstance(data_list, MColumnarData):
+            # 列式存储没有子节点
+            return
+        else:
+            has_children = any(get_obj_value(data_list[row], "children") for row in range(start, len(data_list)))
+        if has_children != self._source_has_children:
+            self._source_has_children = has_children
+            self.setRecursiveFilteringEnabled(has_children)
+
+    def _get_row_key(self, source_row, source_parent):
+        model = self.sourceModel()
+        if isinstance(model, MTableModel):
+            return model.get_row_key(source_row, source_parent)
+        # 其他 model 的兄弟行可能共用同一个 internalPointer（例如 QStandardItemModel），用持久索引区分每一行
+        return QtCore.QPersistentModelIndex(model.index(source_row, 0, source_parent))
+
+    def _get_sort_cache_key(self, column, parent_item):
+        # 没有子节点时所有的行都在顶层，只用 column 作为 key，比较时不用再取 parent
+        return (column, id(parent_item)) if self._source_has_children else column
+
+    def _update_sort_keys(self, top_left, bottom_right):
+        """Extract the sort keys of the changed rows again, instead of all the rows when sorting next time."""
+        if not self._sort_key_dict:
+            return
+        model = self.sourceModel()
+        if not top_left.isValid() or not bottom_right.isValid() or not isinstance(model, MTableModel):
+            self._sort_key_dict = {}
+            return
+        parent_index = top_left.parent()
+        parent_item = parent_index.internalPointer() if parent_index.isValid() else model.root_item
+        row_list = range(top_left.row(), bottom_right.row() + 1)
+        for cache_key, key_list in list(self._sort_key_dict.items()):
+            column = cache_key[0] if self._source_has_children else cache_key
+            if key_list is None or cache_key != self._get_sort_cache_key(column, parent_item):
+                continue
+            new_key_list = model.get_sort_key_list(column, parent_index, row_list)
+            if new_key_list is None:
+                # 异步模式下后台线程按显示的数据取出的值，这里没法只更新改了的行
+                self._sort_key_dict.pop(cache_key)
+            else:
+                key_list[row_list.start : row_list.stop] = new_key_list
+
+    def lessThan(self, source_left, source_right):
+        if not self._sort_key_enabled:
+            return super(MSortFilterModel, self).lessThan(source_left, source_right)
+        # 设置了 sort_key 的列，比较预先取出的排序值，不用每次比较都调用 data() 和 formatter
+        if self._source_has_children:
+            cache_key = (source_left.column(), id(get_obj_value(source_left.internalPointer(), "_parent")))
+        else:
+            cache_key = source_left.column()
+        key_list = self._sort_key_dict.get(cache_key, _CACHE_MISS)
+        if key_list is _CACHE_MISS:
+            key_list = self.sourceModel().get_sort_key_list(source_left.column(), source_left.parent())
+            self._sort_key_dict[cache_key] = key_list
+        if key_list is None:
+            return super(MSortFilterModel, self).lessThan(source_left, source_right)
+        return key_list[source_left.row()] < key_list[source_right.row()]
+
+    @QtCore.Slot(QtCore.QModelIndex, QtCore.QModelIndex)
+    def _slot_source_data_changed(self, top_left, bottom_right, *args):
+        # 要在 QSortFilterProxyModel 按新的数据重新排序之前更新
+        self._update_sort_keys(top_left, bottom_right)
+        if not top_left.parent().isValid() and self._is_async():
+            self._schedule_async_job()
+        if not self._text_index:
+            return
+        if not top_left.isValid() or not bottom_right.isValid():
+            # 例如 dataChanged.emit(None, None)，不知道改了哪些行
+            self._text_index = {}
+            return
+        parent_index = top_left.parent()
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            self._text_index.pop(self._get_row_key(row, parent_index), None)
+
+    @QtCore.Slot(QtCore.QModelIndex, int, int)
+    def _slot_source_rows_changed(self, parent_index, first, last):
+        model = self.sourceModel()
+        # 行号变了，重新取出排序用的值
+        self._sort_key_dict = {}
+        if not parent_index.isValid():
+            self._update_recursive_filtering(first)
+            columnar = isinstance(model, MTableModel) and isinstance(model.get_data_list(), MColumnarData)
+            if columnar and last + 1 < model.rowCount():
+                # 列式存储用行号作为 row key，删除中间的行后，后面的行号都变了
+                self.clear_search_index()
+                if self._async_accepted is not None:
+                    self._async_accepted = set()
+            if self._is_async():
+                self._schedule_async_job()
+        if not self._text_index:
+            return
+        row_list = [(row, parent_index) for row in range(first, last + 1)]
+        while row_list:
+            row, parent_index = row_list.pop()
+            self._text_index.pop(self._get_row_key(row, parent_index), None)
+            source_index = model.index(row, 0, parent_index)
+            row_list.extend((child_row, source_index) for child_row in range(model.rowCount(source_index)))
+
+    def _get_row_text(self, source_row, source_parent):
+        """Return the index entry of the row, build it when the row is not indexed yet."""
+        row_key = self._get_row_key(source_row, source_parent)
+        result = self._text_index.get(row_key)
+        if result is None:
+            model = self.sourceModel()
+            value_list = [
+                model.data(model.index(source_row, column, source_parent)) for column in range(len(self.header_list))
+            ]
+            # 可搜索列的文字合并成一个字符串，子串搜索只需要一次 in 操作
+            search_text = "\0".join(
+                str(value_list[column]).lower()
+                for column in self._search_column_list
+                if value_list[column] is not None
+            )
+            result = [value_list, search_text, None, False]
+            self._text_index[row_key] = result
+        return result
 
     def filterAcceptsRow(self, source_row, source_parent):
+        if not self.search_reg and not self._filter_list:
+            return True
+        if self._async_accepted is not None and not source_parent.isValid():
+            # 异步模式下，顶层的行直接使用后台线程计算好的结果
+            return self._get_row_key(source_row, source_parent) in self._async_accepted
+        row_entry = self._get_row_text(source_row, source_parent)
+
         # 如果search 栏有内容 先匹配 search 栏的内容
-        if self.search_reg:
-            for index, data_dict in enumerate(self.header_list):
-                if data_dict.get("searchable", False):
-                    model_index = self.sourceModel().index(source_row, index, source_parent)
-                    value = self.sourceModel().data(model_index)
-                    if value is not None and self.search_reg.search(str(value)) is not None:
-                        # 搜索匹配上了
-                        break
-            else:
-                # 全部搜索完毕，没有一个匹配，直接返回 False
+        if self.search_text is not None:
+            if not self._match_search_text(row_entry):
                 return False
+            search_reg = None
+        else:
+            search_reg = self.search_reg
+        return match_row(row_entry[0], None, search_reg, self._search_column_list, self._filter_list)
 
-        # 再去匹配 filter 组合
-        for index, data_dict in enumerate(self.header_list):
-            model_index = self.sourceModel().index(source_row, index, source_parent)
-            value = self.sourceModel().data(model_index)
-            reg_exp = data_dict.get("reg", None)
-            if reg_exp and value is not None and not reg_exp.search(str(value)):
-                # 不符合筛选，直接返回 False
+    def _match_search_text(self, row_entry):
+        """
+        Match the search text with the row, reuse the result of the last search when possible:
+        if the new text contains the last one (eg. "ch" -> "cha"), the rows that did not match still do not match,
+        if the new text is contained by the last one (eg. "cha" -> "ch"), the rows that matched still match.
+        Only the other rows are tested again.
+        """
+        search_text = self.search_text
+        last_text = row_entry[2]
+        if last_text is not None:
+            last_matched = row_entry[3]
+            if last_matched and search_text in last_text:
+                return True
+            if not last_matched and last_text in search_text:
                 return False
-
-        return True
+        matched = search_text in row_entry[1]
+        row_entry[2] = search_text
+        row_entry[3] = matched
+        return matched
 
     def set_search_pattern(self, pattern):
         if pattern:
             self.search_reg = re.compile(pattern, re.IGNORECASE)
+            self.search_text = pattern.lower() if is_plain_text(pattern) else None
         else:
             self.search_reg = None
+            self.search_text = None
+        self._invalidate_filter()
+
+    def _invalidate_filter(self):
+        if not self._is_async():
+            self.invalidateFilter()
+        elif not self.search_reg and not self._filter_list and not self._async_sort_pending:
+            # 没有任何筛选条件，不需要后台计算
+            self._cancel_async_job()
+            self._set_async_loading(False)
+            self._async_accepted = None
+            self.invalidateFilter()
+        else:
+            self._start_async_job()
+
+    def _is_async(self):
+        # 后台计算要用到 MTableModel 的接口，其他的 source model 仍然同步筛选
+        return self._async_enabled and isinstance(self.sourceModel(), MTableModel)
+
+    def set_async(self, flag):
+        """
+        Filter and sort the top level rows in a worker thread, so the GUI does not freeze for large data.
+        Only for MTableModel sources, the other source models are still filtered and sorted synchronously.
+        The accepted rows and the sorted order are computed from a snapshot of the search index,
+        then applied at once on the GUI thread. The source model is never reordered.
+        Connect sig_loading_changed to MLoadingWrapper.set_dayu_loading to show the loading state,
+        and sig_progress to show the progress.
+        :param flag: bool
+        :return: None
+        """
+        self._async_enabled = flag
+        self._cancel_async_job()
+        for worker in self._worker_list:
+            worker.wait()
+        self._set_async_loading(False)
+        self._async_accepted = None
+        self._async_sort = (-1, QtCore.Qt.AscendingOrder)
+        self._async_sort_pending = False
         self.invalidateFilter()
 
+    def sort(self, column, order=QtCore.Qt.AscendingOrder):
+        """
+        Sort by the column. The sort keys of the columns with "sort_key" are extracted once and kept in the proxy,
+        the order of the source model is never changed, so other views of the same source are not affected.
+        In async mode, the other columns are converted to sort keys in the worker thread.
+        :param column: int
+        :param order: QtCore.Qt.SortOrder
+        :return: None
+        """
+        self._async_sort = (-1, QtCore.Qt.AscendingOrder)
+        self._async_sort_pending = False
+        model = self.sourceModel()
+        if not self._is_async() or column < 0 or model.get_sort_key_list(column, row_list=[]) is not None:
+            return super(MSortFilterModel, self).sort(column, order)
+        self._async_sort = (column, order)
+        self._async_sort_pending = True
+        self._start_async_job()
+
+    def _cancel_async_job(self):
+        self._async_generation += 1
+        self._snapshot_timer.stop()
+        self._async_delay_timer.stop()
+        self._snapshot = []
+        for worker in self._worker_list:
+            worker.cancel()
+
+    def _set_async_loading(self, loading):
+        if loading != self._async_loading:
+            self._async_loading = loading
+            self.sig_loading_changed.emit(loading)
+
+    def _schedule_async_job(self):
+        """The source data changed, compute again after a while, to merge the continuous changes."""
+        if self._async_sort[0] >= 0:
+            self._async_sort_pending = True
+        if not self.search_reg and not self._filter_list and not self._async_sort_pending:
+            return
+        self._cancel_async_job()
+        self._set_async_loading(True)
+        self._async_delay_timer.start()
+
+    @QtCore.Slot()
+    def _start_async_job(self):
+        self._cancel_async_job()
+        self._set_async_loading(True)
+        self._async_progress = 0
+        self.sig_progress.emit(0)
+        self._snapshot_timer.start()
+
+    @QtCore.Slot()
+    def _slot_build_snapshot(self):
+        """Build the snapshot of the top level rows on the GUI thread, in slices of a few milliseconds."""
+        model = self.sourceModel()
+        if not isinstance(model, MTableModel):
+            # 计算期间换了 source model
+            self._snapshot_timer.stop()
+            return
+        root_index = QtCore.QModelIndex()
+        row_count = model.rowCount(root_index)
+        deadline = time.perf_counter() + ASYNC_SLICE_TIME
+        while len(self._snapshot) < row_count:
+            row = len(self._snapshot)
+            row_entry = self._get_row_text(row, root_index)
+            self._snapshot.append((self._get_row_key(row, root_index), row_entry[0], row_entry[1]))
+            if time.perf_counter() > deadline:
+                progress = len(self._snapshot) * 50 // row_count
+                if progress != self._async_progress:
+                    self._async_progress = progress
+                    self.sig_progress.emit(progress)
+                return
+        self._snapshot_timer.stop()
+        worker = MFilterSortWorker(
+            self._async_generation,
+            self._snapshot,
+            self.search_text,
+            None if self.search_text is not None else self.search_reg,
+            list(self._search_column_list),
+            list(self._filter_list),
+            self._async_sort[0] if self._async_sort_pending else -1,
+            parent=self,
+        )
+        self._snapshot = []
+        worker.sig_progress.connect(self._slot_async_progress)
+        worker.sig_result.connect(self._slot_async_result)
+        worker.finished.connect(self._slot_worker_finished)
+        self._worker_list.append(worker)
+        worker.start()
+
+    @QtCore.Slot(int, int)
+    def _slot_async_progress(self, generation, progress):
+        if generation == self._async_generation and 50 + progress // 2 != self._async_progress:
+            self._async_progress = 50 + progress // 2
+            self.sig_progress.emit(self._async_progress)
+
+    @QtCore.Slot()
+    def _slot_worker_finished(self):
+        worker = self.sender()
+        if worker in self._worker_list:
+            self._worker_list.remove(worker)
+            worker.deleteLater()
+
+    @QtCore.Slot(int, object)
+    def _slot_async_result(self, generation, result):
+        if generation != self._async_generation:
+            # 过期的结果，条件或数据已经变了
+            return
+        accepted, sort_key_list = result
+        self._async_accepted = accepted
+        if sort_key_list is not None and self._async_sort_pending:
+            column, order = self._async_sort
+            self._async_sort_pending = False
+            # 后台线程只计算顶层的行，子节点在 lessThan 里按需取
+            self._sort_key_dict[self._get_sort_cache_key(column, self.sourceModel().root_item)] = sort_key_list
+            if (self.sortColumn(), self.sortOrder()) != (column, order):
+                super(MSortFilterModel, self).sort(column, order)
+                self.invalidateFilter()
+            else:
+                self.invalidate()
+        else:
+            self.invalidateFilter()
+        self.sig_progress.emit(100)
+        self._set_async_loading(False)
+
     def set_filter_attr_pattern(self, attr, pattern):
         for data_dict in self.header_list:
             if data_dict.get("key") == attr:
@@ -319,4 +1353,7 @@ class MSortFilterModel(QtCore.QSortFilterProxyModel):
                 else:
                     data_dict["reg"] = None
                 break
-        self.invalidateFilter()
+        self._filter_list = [
+            (column, data_dict["reg"]) for column, data_dict in enumerate(self.header_list) if data_dict.get("reg")
+        ]
+        self._invalidate_filter()
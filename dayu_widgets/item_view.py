@@ -1,3 +1,11 @@
+# Import built-in modules
+import collections
+import heapq
+import os
+import random
+import threading
+import time
+
 # Import third-party modules
 from qtpy import QtCore
 from qtpy import QtGui
@@ -8,12 +16,16 @@ from dayu_widgets import dayu_theme
 from dayu_widgets import utils
 from dayu_widgets.header_view import MHeaderView
 from dayu_widgets.item_model import MTableModel
+from dayu_widgets.item_model import THUMBNAIL_ROLE
 from dayu_widgets.menu import MMenu
 from dayu_widgets.qt import MPixmap
 from dayu_widgets.qt import get_scale_factor
 
 
 HEADER_SORT_MAP = {"asc": QtCore.Qt.AscendingOrder, "desc": QtCore.Qt.DescendingOrder}
+FAST_LAYOUT_TREE_PRECISION = 50
+AUTO_WIDTH_SAMPLE_COUNT = 200
+AUTO_WIDTH_DELAY = 100  # ms，合并连续多次的 reset 和插入行
 
 
 def draw_empty_content(view, text=None, pix_map=None):
@@ -65,7 +77,7 @@ class MOptionDelegate(QtWidgets.QStyledItemDelegate):
         self.editor.setWindowFlags(QtCore.Qt.FramelessWindowHint | QtCore.Qt.Window)
         model = utils.real_model(index)
         real_index = utils.real_index(index)
-        data_obj = real_index.internalPointer()
+        data_obj = model.get_data_obj(real_index)
         attr = "{}_list".format(model.header_list[real_index.column()].get("key"))
 
         self.editor.set_data(utils.get_obj_value(data_obj, attr, []))
@@ -134,6 +146,113 @@ def set_header_list(self, header_list):
                 self.setItemDelegateForColumn(index, delegate)
             elif self.itemDelegateForColumn(index):
                 self.setItemDelegateForColumn(index, None)
+        if any(i.get("auto_width", False) for i in header_list):
+            self._auto_width_timer.start()
+
+
+def set_fast_layout(self, flag):
+    """
+    Fast layout mode for large models. All the rows have the same height of the first row,
+    or the dayu_theme size of the MTableView, and the columns are sized to the contents of the visible rows only,
+    a few more rows for MTreeView.
+    Then showing, scrolling and resizeColumnsToContents do not ask the size hint of every row.
+    Only MTableView scales to millions of rows, QTreeView.setModel still visits every row
+    and QListView still gets the index of every row when laying out.
+    :param flag: bool
+    :return: None
+    """
+    if isinstance(self, QtWidgets.QTreeView):
+        self.setUniformRowHeights(flag)
+    elif isinstance(self, QtWidgets.QTableView):
+        self.verticalHeader().setSectionResizeMode(
+            QtWidgets.QHeaderView.Fixed if flag else QtWidgets.QHeaderView.Interactive
+        )
+    elif isinstance(self, QtWidgets.QListView):
+        self.setUniformItemSizes(flag)
+    if self.header_view:
+        # 0 表示只用可见的行计算列宽，1000 是 Qt 的默认值
+        # Qt 6 的 QTreeView 没有滚动到底时，0 会计算所有的行，所以只取从可见的行开始的少量行
+        precision = FAST_LAYOUT_TREE_PRECISION if isinstance(self, QtWidgets.QTreeView) else 0
+        self.header_view.setResizeContentsPrecision(precision if flag else 1000)
+
+
+_font_metrics_dict = {}
+
+
+def _get_font_metrics(font):
+    key = font.key()
+    metrics = _font_metrics_dict.get(key)
+    if metrics is None:
+        metrics = _font_metrics_dict[key] = QtGui.QFontMetrics(font)
+    return metrics
+
+
+def _get_sample_row_list(row_count, sample_count):
+    """
+    Return the head and tail rows, and random rows between them, no more than sample_count rows.
+    The random rows are seeded by row_count, so the same data always gets the same width.
+    """
+    if row_count <= sample_count:
+        return range(row_count)
+    edge_count = sample_count // 4
+    row_list = list(range(edge_count)) + list(range(row_count - edge_count, row_count))
+    middle_range = range(edge_count, row_count - edge_count)
+    return row_list + random.Random(row_count).sample(middle_range, sample_count - 2 * edge_count)
+
+
+def auto_fit_columns(self, sample_count=AUTO_WIDTH_SAMPLE_COUNT):
+    """
+    Fit the columns with 'auto_width' in header_list to their contents.
+    Unlike resizeColumnsToContents, which asks the size hint of every row,
+    only the display text of a bounded sample of rows is measured, so the cost does not grow with the row count.
+    It runs after the model resets and after set_header_list, call it again after changing the data in place.
+    :param sample_count: int, the max count of the sampled rows
+    :return: None
+    """
+    model = self.model()
+    if model is None or not self.header_view:
+        return
+    column_list = [
+        index for index, i in enumerate(self.header_list) if i.get("auto_width", False) and not i.get("hide", False)
+    ]
+    if not column_list:
+        return
+    row_list = _get_sample_row_list(model.rowCount(), sample_count)
+    # 直接调用源 model 的 data，不经过代理 model 的 C++ 往返
+    source_model = utils.real_model(model)
+    map_to_source = utils.real_index if source_model is not model else None
+    display_role = QtCore.Qt.DisplayRole
+    metrics = _get_font_metrics(self.font())
+    style = self.style()
+    # 和 QStyledItemDelegate 一样，文字左右各留 PM_FocusFrameHMargin + 1 的边距
+    margin = (style.pixelMetric(QtWidgets.QStyle.PM_FocusFrameHMargin, None, self) + 1) * 2
+    icon_width = self.iconSize().width()
+    if icon_width <= 0:
+        icon_width = style.pixelMetric(QtWidgets.QStyle.PM_SmallIconSize, None, self)
+    width_dict = {}
+    for column in column_list:
+        attr_dict = self.header_list[column]
+        extra = margin
+        if attr_dict.get("checkable", False):
+            extra += style.pixelMetric(QtWidgets.QStyle.PM_IndicatorWidth, None, self) + margin
+        if attr_dict.get("icon"):
+            extra += icon_width + margin
+        if isinstance(self, QtWidgets.QTreeView) and self.header_view.visualIndex(column) == 0:
+            # 只采样了顶层的行，所以只加一级缩进
+            extra += self.indentation()
+        text_width = 0
+        for row in row_list:
+            index = model.index(row, column)
+            text = source_model.data(map_to_source(index) if map_to_source else index, display_role)
+            if text is None:
+                continue
+            text = str(text)
+            width = width_dict.get(text)
+            if width is None:
+                width = width_dict[text] = metrics.horizontalAdvance(text)
+            text_width = max(text_width, width)
+        header_width = self.header_view.sectionSizeFromContents(column).width()
+        self.header_view.resizeSection(column, max(text_width + extra, header_width))
 
 
 def enable_context_menu(self, enable):
@@ -155,11 +274,12 @@ def slot_context_menu(self, point):
             self.selectionModel().selectedIndexes()
         )
         for index in selected:
-            if need_map:
-                source_index = self.model().mapToSource(index)
-                data_obj = source_index.internalPointer()
+            source_index = self.model().mapToSource(index) if need_map else index
+            source_model = source_index.model()
+            if isinstance(source_model, MTableModel):
+                data_obj = source_model.get_data_obj(source_index)
             else:
-                data_obj = index.internalPointer()
+                data_obj = source_index.internalPointer()
             selection.append(data_obj)
         event = utils.ItemViewMenuEvent(view=self, selection=selection, extra={})
         self.sig_context_menu.emit(event)
@@ -203,6 +323,8 @@ def mouse_release_event(self, event):
 
 class MTableView(QtWidgets.QTableView):
     set_header_list = set_header_list
+    set_fast_layout = set_fast_layout
+    auto_fit_columns = auto_fit_columns
     enable_context_menu = enable_context_menu
     slot_context_menu = slot_context_menu
     sig_context_menu = QtCore.Signal(object)
@@ -225,6 +347,10 @@ class MTableView(QtWidgets.QTableView):
         self.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
         self.setAlternatingRowColors(True)
         self.setShowGrid(False)
+        self._auto_width_timer = QtCore.QTimer(self)
+        self._auto_width_timer.setSingleShot(True)
+        self._auto_width_timer.setInterval(AUTO_WIDTH_DELAY)
+        self._auto_width_timer.timeout.connect(self.auto_fit_columns)
 
     def set_no_data_text(self, text):
         self._no_data_text = text
@@ -243,6 +369,7 @@ class MTableView(QtWidgets.QTableView):
         #     'key': attr,  # 必填，用来读取 model后台数据结构的属性
         #     'label': attr.title(),  # 选填，显示在界面的该列的名字
         #     'width': 100,  # 选填，单元格默认的宽度
+        #     'auto_width': False,  # 选填，True 则加载数据后按采样的行的内容自动调整列宽，width 只作为加载数据前的宽度
         #     'default_filter': False,  # 选填，如果有组合的filter组件，该属性默认是否显示，默认False
         #     'searchable': False,  # 选填，如果有搜索组件，该属性是否可以被搜索，默认False
         #     'editable': False,  # 选填，该列是否可以双击编辑，默认False
@@ -250,6 +377,7 @@ class MTableView(QtWidgets.QTableView):
         #     'checkable': False,  # 选填，该单元格是否要加checkbox，默认False
         #     'exclusive': True,  # 配合selectable，如果是可以多选的则为 False，如果是单选，则为True
         #     'order': None,  # 选填，初始化时，该列的排序方式, 0 升序，1 降序
+        #     'sort_key': None,  # 选填，True 按原始数据排序，或 callable(value, data_obj) 返回排序用的值，大数据量时排序更快
         #     # 下面的是每个单元格的设置，主要用来根据本单元格数据，动态设置样式
         #     'color': None,  # QColor选填，该单元格文字的颜色，例如根据百分比数据大小，大于100%显示红色，小于100%显示绿色
         #     'bg_color': None,  # 选填，该单元格的背景色，例如根据bool数据，True显示绿色，False显示红色
@@ -257,12 +385,29 @@ class MTableView(QtWidgets.QTableView):
         #     'align': None,  # 选填，该单元格文字的对齐方式
         #     'font': None,  # 选填，该单元格文字的格式，例如加下划线、加粗等等
         #     'icon': None,  # 选填，该单格元的图标，注意，当 QListView 使用图标模式时，每个item的图片也是在这里设置
+        #     'thumbnail': None,  # 选填，callable(value, data_obj) 返回图片路径，MBigView 在后台线程加载缩略图
         #     'tooltip': None,  # 选填，鼠标指向该单元格时，显示的提示信息
         #     'size': None,  # 选填，该列的 hint size，设置
         #     'data': None,
         #     'edit': None
         # }
 
+    def reset(self):
+        super(MTableView, self).reset()
+        # 数据加载完后重新计算 auto_width 列的宽度，用定时器合并连续多次的 reset
+        if any(i.get("auto_width", False) for i in self.header_list):
+            self._auto_width_timer.start()
+
+    def rowsInserted(self, parent, start, end):
+        super(MTableView, self).rowsInserted(parent, start, end)
+        # 数据分批加载时 reset 后还没有行，插入行后也要重新计算。定时器已经在等待时不重新开始，持续加载时也会定期计算
+        if (
+            not parent.isValid()
+            and not self._auto_width_timer.isActive()
+            and any(i.get("auto_width", False) for i in self.header_list)
+        ):
+            self._auto_width_timer.start()
+
     def paintEvent(self, event):
         """Override paintEvent when there is no data to show, draw the preset picture and text."""
         model = utils.real_model(self.model())
@@ -295,6 +440,8 @@ class MTableView(QtWidgets.QTableView):
 
 class MTreeView(QtWidgets.QTreeView):
     set_header_list = set_header_list
+    set_fast_layout = set_fast_layout
+    auto_fit_columns = auto_fit_columns
     enable_context_menu = enable_context_menu
     slot_context_menu = slot_context_menu
     sig_context_menu = QtCore.Signal(object)
@@ -308,6 +455,26 @@ class MTreeView(QtWidgets.QTreeView):
         self.setHeader(self.header_view)
         self.setSortingEnabled(True)
         self.setAlternatingRowColors(True)
+        self._auto_width_timer = QtCore.QTimer(self)
+        self._auto_width_timer.setSingleShot(True)
+        self._auto_width_timer.setInterval(AUTO_WIDTH_DELAY)
+        self._auto_width_timer.timeout.connect(self.auto_fit_columns)
+
+    def reset(self):
+        super(MTreeView, self).reset()
+        # 数据加载完后重新计算 auto_width 列的宽度，用定时器合并连续多次的 reset
+        if any(i.get("auto_width", False) for i in self.header_list):
+            self._auto_width_timer.start()
+
+    def rowsInserted(self, parent, start, end):
+        super(MTreeView, self).rowsInserted(parent, start, end)
+        # 数据分批加载时 reset 后还没有行，插入行后也要重新计算。定时器已经在等待时不重新开始，持续加载时也会定期计算
+        if (
+            not parent.isValid()
+            and not self._auto_width_timer.isActive()
+            and any(i.get("auto_width", False) for i in self.header_list)
+        ):
+            self._auto_width_timer.start()
 
     def paintEvent(self, event):
         """Override paintEvent when there is no data to show, draw the preset picture and text."""
@@ -323,6 +490,277 @@ class MTreeView(QtWidgets.QTreeView):
         self._no_data_text = text
 
 
+# 缩略图按 2 的幂次的尺寸加载，缩放时用最接近的一级
+MIP_LEVEL_LIST = (16, 32, 64, 128, 256, 512, 1024)
+
+
+def get_mip_level(size):
+    """Get the smallest mip level not less than the size."""
+    return next((level for level in MIP_LEVEL_LIST if level >= size), MIP_LEVEL_LIST[-1])
+
+
+def _read_thumbnail(path, size):
+    """Decode the image scaled to fit in the size, safe to call out of the GUI thread."""
+    reader = QtGui.QImageReader(path)
+    image_size = reader.size()
+    if image_size.isValid() and max(image_size.width(), image_size.height()) > size:
+        # 解码时直接缩小，jpg 等格式不用解码整张大图
+        reader.setScaledSize(image_size.scaled(size, size, QtCore.Qt.KeepAspectRatio))
+    image = reader.read()
+    if not image.isNull() and max(image.width(), image.height()) > size:
+        image = image.scaled(size, size, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+    return image
+
+
+class MThumbnailLoader(QtCore.QObject):
+    """
+    Load the thumbnails of image files in worker threads, used by MBigView.
+    The requests are loaded by priority, and the pending ones can be cancelled.
+    The thumbnails are decoded at the mip levels, the other sizes are scaled from the nearest loaded level.
+    They are kept in a LRU cache keyed by (path, mtime, size) with a byte budget.
+    The mtime of a loaded file is checked again when it is requested, at most once every mtime_check_interval seconds,
+    the thumbnails of the changed files are dropped and loaded again.
+    The results are collected by a timer on the GUI thread, sig_loaded is emitted once for each batch.
+    """
+
+    sig_loaded = QtCore.Signal()
+    default_max_bytes = 128 * 1024 * 1024
+    idle_timeout = 5.0  # 没有任务多少秒后工作线程退出
+    mtime_check_interval = 2.0  # 同一个文件至少隔多少秒才再检查 mtime
+
+    def __init__(self, max_bytes=None, thread_count=None, parent=None):
+        super(MThumbnailLoader, self).__init__(parent)
+        self._cache_dict = collections.OrderedDict()  # (path, mtime, size) -> (QPixmap, bytes)
+        self._mtime_dict = {}  # path -> 加载时文件的 mtime
+        self._checked_dict = {}  # path -> 上次检查 mtime 的时间
+        self._failed_set = set()  # 加载失败的 (path, size)，不再重复加载
+        self._pending_dict = {}  # (path, size) -> (priority, 请求的序号)，取消时删除
+        self._job_heap = []  # (-priority, 序号, (path, size))
+        self._job_count = 0
+        self._running_count = 0
+        self._condition = threading.Condition()
+        self._thread_count = thread_count or min(4, QtCore.QThread.idealThreadCount())
+        self._idle_thread_count = 0
+        self._thread_list = []
+        self._result_queue = collections.deque()
+        self._max_bytes = self.default_max_bytes if max_bytes is None else max_bytes
+        self._curr_bytes = 0
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(30)
+        self._timer.timeout.connect(self._slot_collect)
+
+    def get(self, path, size, smooth=True):
+        """
+        Get the thumbnail, scaled from the nearest loaded mip level if it is not loaded at this size.
+        :param path: the image file path
+        :param size: int, the max width and height of the thumbnail
+        :param smooth: bool, False to scale fast without caching the result, eg. while zooming
+        :return: QPixmap, or None if no mip level is loaded yet
+        """
+        mtime = self._mtime_dict.get(path, None)
+        if mtime is None:
+            return None
+        pix = self._get_cached((path, mtime, size))
+        if pix is not None:
+            return pix
+        level = get_mip_level(size)
+        # 优先用大的一级缩小，没有时才用小的放大
+        level_list = [x for x in MIP_LEVEL_LIST if x >= level] + [x for x in reversed(MIP_LEVEL_LIST) if x < level]
+        level_pix = next(
+            (pix for pix in (self._get_cached((path, mtime, x)) for x in level_list) if pix is not None), None
+        )
+        if level_pix is None:
+            return None
+        if not smooth:
+            return level_pix.scaled(size, size, QtCore.Qt.KeepAspectRatio, QtCore.Qt.FastTransformation)
+        pix = level_pix.scaled(size, size, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+        if max(level_pix.width(), level_pix.height()) >= max(pix.width(), pix.height()):
+            # 放大的结果比较模糊，不缓存，加载了需要的一级后就不再用它
+            self._add((path, mtime, size), pix)
+            self._evict()
+        return pix
+
+    def is_failed(self, path, size):
+        return (path, get_mip_level(size)) in self._failed_set
+
+    def request(self, path, size, priority=0):
+        """
+        Load the mip level of the size in the worker threads, if it is not loaded or loading with a higher priority.
+        :param path: the image file path
+        :param size: int, the max width and height of the thumbnail
+        :param priority: int, the higher one is loaded first, eg. the visible items
+        :return: None
+        """
+        key = (path, get_mip_level(size))
+        if key in self._failed_set or self._get_cached((path, self._check_mtime(path), key[1])) is not None:
+            return
+        with self._condition:
+            job_id = self._pending_dict.get(key, None)
+            if job_id is not None and job_id[0] >= priority:
+                return
+            self._job_count += 1
+            # 优先级变高时重新排队，旧的那项会被跳过
+            self._pending_dict[key] = (priority, self._job_count)
+            heapq.heappush(self._job_heap, (-priority, self._job_count, key))
+            if not self._idle_thread_count and len(self._thread_list) < self._thread_count:
+                thread = threading.Thread(target=self._run_worker)
+                thread.daemon = True
+                self._thread_list.append(thread)
+                thread.start()
+            self._condition.notify()
+        self._timer.start()
+
+    def cancel(self, keep_key_set=None):
+        """
+        Cancel the pending loads, eg. the items scrolled out of the view. The running loads are finished.
+        :param keep_key_set: set of (path, size) to keep loading, None to cancel all
+        :return: None
+        """
+        keep_key_set = {(path, get_mip_level(size)) for path, size in keep_key_set or ()}
+        with self._condition:
+            for key in list(self._pending_dict):
+                if key not in keep_key_set:
+                    self._pending_dict.pop(key)
+            if not self._pending_dict:
+                self._job_heap = []
+
+    def pending_count(self):
+        with self._condition:
+            return len(self._pending_dict) + self._running_count
+
+    def set_max_bytes(self, max_bytes):
+        self._max_bytes = max_bytes
+        self._evict()
+
+    def clear(self):
+        """Cancel the pending loads and drop all the thumbnails, eg. after the image files changed."""
+        self.cancel()
+        self._cache_dict.clear()
+        self._mtime_dict.clear()
+        self._checked_dict.clear()
+        self._failed_set.clear()
+        self._curr_bytes = 0
+
+    def wait(self):
+        """Wait for all the requested loads and collect the results."""
+        with self._condition:
+            while self._pending_dict or self._running_count:
+                self._condition.wait(0.05)
+        self._slot_collect()
+
+    def _run_worker(self):
+        while True:
+            with self._condition:
+                key = None
+                while key is None:
+                    while not self._job_heap:
+                        self._idle_thread_count += 1
+                        notified = self._condition.wait(self.idle_timeout)
+                        self._idle_thread_count -= 1
+                        if not notified and not self._job_heap:
+                            self._thread_list.remove(threading.current_thread())
+                            return
+                    priority, job_count, key = heapq.heappop(self._job_heap)
+                    if self._pending_dict.get(key, (None, None))[1] != job_count:
+                        # 已经取消，或者用更高的优先级重新排队了
+                        key = None
+                self._pending_dict.pop(key)
+                self._running_count += 1
+            try:
+                mtime = os.path.getmtime(key[0])
+                image = _read_thumbnail(*key)
+            except OSError:
+                mtime, image = None, QtGui.QImage()
+            self._result_queue.append((key, mtime, image))
+            with self._condition:
+                self._running_count -= 1
+                self._condition.notify_all()
+
+    def _check_mtime(self, path):
+        """Get the mtime of the loaded thumbnails of the path, drop them if the file is changed since loaded."""
+        mtime = self._mtime_dict.get(path, None)
+        if mtime is None:
+            return None
+        now = time.monotonic()
+        if now - self._checked_dict.get(path, 0.0) < self.mtime_check_interval:
+            return mtime
+        self._checked_dict[path] = now
+        try:
+            file_mtime = os.path.getmtime(path)
+        except OSError:
+            file_mtime = None
+        if file_mtime == mtime:
+            return mtime
+        self._drop_path(path)
+        return None
+
+    def _drop_path(self, path):
+        # 文件改过了，丢掉旧的缩略图，只在改动时遍历一次缓存
+        self._mtime_dict.pop(path, None)
+        for key in [x for x in self._cache_dict if x[0] == path]:
+            self._curr_bytes -= self._cache_dict.pop(key)[1]
+
+    def _get_cached(self, key):
+        cache_value = self._cache_dict.get(key, None)
+        if cache_value is None:
+            return None
+        self._cache_dict.move_to_end(key)
+        return cache_value[0]
+
+    def _add(self, key, pix):
+        if key in self._cache_dict:
+            self._curr_bytes -= self._cache_dict.pop(key)[1]
+        pix_bytes = pix.width() * pix.height() * max(pix.depth(), 8) // 8
+        self._cache_dict[key] = (pix, pix_bytes)
+        self._curr_bytes += pix_bytes
+
+    def _evict(self):
+        # 至少保留最新的一个
+        while self._curr_bytes > self._max_bytes and len(self._cache_dict) > 1:
+            _, (_, pix_bytes) = self._cache_dict.popitem(last=False)
+            self._curr_bytes -= pix_bytes
+
+    @QtCore.Slot()
+    def _slot_collect(self):
+        changed = bool(self._result_queue)
+        while self._result_queue:
+            key, mtime, image = self._result_queue.popleft()
+            if image.isNull():
+                self._failed_set.add(key)
+                continue
+            path, size = key
+            if self._mtime_dict.get(path, mtime) != mtime:
+                # 其他的 mip level 是改动前加载的
+                self._drop_path(path)
+            self._mtime_dict[path] = mtime
+            self._checked_dict.setdefault(path, time.monotonic())
+            self._add((path, mtime, size), QtGui.QPixmap.fromImage(image))
+        self._evict()
+        if not self.pending_count() and not self._result_queue:
+            self._timer.stop()
+        if changed:
+            self.sig_loaded.emit()
+
+
+class MThumbnailDelegate(QtWidgets.QStyledItemDelegate):
+    """Draw the thumbnail got from the THUMBNAIL_ROLE path, or the placeholder while it is loading."""
+
+    def initStyleOption(self, option, index):
+        super(MThumbnailDelegate, self).initStyleOption(option, index)
+        view = self.parent()
+        path = index.data(THUMBNAIL_ROLE)
+        if not path or not isinstance(view, MBigView):
+            return
+        size = max(view.iconSize().width(), view.iconSize().height())
+        # 缩放的过程中快速缩放，停下后再平滑缩放
+        pix = view.thumbnail_loader.get(path, size, smooth=not view.is_zooming())
+        if pix is None:
+            pix = view.get_thumbnail_placeholder()
+        option.icon = QtGui.QIcon(pix)
+        option.features |= QtWidgets.QStyleOptionViewItem.HasDecoration
+        option.decorationSize = view.iconSize()
+
+
 class MBigView(QtWidgets.QListView):
     set_header_list = set_header_list
     enable_context_menu = enable_context_menu
@@ -341,6 +779,77 @@ class MBigView(QtWidgets.QListView):
         self.setSpacing(10)
         default_size = dayu_theme.big_view_default_size
         self.setIconSize(QtCore.QSize(default_size, default_size))
+        # header 中配置了 thumbnail 时，只加载可见和临近的 item 的缩略图
+        self.thumbnail_loader = MThumbnailLoader(parent=self)
+        self.thumbnail_loader.sig_loaded.connect(self.viewport().update)
+        self._thumbnail_placeholder = None
+        self._thumbnail_timer = QtCore.QTimer(self)
+        self._thumbnail_timer.setSingleShot(True)
+        self._thumbnail_timer.setInterval(50)
+        self._thumbnail_timer.timeout.connect(self._slot_update_thumbnail_request)
+        self._zoom_timer = QtCore.QTimer(self)
+        self._zoom_timer.setSingleShot(True)
+        self._zoom_timer.setInterval(200)
+        self._zoom_timer.timeout.connect(self.viewport().update)
+        self.setItemDelegate(MThumbnailDelegate(self))
+
+    def set_thumbnail_placeholder(self, pix_map):
+        """Set the pixmap to show while the thumbnail is loading."""
+        self._thumbnail_placeholder = pix_map
+        self.viewport().update()
+
+    def get_thumbnail_placeholder(self):
+        if self._thumbnail_placeholder is None:
+            size = max(self.iconSize().width(), self.iconSize().height())
+            return MPixmap("media_line.svg", dayu_theme.secondary_text_color, get_mip_level(size) // 2)
+        return self._thumbnail_placeholder
+
+    def is_zooming(self):
+        """Whether the icon size is changing by scale_size, the thumbnails are not loaded until it stops."""
+        return self._zoom_timer.isActive()
+
+    def _find_first_row(self, row_count, y):
+        # item 按行排列，二分查找第一个底边在 y 之下的 item
+        model = self.model()
+        column = self.modelColumn()
+        low, high = 0, row_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.visualRect(model.index(middle, column)).bottom() < y:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    @QtCore.Slot()
+    def _slot_update_thumbnail_request(self):
+        """Load the thumbnails of the visible items first, then the ones within a screen, cancel the others."""
+        model = self.model()
+        if model is None or self.is_zooming():
+            return
+        row_count = model.rowCount()
+        if not row_count:
+            self.thumbnail_loader.cancel()
+            return
+        height = self.viewport().height()
+        size = max(self.iconSize().width(), self.iconSize().height())
+        column = self.modelColumn()
+        visible_start = self._find_first_row(row_count, 0)
+        if visible_start >= row_count or not model.index(visible_start, column).data(THUMBNAIL_ROLE):
+            # 没有配置 thumbnail
+            return
+        visible_end = self._find_first_row(row_count, height)
+        near_start = self._find_first_row(row_count, -height)
+        near_end = self._find_first_row(row_count, height * 2)
+        wanted_dict = {}
+        for row in range(near_start, min(near_end + 1, row_count)):
+            path = model.index(row, column).data(THUMBNAIL_ROLE)
+            if path:
+                priority = 1 if visible_start <= row <= visible_end else 0
+                wanted_dict[(path, size)] = max(priority, wanted_dict.get((path, size), 0))
+        self.thumbnail_loader.cancel(set(wanted_dict))
+        for (path, size), priority in sorted(wanted_dict.items(), key=lambda x: -x[1]):
+            self.thumbnail_loader.request(path, size, priority)
 
     def scale_size(self, factor):
         """Scale the icon size."""
@@ -351,12 +860,15 @@ class MBigView(QtWidgets.QListView):
             new_size = QtCore.QSize(max_size, max_size)
         elif new_size.width() < min_size:
             new_size = QtCore.QSize(min_size, min_size)
+        self._zoom_timer.start()
         self.setIconSize(new_size)
 
     def wheelEvent(self, event):
         """Override wheelEvent while user press ctrl, zoom the list view icon size."""
         if event.modifiers() == QtCore.Qt.ControlModifier:
-            num_degrees = event.delta() / 8.0
+            # Qt5 之后没有 delta
+            delta = event.angleDelta().y() if hasattr(event, "angleDelta") else event.delta()
+            num_degrees = delta / 8.0
             num_steps = num_degrees / 15.0
             factor = pow(1.125, num_steps)
             self.scale_size(factor)
@@ -371,6 +883,9 @@ class MBigView(QtWidgets.QListView):
         elif isinstance(model, MTableModel):
             if not model.get_data_list():
                 draw_empty_content(self.viewport(), self._no_data_text, self._no_data_image)
+        # 显示的 item 有变化时（滚动、排序、过滤等）都会重绘，之后再请求加载缩略图
+        if not self._thumbnail_timer.isActive():
+            self._thumbnail_timer.start()
         return super(MBigView, self).paintEvent(event)
 
     def set_no_data_text(self, text):
@@ -379,6 +894,7 @@ class MBigView(QtWidgets.QListView):
 
 class MListView(QtWidgets.QListView):
     set_header_list = set_header_list
+    set_fast_layout = set_fast_layout
     enable_context_menu = enable_context_menu
     slot_context_menu = slot_context_menu
     sig_context_menu = QtCore.Signal(object)
@@ -43,7 +43,7 @@ class MMessage(QtWidgets.QWidget):
             _icon_label.set_dayu_image(
                 MPixmap(
                     "{}_fill.svg".format(current_type),
-                    vars(dayu_theme).get(current_type + "_color"),
+                    dayu_theme.get(current_type + "_color"),
                 )
             )
 
@@ -78,7 +78,7 @@ def focus_shadow_mixin(cls):
 
             shadow_effect = QtWidgets.QGraphicsDropShadowEffect(self)
             dayu_type = self.property("dayu_type")
-            color = vars(dayu_theme).get("{}_color".format(dayu_type or "primary"))
+            color = dayu_theme.get("{}_color".format(dayu_type or "primary"))
             shadow_effect.setColor(QtGui.QColor(color))
             shadow_effect.setOffset(0, 0)
             shadow_effect.setBlurRadius(5)
@@ -114,7 +114,7 @@ def hover_shadow_mixin(cls):
 
             shadow_effect = QtWidgets.QGraphicsDropShadowEffect(self)
             dayu_type = self.property("type")
-            color = vars(dayu_theme).get("{}_color".format(dayu_type or "primary"))
+            color = dayu_theme.get("{}_color".format(dayu_type or "primary"))
             shadow_effect.setColor(QtGui.QColor(color))
             shadow_effect.setOffset(0, 0)
             shadow_effect.setBlurRadius(5)
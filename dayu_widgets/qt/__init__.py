@@ -1,5 +1,10 @@
 # Import built-in modules
+import collections
 import contextlib
+import hashlib
+import json
+import math
+import os
 import signal
 import sys
 
@@ -10,53 +15,373 @@ from qtpy import QtWidgets
 from qtpy.QtSvg import QSvgRenderer
 
 
+PixmapCacheInfo = collections.namedtuple(
+    "PixmapCacheInfo", ["hits", "misses", "evictions", "max_bytes", "curr_bytes", "currsize"]
+)
+
+
 class MCacheDict(object):
+    """
+    Cache of the icons/pixmaps got by file name, with a byte budget, the least recently used ones are dropped.
+    The svg files are rendered at the requested size, tinted with the given color.
+    """
+
     _render = QSvgRenderer()
+    default_size = 128  # svg 默认渲染的尺寸
+    default_max_bytes = 64 * 1024 * 1024
+    disk_cache_folder = None  # 渲染好的 svg 缓存成 png 的目录，None 时不缓存到磁盘
+    _atlas_dict = {}  # (color, size) -> (atlas QPixmap, {full path: (x, y, w, h)})
 
-    def __init__(self, cls):
+    def __init__(self, cls, max_bytes=None):
         super(MCacheDict, self).__init__()
         self.cls = cls
-        self._cache_pix_dict = {}
+        self._cache_pix_dict = collections.OrderedDict()  # key -> (icon/pixmap, bytes)
+        self._full_path_dict = {}  # path -> full path，static 目录的索引变化时清空
+        self._static_index_key = None
+        self._max_bytes = self.default_max_bytes if max_bytes is None else max_bytes
+        self._curr_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @classmethod
+    def set_disk_cache_folder(cls, folder=True):
+        """
+        Save the rendered svg files as png in the folder, the next sessions load them without parsing the svg.
+        :param folder: the cache folder, True to use the user cache folder, None to disable the disk cache
+        :return: None
+        """
+        if folder is True:
+            folder = get_user_cache_folder()
+        cls.disk_cache_folder = folder
 
-    def _render_svg(self, svg_path, replace_color=None):
+    @staticmethod
+    def _get_disk_cache_file(svg_path, replace_color, size):
+        try:
+            mtime = os.path.getmtime(svg_path)
+        except OSError:
+            return None
+        key = repr((os.path.normcase(svg_path), mtime, replace_color, size, get_scale_factor()))
+        return os.path.join(MCacheDict.disk_cache_folder, hashlib.md5(key.encode()).hexdigest() + ".png")
+
+    @staticmethod
+    def _save_disk_cache_file(pix, cache_file):
+        # 先写临时文件再改名，避免多个进程同时写入时读到不完整的文件
+        tmp_file = "{}.{}.tmp".format(cache_file, os.getpid())
+        try:
+            if not os.path.isdir(MCacheDict.disk_cache_folder):
+                os.makedirs(MCacheDict.disk_cache_folder)
+            if pix.save(tmp_file, "PNG"):
+                os.replace(tmp_file, cache_file)
+        except OSError:
+            pass
+
+    @classmethod
+    def load_atlas(cls, color=None, size=None):
+        """
+        Render all the svg files of the static folder into one atlas image, tinted with the color at the size.
+        Then the icons/pixmaps of these svg files are copied from the atlas instead of parsing each file.
+        When the disk cache is enabled, the atlas is saved, and the next sessions load it with one file read.
+        :param color: the color to replace #555555 of the svg files, None to use dayu_theme.icon_color
+        :param size: int, the size of each icon, None to use default_size
+        :return: the atlas QPixmap
+        """
+        # Import local modules
+        from dayu_widgets import DEFAULT_STATIC_FOLDER
+        from dayu_widgets import dayu_theme
+
+        color = color or dayu_theme.icon_color
+        size = size or cls.default_size
+        if (color, size) not in cls._atlas_dict:
+            svg_path_list = sorted(
+                os.path.join(DEFAULT_STATIC_FOLDER, name)
+                for name in os.listdir(DEFAULT_STATIC_FOLDER)
+                if name.endswith(".svg")
+            )
+            cls._atlas_dict[(color, size)] = _load_icon_atlas(svg_path_list, color, size)
+        return cls._atlas_dict[(color, size)][0]
+
+    @classmethod
+    def clear_atlas(cls):
+        """Release all the loaded atlas images."""
+        cls._atlas_dict.clear()
+
+    def _render_svg(self, svg_path, replace_color=None, size=None):
         # Import local modules
         from dayu_widgets import dayu_theme
 
         replace_color = replace_color or dayu_theme.icon_color
         if (self.cls is QtGui.QIcon) and (replace_color is None):
             return QtGui.QIcon(svg_path)
+        size = size or self.default_size
+        atlas_value = self._atlas_dict.get((replace_color, size), None)
+        if atlas_value is not None:
+            rect = atlas_value[1].get(os.path.normcase(svg_path), None)
+            if rect is not None:
+                pix = atlas_value[0].copy(*rect)
+                return pix if self.cls is QtGui.QPixmap else self.cls(pix)
+        cache_file = None
+        if self.disk_cache_folder:
+            cache_file = self._get_disk_cache_file(svg_path, replace_color, size)
+            if cache_file and os.path.isfile(cache_file):
+                pix = QtGui.QPixmap(cache_file)
+                if not pix.isNull():
+                    return pix if self.cls is QtGui.QPixmap else self.cls(pix)
         with open(svg_path, "r") as f:
             data_content = f.read()
             if replace_color is not None:
                 data_content = data_content.replace("#555555", replace_color)
             self._render.load(QtCore.QByteArray(data_content.encode()))
-            pix = QtGui.QPixmap(128, 128)
+            pix = QtGui.QPixmap(size, size)
             pix.fill(QtCore.Qt.transparent)
             painter = QtGui.QPainter(pix)
             self._render.render(painter)
             painter.end()
+            if cache_file:
+                self._save_disk_cache_file(pix, cache_file)
             if self.cls is QtGui.QPixmap:
                 return pix
             else:
                 return self.cls(pix)
 
-    def __call__(self, path, color=None):
+    def _load_image(self, image_path, size=None):
+        if size is None:
+            return self.cls(image_path)
+        pix = QtGui.QPixmap(image_path)
+        if not pix.isNull():
+            pix = pix.scaled(size, size, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+        return pix if self.cls is QtGui.QPixmap else self.cls(pix)
+
+    @staticmethod
+    def _get_bytes(pix_map, size):
+        if isinstance(pix_map, QtGui.QPixmap):
+            return pix_map.width() * pix_map.height() * max(pix_map.depth(), 8) // 8
+        # QIcon 等无法直接得到占用大小，按请求的尺寸估算
+        size = size or MCacheDict.default_size
+        return size * size * 4
+
+    def set_max_bytes(self, max_bytes):
+        """Set the byte budget of the cache, the least recently used ones are dropped when exceeded."""
+        self._max_bytes = max_bytes
+        self._evict()
+
+    def _evict(self):
+        # 至少保留最新的一个
+        while self._curr_bytes > self._max_bytes and len(self._cache_pix_dict) > 1:
+            _, (_, pix_bytes) = self._cache_pix_dict.popitem(last=False)
+            self._curr_bytes -= pix_bytes
+            self._evictions += 1
+
+    def cache_info(self):
+        """Return the hits, misses, evictions, max_bytes, curr_bytes and currsize of the cache."""
+        return PixmapCacheInfo(
+            self._hits, self._misses, self._evictions, self._max_bytes, self._curr_bytes, len(self._cache_pix_dict)
+        )
+
+    def clear(self):
+        """Clear the cached pixmaps and the statistics, eg. after the theme changed."""
+        self._cache_pix_dict.clear()
+        self._curr_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __call__(self, path, color=None, size=None):
+        """
+        Get the icon/pixmap of the file.
+        :param path: file name in the static folders, or full path
+        :param color: the color to replace #555555 of the svg file
+        :param size: int, render the svg and scale the image to this size, None to use the original size
+        :return: instance of self.cls
+        """
         # Import local modules
         from dayu_widgets import utils
 
-        full_path = utils.get_static_file(path)
+        # 缓存命中时不访问文件系统
+        static_index_key = utils.get_static_index_key()
+        if static_index_key != self._static_index_key:
+            self._full_path_dict = {}
+            self._static_index_key = static_index_key
+        full_path = self._full_path_dict.get(path, None)
         if full_path is None:
-            return self.cls()
-        key = "{}{}".format(full_path.lower(), color or "")
-        pix_map = self._cache_pix_dict.get(key, None)
-        if pix_map is None:
-            if full_path.endswith("svg"):
-                pix_map = self._render_svg(full_path, color)
-            else:
-                pix_map = self.cls(full_path)
-            self._cache_pix_dict.update({key: pix_map})
+            full_path = utils.get_static_file(path)
+            if full_path is None:
+                return self.cls()
+            self._full_path_dict[path] = full_path
+        key = (full_path.lower(), color or "", size)
+        cache_value = self._cache_pix_dict.get(key, None)
+        if cache_value is not None:
+            self._hits += 1
+            self._cache_pix_dict.move_to_end(key)
+            return cache_value[0]
+        self._misses += 1
+        if full_path.endswith("svg"):
+            pix_map = self._render_svg(full_path, color, size)
+        else:
+            pix_map = self._load_image(full_path, size)
+        self._add(key, pix_map, size)
         return pix_map
 
+    def _add(self, key, pix_map, size):
+        if key in self._cache_pix_dict:
+            self._curr_bytes -= self._cache_pix_dict.pop(key)[1]
+        pix_bytes = self._get_bytes(pix_map, size)
+        self._cache_pix_dict[key] = (pix_map, pix_bytes)
+        self._curr_bytes += pix_bytes
+        self._evict()
+
+    def prewarm(self, path_list, color_list=None, size_list=None, slice_count=8):
+        """
+        Load the icons/pixmaps into the cache in advance, eg. before a menu with many icons opens.
+        The files are read and rendered to QImage in a worker thread,
+        then converted in slices of slice_count on the GUI thread, so the UI keeps responsive.
+        :param path_list: list of file names in the static folders, or full paths
+        :param color_list: list of colors to replace #555555 of the svg files, None for [None]
+        :param size_list: list of int sizes, None for [None]
+        :param slice_count: int, how many images to convert on the GUI thread each time
+        :return: MIconPrewarmer, its sig_finished is emitted when all the icons are in the cache
+        """
+        # Import local modules
+        from dayu_widgets import dayu_theme
+        from dayu_widgets import utils
+
+        job_list = []
+        for path in path_list:
+            full_path = utils.get_static_file(path)
+            if full_path is None:
+                continue
+            is_svg = full_path.endswith("svg")
+            for color in color_list or [None]:
+                replace_color = color or dayu_theme.icon_color
+                for size in size_list or [None]:
+                    key = (full_path.lower(), color or "", size)
+                    if key in self._cache_pix_dict:
+                        continue
+                    if not is_svg:
+                        job_list.append((key, full_path, None, size, None))
+                        continue
+                    if (self.cls is QtGui.QIcon) and (replace_color is None):
+                        continue
+                    render_size = size or self.default_size
+                    cache_file = None
+                    if self.disk_cache_folder:
+                        cache_file = self._get_disk_cache_file(full_path, replace_color, render_size)
+                    job_list.append((key, full_path, replace_color, render_size, cache_file))
+        prewarmer = MIconPrewarmer(self, job_list, slice_count)
+        prewarmer.start()
+        return prewarmer
+
+
+class MIconPrewarmWorker(QtCore.QThread):
+    """
+    Read and render the files to QImage in a worker thread, used by MCacheDict.prewarm.
+    Each job is (cache key, full path, replace color, size, disk cache file), the color is None for the images.
+    """
+
+    sig_result = QtCore.Signal(object)
+
+    def __init__(self, job_list, parent=None):
+        super(MIconPrewarmWorker, self).__init__(parent)
+        self._job_list = job_list
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        result_list = []
+        for key, full_path, replace_color, size, cache_file in self._job_list:
+            if self._cancelled:
+                return
+            if not full_path.endswith("svg"):
+                image = QtGui.QImage(full_path)
+                if size is not None and not image.isNull():
+                    image = image.scaled(size, size, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+                result_list.append((key, image))
+                continue
+            if cache_file and os.path.isfile(cache_file):
+                image = QtGui.QImage(cache_file)
+                if not image.isNull():
+                    result_list.append((key, image))
+                    continue
+            try:
+                image = render_svg_image(full_path, replace_color, size)
+            except (IOError, UnicodeDecodeError):
+                continue
+            if cache_file:
+                MCacheDict._save_disk_cache_file(image, cache_file)
+            result_list.append((key, image))
+        # 只在最后发一次信号，避免大量跨线程的信号
+        self.sig_result.emit(result_list)
+
+
+class MIconPrewarmer(QtCore.QObject):
+    """
+    Put the images rendered by MIconPrewarmWorker into the MCacheDict, slice by slice on the GUI thread.
+    sig_finished is emitted when all of them are in the cache, or the prewarm is cancelled.
+    """
+
+    sig_finished = QtCore.Signal()
+    _running_set = set()  # 正在预热的对象由类保存，避免被回收
+
+    def __init__(self, cache, job_list, slice_count=8, parent=None):
+        super(MIconPrewarmer, self).__init__(parent)
+        self._cache = cache
+        self._slice_count = max(slice_count, 1)
+        self._pending = collections.deque()
+        self._finished = False
+        self._worker = MIconPrewarmWorker(job_list) if job_list else None
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self._slot_convert_slice)
+
+    def start(self):
+        MIconPrewarmer._running_set.add(self)
+        if self._worker is None:
+            QtCore.QTimer.singleShot(0, self._finish)
+            return
+        self._worker.sig_result.connect(self._slot_result)
+        self._worker.start()
+
+    def cancel(self):
+        """Stop the prewarm, the icons already put in the cache are kept."""
+        if self._worker is not None:
+            self._worker.cancel()
+        self._pending.clear()
+        self._finish()
+
+    def is_finished(self):
+        return self._finished
+
+    @QtCore.Slot(object)
+    def _slot_result(self, result_list):
+        if self._finished:
+            return
+        self._pending.extend(result_list)
+        self._timer.start()
+
+    @QtCore.Slot()
+    def _slot_convert_slice(self):
+        for _ in range(self._slice_count):
+            if not self._pending:
+                break
+            key, image = self._pending.popleft()
+            pix = QtGui.QPixmap.fromImage(image)
+            self._cache._add(key, pix if self._cache.cls is QtGui.QPixmap else self._cache.cls(pix), key[2])
+        if not self._pending:
+            self._finish()
+
+    def _finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        self._timer.stop()
+        if self._worker is not None:
+            # 结果信号发出后线程马上结束，等待很短
+            self._worker.wait()
+        MIconPrewarmer._running_set.discard(self)
+        self.sig_finished.emit()
+
 
 def get_scale_factor():
     if not QtWidgets.QApplication.instance():
@@ -78,6 +403,97 @@ def get_scale_factor():
         return 1, 1
 
 
+def render_svg_image(svg_path, replace_color, size, image=None, pos=(0, 0)):
+    """
+    Render the svg file into a QImage, which is safe to do out of the GUI thread.
+    :param svg_path: full path of the svg file
+    :param replace_color: the color to replace #555555 of the svg file, None to keep the origin color
+    :param size: int, the size to render
+    :param image: the QImage to render into, None to create a new transparent one
+    :param pos: (x, y) to render at in the image
+    :return: QImage
+    """
+    if image is None:
+        image = QtGui.QImage(size, size, QtGui.QImage.Format_ARGB32_Premultiplied)
+        image.fill(QtCore.Qt.transparent)
+    with open(svg_path, "r") as f:
+        data_content = f.read()
+    if replace_color is not None:
+        data_content = data_content.replace("#555555", replace_color)
+    render = QSvgRenderer(QtCore.QByteArray(data_content.encode()))
+    painter = QtGui.QPainter(image)
+    render.render(painter, QtCore.QRectF(pos[0], pos[1], size, size))
+    painter.end()
+    return image
+
+
+def build_icon_atlas(svg_path_list, replace_color, size):
+    """
+    Pack the svg files into one atlas image, in a square grid.
+    :param svg_path_list: list of the full path of svg files
+    :param replace_color: the color to replace #555555 of the svg files
+    :param size: int, the size of each icon
+    :return: (QImage, {full path: (x, y, w, h)})
+    """
+    column_count = max(int(math.ceil(math.sqrt(len(svg_path_list)))), 1)
+    row_count = max(int(math.ceil(len(svg_path_list) / float(column_count))), 1)
+    image = QtGui.QImage(column_count * size, row_count * size, QtGui.QImage.Format_ARGB32_Premultiplied)
+    image.fill(QtCore.Qt.transparent)
+    index_dict = {}
+    for index, svg_path in enumerate(svg_path_list):
+        pos = (index % column_count * size, index // column_count * size)
+        render_svg_image(svg_path, replace_color, size, image=image, pos=pos)
+        index_dict[os.path.normcase(svg_path)] = pos + (size, size)
+    return image, index_dict
+
+
+def _load_icon_atlas(svg_path_list, replace_color, size):
+    # 启用了磁盘缓存时，图集和索引一起缓存，之后只读一次文件
+    cache_file = None
+    if MCacheDict.disk_cache_folder:
+        try:
+            mtime_list = [(os.path.basename(path), os.path.getmtime(path)) for path in svg_path_list]
+        except OSError:
+            mtime_list = None
+        if mtime_list is not None:
+            key = repr((mtime_list, replace_color, size, get_scale_factor()))
+            cache_file = os.path.join(
+                MCacheDict.disk_cache_folder, "atlas_{}.png".format(hashlib.md5(key.encode()).hexdigest())
+            )
+    if cache_file and os.path.isfile(cache_file):
+        pix = QtGui.QPixmap(cache_file)
+        folder = os.path.dirname(svg_path_list[0]) if svg_path_list else ""
+        try:
+            with open(cache_file[:-4] + ".json", "r") as f:
+                index_dict = {os.path.normcase(os.path.join(folder, k)): tuple(v) for k, v in json.load(f).items()}
+        except (OSError, ValueError):
+            index_dict = None
+        if not pix.isNull() and index_dict is not None:
+            return pix, index_dict
+    image, index_dict = build_icon_atlas(svg_path_list, replace_color, size)
+    pix = QtGui.QPixmap.fromImage(image)
+    if cache_file:
+        # 先写索引，图集文件存在时索引一定是完整的
+        try:
+            if not os.path.isdir(MCacheDict.disk_cache_folder):
+                os.makedirs(MCacheDict.disk_cache_folder)
+            with open(cache_file[:-4] + ".json", "w") as f:
+                json.dump({os.path.basename(k): v for k, v in index_dict.items()}, f)
+        except OSError:
+            return pix, index_dict
+        MCacheDict._save_disk_cache_file(pix, cache_file)
+    return pix, index_dict
+
+
+def get_user_cache_folder():
+    """Get the folder to cache the rendered icons of the current user."""
+    if sys.platform == "win32":
+        base_folder = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base_folder = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base_folder, "dayu_widgets", "icons")
+
+
 @contextlib.contextmanager
 def application(*args):
     app = QtWidgets.QApplication.instance()
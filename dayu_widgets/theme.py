@@ -1,14 +1,66 @@
 # Import built-in modules
 import string
+import weakref
+
+# Import third-party modules
+from qtpy import QtGui
 
 # Import local modules
 from dayu_widgets import DEFAULT_STATIC_FOLDER
 from dayu_widgets import utils
+from dayu_widgets.qt import MIcon
+from dayu_widgets.qt import MPixmap
 from dayu_widgets.qt import get_scale_factor
 
 
+_THEME_SIZE_CACHE = {}  # (scale_factor_x, scale_factor_y) -> size dict
+_current_theme_size = None
+_watched_app = None
+_watched_screen = None
+
+
 def get_theme_size():
-    scale_factor_x, scale_factor_y = get_scale_factor()
+    """
+    Get the size setting of the current screen DPI.
+    :return: a new dict, changing it does not affect the theme
+    """
+    return dict(_get_theme_size())
+
+
+def clear_theme_size_cache(*args):
+    """Compute the size setting again on the next access, called when the screen DPI changes."""
+    global _current_theme_size
+    _current_theme_size = None
+
+
+def _get_theme_size():
+    """Get the cached size dict of the current screen DPI, it is shared, do not change it."""
+    global _current_theme_size
+    if _current_theme_size is None:
+        scale_factor = get_scale_factor()
+        if scale_factor not in _THEME_SIZE_CACHE:
+            _THEME_SIZE_CACHE[scale_factor] = _make_theme_size(*scale_factor)
+        _current_theme_size = _THEME_SIZE_CACHE[scale_factor]
+        _watch_screen_dpi()
+    return _current_theme_size
+
+
+def _watch_screen_dpi():
+    """Clear the current size setting when the primary screen or its DPI changes."""
+    global _watched_app, _watched_screen
+    app = QtGui.QGuiApplication.instance()
+    if app is None or not hasattr(app, "primaryScreen"):
+        return
+    if app is not _watched_app:
+        _watched_app = app
+        app.primaryScreenChanged.connect(clear_theme_size_cache)
+    screen = app.primaryScreen()
+    if screen is not None and screen is not _watched_screen:
+        _watched_screen = screen
+        screen.logicalDotsPerInchChanged.connect(clear_theme_size_cache)
+
+
+def _make_theme_size(scale_factor_x, scale_factor_y):
     return {
         "border_radius_large": int(6 * scale_factor_x),
         "border_radius_base": int(4 * scale_factor_x),
@@ -104,9 +156,30 @@ class MTheme(object):
     gold = "#faad14"
     female_color = "#ef5b97"
     male_color = "#4ebbff"
+    _stylesheet_cache = None  # (size dict, rendered stylesheet)
+    _init_args = None  # (theme, primary color) before initialized
+    _application_stylesheet = None
 
     def __init__(self, theme="light", primary_color=None):
         super(MTheme, self).__init__()
+        self._styled_widget_set = weakref.WeakSet()
+        # 推迟到第一次使用时再初始化，导入 dayu_widgets 时不需要读取样式表、生成颜色
+        self._init_args = (theme, primary_color)
+
+    def get(self, name, default=None):
+        """
+        Get the theme setting by name, like dict.get.
+        :param name: str, eg. "error_color"
+        :param default: returned when the setting does not exist
+        :return: the setting value
+        """
+        if self._init_args is not None:
+            self._init_theme()
+        return vars(self).get(name, default)
+
+    def _init_theme(self):
+        theme, primary_color = self._init_args
+        self._init_args = None
         default_qss_file = utils.get_static_file("main.qss")
         with open(default_qss_file, "r") as f:
             self.default_qss = QssTemplate(f.read())
@@ -254,11 +327,21 @@ class MTheme(object):
         self.h3_size = int(self.font_size_base * 1.71)
         self.h4_size = int(self.font_size_base * 1.41)
 
-    def __getattribute__(self, item):
-        try:
-            return object.__getattribute__(self, item)
-        except AttributeError:
-            return get_theme_size().get(item, 0)
+    def __setattr__(self, key, value):
+        if not key.startswith("_"):
+            if self._init_args is not None:
+                self._init_theme()
+            # 主题的设置变了，之前渲染好的样式表不能再用
+            object.__setattr__(self, "_stylesheet_cache", None)
+        object.__setattr__(self, key, value)
+
+    def __getattr__(self, item):
+        # 只在找不到属性时调用
+        if self._init_args is not None:
+            self._init_theme()
+            return getattr(self, item)
+        # 尺寸相关的属性从缓存的尺寸表里取
+        return _get_theme_size().get(item, 0)
 
     def _dark(self):
         self.title_color = "#ffffff"
@@ -294,19 +377,73 @@ class MTheme(object):
         self.mask_color = utils.fade_color(self.background_color, "90%")
         self.toast_color = "#333333"
 
+    def get_stylesheet(self):
+        """
+        Get the stylesheet rendered with the current theme setting.
+        It is rendered once and cached until the theme setting or the screen DPI changes.
+        :return: str
+        """
+        if self._init_args is not None:
+            self._init_theme()
+        size_dict = _get_theme_size()
+        cache = self._stylesheet_cache
+        if cache is None or cache[0] is not size_dict:
+            setting_dict = dict(size_dict)
+            setting_dict.update(vars(self))
+            stylesheet = QssTemplate(self.default_qss.template).substitute(setting_dict)
+            cache = self._stylesheet_cache = (size_dict, stylesheet)
+        return cache[1]
+
     def apply(self, widget):
-        size_dict = get_theme_size()
-        size_dict.update(vars(self))
-        widget.setStyleSheet(self.default_qss.substitute(size_dict))
+        """
+        Set the stylesheet of the theme to the widget.
+        Apply to a top level widget, the children inherit the stylesheet instead of carrying their own copy.
+        Apply to the QApplication instance, the widgets applied later and the classes decorated by deco
+        inherit it instead of setting their own stylesheet.
+        :param widget: QWidget or QApplication
+        :return: None
+        """
+        if widget is QtGui.QGuiApplication.instance():
+            self._application_stylesheet = self.get_stylesheet()
+            widget.setStyleSheet(self._application_stylesheet)
+        elif self.get_stylesheet() is not self._application_stylesheet:
+            # 已经设置到 QApplication 上的话，直接继承，不需要每个实例再解析一遍，switch 时也不用逐个重新设置
+            widget.setStyleSheet(self.get_stylesheet())
+            self._styled_widget_set.add(widget)
+
+    def switch(self, theme=None, primary_color=None):
+        """
+        Switch the theme and the primary color at runtime, and restyle the live widgets.
+        The stylesheet is rendered once, then set to the QApplication instance and the widgets styled by this theme.
+        Apply the theme to the QApplication instance, so all the widgets are restyled in one pass.
+        The cached icons of MIcon and MPixmap are cleared, the icons got later use the new color.
+        :param theme: "light" or "dark", None to keep the current one
+        :param primary_color: color string, None to keep the current one
+        :return: None
+        """
+        if primary_color is not None:
+            self.set_primary_color(primary_color)
+        if theme is not None:
+            self.set_theme(theme)
+        MIcon.clear()
+        MPixmap.clear()
+        app = QtGui.QGuiApplication.instance()
+        if app is not None and self._application_stylesheet is not None:
+            self.apply(app)
+        for widget in list(self._styled_widget_set):
+            try:
+                widget.setStyleSheet(self.get_stylesheet())
+            except RuntimeError:
+                # C++ 对象已经被删除了
+                self._styled_widget_set.discard(widget)
 
     def deco(self, cls):
         original_init__ = cls.__init__
 
         def my__init__(instance, *args, **kwargs):
             original_init__(instance, *args, **kwargs)
-            size_dict = get_theme_size()
-            size_dict.update(vars(self))
-            instance.setStyleSheet(self.default_qss.substitute(size_dict))
+            # 被装饰的类通常是包含其他控件的容器，需要完整的样式表，子控件才能继承到它们的规则
+            self.apply(instance)
 
         def polish(instance):
             instance.style().polish(instance)
@@ -5,9 +5,12 @@ Some helper functions for handling color and formatter.
 # Import built-in modules
 import collections
 import datetime as dt
+from functools import lru_cache
 from functools import singledispatch
 import math
 import os
+import re
+import struct
 
 # Import third-party modules
 from qtpy import QtCore
@@ -24,26 +27,76 @@ from dayu_widgets.qt import get_scale_factor
 ItemViewMenuEvent = collections.namedtuple("ItemViewMenuEvent", ["view", "selection", "extra"])
 
 
+_static_file_index_dict = {}  # folder -> {normcase file name: full path}
+_static_folder_tuple = None  # 建索引时的 static 目录，CUSTOM_STATIC_FOLDERS 变化时重建
+_static_scan_count = 0
+
+
+def _get_static_folder_tuple():
+    global _static_folder_tuple
+    folder_tuple = (DEFAULT_STATIC_FOLDER,) + tuple(CUSTOM_STATIC_FOLDERS)
+    if folder_tuple != _static_folder_tuple:
+        _static_file_index_dict.clear()
+        _static_folder_tuple = folder_tuple
+    return folder_tuple
+
+
+def _get_static_folder_index(folder):
+    index_dict = _static_file_index_dict.get(folder, None)
+    if index_dict is None:
+        index_dict = {}
+        try:
+            for entry in os.scandir(folder):
+                if entry.is_file():
+                    index_dict[os.path.normcase(entry.name)] = os.path.join(folder, entry.name)
+        except OSError:
+            pass
+        _static_file_index_dict[folder] = index_dict
+    return index_dict
+
+
+def rescan_static_files():
+    """
+    Rebuild the file index of the static folders, call it after adding files into these folders.
+    The index is rebuilt automatically when CUSTOM_STATIC_FOLDERS changes.
+    """
+    global _static_folder_tuple, _static_scan_count
+    _static_file_index_dict.clear()
+    _static_folder_tuple = None
+    _static_scan_count += 1
+
+
+def get_static_index_key():
+    """
+    Get a key that changes when the static file index changes,
+    so the caches of the resolved paths know when to be cleared.
+    """
+    return _get_static_folder_tuple(), _static_scan_count
+
+
 def get_static_file(path):
     """
     A convenient function to get the file in dayu_widgets/static,
     User just give the name of the file.
     eg. get_static_file('add_line.svg')
+    The file names in the static folders are looked up in an index, instead of checking the file system each time.
     :param path: file name
     :return: if input file found, return the full path, else return None
     """
     if not isinstance(path, str):
         raise TypeError("Input argument 'path' should be str type, " "but get {}".format(type(path)))
-    full_path = next(
-        (
-            os.path.join(prefix, path)
-            for prefix in ["", DEFAULT_STATIC_FOLDER] + CUSTOM_STATIC_FOLDERS
-            if os.path.isfile(os.path.join(prefix, path))
-        ),
-        path,
-    )
-    if os.path.isfile(full_path):
-        return full_path
+    folder_tuple = _get_static_folder_tuple()
+    if os.path.isfile(path):
+        return path
+    if not path:
+        return None
+    is_file_name = os.path.basename(path) == path
+    for folder in folder_tuple:
+        if is_file_name:
+            if os.path.normcase(path) in _get_static_folder_index(folder):
+                return os.path.join(folder, path)
+        elif os.path.isfile(os.path.join(folder, path)):
+            return os.path.join(folder, path)
     return None
 
 
@@ -75,6 +128,120 @@ def from_list_to_nested_dict(input_arg, sep="/"):
     return result
 
 
+HEX_COLOR_PATTERN = re.compile(r"#([0-9a-fA-F]{3}|[0-9a-fA-F]{6}|[0-9a-fA-F]{8})")
+USHRT_MAX = 65535
+FLOAT32_STRUCT_LIST = [struct.Struct("f" * count) for count in range(4)]
+
+
+def _float32_list(*value_list):
+    """Round to single precision, QColor of Qt 6 computes in float."""
+    float32_struct = FLOAT32_STRUCT_LIST[len(value_list)]
+    return float32_struct.unpack(float32_struct.pack(*value_list))
+
+
+def _q_round_list(*value_list):
+    """Same as qRound of the float values, they are not negative here."""
+    return [int(value) for value in _float32_list(*(value + 0.5 for value in _float32_list(*value_list)))]
+
+
+def get_color_rgb(color):
+    """
+    Get the red, green and blue of the color string.
+    #RGB, #RRGGBB and #AARRGGBB are parsed in pure Python, other formats (eg. color names) by QColor.
+    :param color: string
+    :return: (red, green, blue), 0-255. (0, 0, 0) for invalid color, same as QColor
+    """
+    match = HEX_COLOR_PATTERN.fullmatch(color)
+    if match is None:
+        q_color = QtGui.QColor(color)
+        return q_color.red(), q_color.green(), q_color.blue()
+    hex_str = match.group(1)
+    if len(hex_str) == 3:
+        return tuple(int(char, 16) * 17 for char in hex_str)
+    return int(hex_str[-6:-4], 16), int(hex_str[-4:-2], 16), int(hex_str[-2:], 16)
+
+
+def _python_rgb_to_hsv(red, green, blue):
+    """Same as QColor.hue(), saturationF() and valueF() of Qt 6, hue is -1 for achromatic color."""
+    # QColor 内部用 16 位整数保存各个分量，用 float 计算，这里按相同的方式计算，保证结果完全一致
+    f = _float32_list
+    red, green, blue = red * 257, green * 257, blue * 257
+    max_value = max(red, green, blue)
+    delta = max_value - min(red, green, blue)
+    if delta == 0:
+        return -1, 0.0, f(max_value / float(USHRT_MAX))[0]
+    (saturation,) = _q_round_list(f(delta / float(max_value))[0] * USHRT_MAX)
+    if red == max_value:
+        (hue,) = f((green - blue) / float(delta))
+    else:
+        offset, diff = (2.0, blue - red) if green == max_value else (4.0, red - green)
+        (hue,) = f(offset + f(diff / float(delta))[0])
+    (hue,) = f(hue * 60.0)
+    if hue < 0.0:
+        (hue,) = f(hue + 360.0)
+    (hue,) = _q_round_list(hue * 100)
+    saturation_f, value_f = f(saturation / float(USHRT_MAX), max_value / float(USHRT_MAX))
+    return hue // 100, saturation_f, value_f
+
+
+def _python_hsv_to_name(hue, saturation, value):
+    """Same as QColor.fromHsvF(hue, saturation, value).name() of Qt 6."""
+    # 每一步的结果都按 float 取整，同一步的多个值一起转换
+    f = _float32_list
+    hue, saturation, value = f(hue, saturation, value)
+    hue, saturation, value = _q_round_list(hue * 36000, saturation * USHRT_MAX, value * USHRT_MAX)
+    if saturation == 0:
+        rgb = (value, value, value)
+    else:
+        h, s, v = f(0.0 if hue == 36000 else hue / 6000.0, saturation / float(USHRT_MAX), value / float(USHRT_MAX))
+        i = int(h)
+        (d,) = f(h - i)
+        one_minus_s, s_d, one_minus_d = f(1.0 - s, s * d, 1.0 - d)
+        one_minus_s_d, s_one_minus_d = f(1.0 - s_d, s * one_minus_d)
+        (one_minus_s_one_minus_d,) = f(1.0 - s_one_minus_d)
+        p, q, t = f(v * one_minus_s, v * one_minus_s_d, v * one_minus_s_one_minus_d)
+        rgb = [(v, t, p), (q, v, p), (p, v, t), (p, q, v), (t, p, v), (v, p, q)][i]
+        rgb = _q_round_list(*(component * USHRT_MAX for component in rgb))
+    # 与 QColor 一样，16 位转回 8 位
+    return "#{:02x}{:02x}{:02x}".format(*((component + 128) // 257 for component in rgb))
+
+
+# 计算结果刚好落在舍入边界上的颜色，用来检查纯 Python 的实现和当前 Qt 的 QColor 是否一致
+HSV_PROBE_RGB_LIST = [(9, 9, 30), (9, 30, 24), (245, 34, 45), (160, 217, 17), (114, 46, 209), (255, 183, 178)]
+HSV_PROBE_HSV_LIST = [(0.5, 0.7, 0.11764705), (0.99, 0.06, 1.0), (0.3342618, 0.5, 0.5), (1.0, 1.0, 1.0)]
+
+
+@lru_cache(maxsize=1)
+def _use_python_hsv():
+    """
+    Whether the pure Python HSV conversion gives the same result as QColor of the installed Qt.
+    Qt 5 computes in double instead of float, QColor is used there.
+    """
+    if int(QtCore.qVersion().split(".")[0]) < 6:
+        return False
+    for rgb in HSV_PROBE_RGB_LIST:
+        q_color = QtGui.QColor(*rgb)
+        if _python_rgb_to_hsv(*rgb) != (q_color.hue(), q_color.saturationF(), q_color.valueF()):
+            return False
+    return all(_python_hsv_to_name(*hsv) == QtGui.QColor.fromHsvF(*hsv).name() for hsv in HSV_PROBE_HSV_LIST)
+
+
+def _rgb_to_hsv(red, green, blue):
+    """Get (hue, saturationF, valueF) of the color, the same as QColor, hue is -1 for achromatic color."""
+    if _use_python_hsv():
+        return _python_rgb_to_hsv(red, green, blue)
+    q_color = QtGui.QColor(red, green, blue)
+    return q_color.hue(), q_color.saturationF(), q_color.valueF()
+
+
+def _hsv_to_name(hue, saturation, value):
+    """Same as QColor.fromHsvF(hue, saturation, value).name()."""
+    if _use_python_hsv():
+        return _python_hsv_to_name(hue, saturation, value)
+    return QtGui.QColor.fromHsvF(hue, saturation, value).name()
+
+
+@lru_cache(maxsize=256)
 def fade_color(color, alpha):
     """
     Fade color with given alpha.
@@ -83,8 +250,19 @@ def fade_color(color, alpha):
     :param alpha: string, percent 'number%'
     :return: qss/css color format rgba(r, g, b, a)
     """
-    q_color = QtGui.QColor(color)
-    return "rgba({}, {}, {}, {})".format(q_color.red(), q_color.green(), q_color.blue(), alpha)
+    return "rgba({}, {}, {}, {})".format(*get_color_rgb(color), alpha)
+
+
+@lru_cache(maxsize=64)
+def generate_color_palette(primary_color):
+    """
+    Generate the 10 colors from light to dark of the primary color at once, the result is cached.
+    Reference to ant-design color system algorithm.
+    :param primary_color: base color string. #RRGGBB
+    :return: tuple of 10 color strings, the step index - 1 is the index of the tuple
+    """
+    hsv = _rgb_to_hsv(*get_color_rgb(primary_color))
+    return tuple(_generate_color(hsv, index) for index in range(1, 11))
 
 
 def generate_color(primary_color, index):
@@ -94,6 +272,16 @@ def generate_color(primary_color, index):
     :param index: color step. 1-10 from light to dark
     :return: result color
     """
+    if isinstance(primary_color, str):
+        if 1 <= index <= 10:
+            return generate_color_palette(primary_color)[index - 1]
+        hsv = _rgb_to_hsv(*get_color_rgb(primary_color))
+    else:
+        hsv = (primary_color.hue(), primary_color.saturationF(), primary_color.valueF())
+    return _generate_color(hsv, index)
+
+
+def _generate_color(hsv, index):
     # 这里生成颜色的算法，来自 Ant Design, 只做了语言的转换，和颜色的类型的转换，没对算法做任何修改
     # https://github.com/ant-design/ant-design/blob/master/components/style/color/colorPalette.less
     # https://zhuanlan.zhihu.com/p/32422584
@@ -106,8 +294,7 @@ def generate_color(primary_color, index):
     light_color_count = 5
     dark_color_count = 4
 
-    def _get_hue(color, i, is_light):
-        h_comp = color.hue()
+    def _get_hue(h_comp, i, is_light):
         if 60 <= h_comp <= 240:
             hue = h_comp - hue_step * i if is_light else h_comp + hue_step * i
         else:
@@ -118,8 +305,8 @@ def generate_color(primary_color, index):
             hue -= 359
         return hue / 359.0
 
-    def _get_saturation(color, i, is_light):
-        s_comp = color.saturationF() * 100
+    def _get_saturation(s_comp, i, is_light):
+        s_comp = s_comp * 100
         if is_light:
             saturation = s_comp - saturation_step * i
         elif i == dark_color_count:
@@ -132,20 +319,19 @@ def generate_color(primary_color, index):
         saturation = max(6.0, saturation)
         return round(saturation * 10) / 1000.0
 
-    def _get_value(color, i, is_light):
-        v_comp = color.valueF()
+    def _get_value(v_comp, i, is_light):
         if is_light:
             return min((v_comp * 100 + brightness_step1 * i) / 100, 1.0)
         return max((v_comp * 100 - brightness_step2 * i) / 100, 0.0)
 
     light = index <= 6
-    hsv_color = QtGui.QColor(primary_color) if isinstance(primary_color, str) else primary_color
+    h_comp, s_comp, v_comp = hsv
     index = light_color_count + 1 - index if light else index - light_color_count - 1
-    return QtGui.QColor.fromHsvF(
-        _get_hue(hsv_color, index, light),
-        _get_saturation(hsv_color, index, light),
-        _get_value(hsv_color, index, light),
-    ).name()
+    return _hsv_to_name(
+        _get_hue(h_comp, index, light),
+        _get_saturation(s_comp, index, light),
+        _get_value(v_comp, index, light),
+    )
 
 
 @singledispatch
@@ -216,6 +402,23 @@ def apply_formatter(formatter, *args, **kwargs):
     return formatter
 
 
+def compile_formatter(formatter):
+    """
+    Resolve the formatter type only once.
+    Return a function which gives the same result as apply_formatter(formatter, *args, **kwargs).
+    Used for QAbstractModel to avoid checking the formatter type in every data call.
+    :param formatter: formatter. It can be None/dict/callable or just any type of value
+    :return: a function
+    """
+    if formatter is None:
+        return lambda *args, **kwargs: args[0]
+    elif isinstance(formatter, dict):
+        return lambda *args, **kwargs: formatter.get(args[0], None)
+    elif callable(formatter):
+        return formatter
+    return lambda *args, **kwargs: formatter
+
+
 @singledispatch
 def display_formatter(input_other_type):
     """
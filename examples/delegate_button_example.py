@@ -22,8 +22,8 @@ class MPushButtonDelegate(QtWidgets.QStyledItemDelegate):
 
     def editorEvent(self, pEvent, model, option, index):
         if pEvent.type() == QtCore.QEvent.MouseButtonRelease:
-            index = utils.real_index(index)
-            self.sig_clicked.emit(index.internalPointer())
+            # 列式存储时 internalPointer 是整张表的数据，要用 get_data_obj 取这一行
+            self.sig_clicked.emit(utils.real_model(index).get_data_obj(utils.real_index(index)))
             return True
         return False
 
@@ -0,0 +1,71 @@
+"""
+Test the lazy import of dayu_widgets.
+Run with `pytest tests/test_import_time.py -s` to see the import time.
+"""
+
+# Import built-in modules
+import os
+import subprocess
+import sys
+
+# Import third-party modules
+import pytest
+
+# Import local modules
+import dayu_widgets
+
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run_python(code):
+    env = dict(os.environ, PYTHONPATH=ROOT_FOLDER, QT_QPA_PLATFORM="offscreen")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], env=env, capture_output=True, text=True, check=True
+    )
+    return result.stdout, result.stderr
+
+
+def test_lazy_import():
+    """Importing dayu_widgets should not import the widget modules or initialize the theme."""
+    stdout, _ = _run_python(
+        "import sys\n"
+        "import dayu_widgets\n"
+        "print(sorted(name for name in sys.modules if name.startswith('dayu_widgets.')))\n"
+        "print(dayu_widgets.dayu_theme._init_args is not None)\n"
+        "from dayu_widgets import MPushButton\n"
+        "print('dayu_widgets.push_button' in sys.modules, 'dayu_widgets.item_view' in sys.modules)\n"
+    )
+    module_list, theme_lazy, widget_imported = stdout.splitlines()
+    assert "dayu_widgets.item_view" not in module_list
+    assert "dayu_widgets.push_button" not in module_list
+    assert theme_lazy == "True"
+    assert widget_imported == "True False"
+
+
+def test_lazy_attribute():
+    """The public names are imported on first access."""
+    assert dayu_widgets.MLabel.__name__ == "MLabel"
+    assert set(dayu_widgets.__all__) <= set(dir(dayu_widgets))
+    with pytest.raises(AttributeError):
+        dayu_widgets.MNotExist
+
+
+@pytest.mark.benchmark
+def test_benchmark_import_time():
+    """Track the import time of dayu_widgets with `python -X importtime`."""
+    _, stderr = _run_python("import dayu_widgets; from dayu_widgets import MLabel, MPushButton")
+    time_dict = {}
+    for line in stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            time_dict[name.strip()] = int(cumulative)
+    print(
+        "\nimport dayu_widgets: {:.1f} ms, dayu_widgets.theme: {:.1f} ms, qtpy: {:.1f} ms".format(
+            time_dict["dayu_widgets"] / 1000.0, time_dict["dayu_widgets.theme"] / 1000.0, time_dict["qtpy"] / 1000.0
+        )
+    )
+    assert "dayu_widgets.item_view" not in time_dict
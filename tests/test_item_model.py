@@ -0,0 +1,665 @@
+"""
+Test MTableModel and MSortFilterModel.
+"""
+
+# Import built-in modules
+import array
+
+# Import third-party modules
+import pytest
+from qtpy import QtCore
+from qtpy import QtGui
+
+# Import local modules
+from dayu_widgets.item_model import MSortFilterModel
+from dayu_widgets.item_model import MTableModel
+
+
+HEADER_LIST = [
+    {"key": "name", "label": "Name", "searchable": True},
+    {"key": "age", "label": "Age"},
+]
+
+
+def _make_model(data_list=None):
+    model = MTableModel()
+    model.set_header_list(HEADER_LIST)
+    model.set_data_list(data_list or [])
+    return model
+
+
+def test_append_many_insert_rows(qtbot):
+    """append_many should insert all rows with one rowsInserted and never reset the model."""
+    model = _make_model([{"name": "a", "age": 1}])
+    reset_list = []
+    inserted_list = []
+    model.modelReset.connect(lambda: reset_list.append(True))
+    model.rowsInserted.connect(lambda parent, first, last: inserted_list.append((first, last)))
+
+    model.append_many({"name": str(i), "age": i} for i in range(10))
+    model.append({"name": "last", "age": 100})
+    model.append_many([])
+
+    assert model.rowCount() == 12
+    assert inserted_list == [(1, 10), (11, 11)]
+    assert reset_list == []
+    assert model.data(model.index(11, 0)) == "last"
+
+
+def test_fetch_more_in_batch(qtbot):
+    """fetchMore should pull fetch_count rows from the generator and insert them together."""
+    model = _make_model()
+    model.fetch_count = 4
+    inserted_list = []
+    model.rowsInserted.connect(lambda parent, first, last: inserted_list.append((first, last)))
+    model.data_generator = iter([{"name": str(i), "age": i} for i in range(10)])
+
+    assert model.canFetchMore(QtCore.QModelIndex())
+    while model.canFetchMore(QtCore.QModelIndex()):
+        model.fetchMore()
+
+    assert model.rowCount() == 10
+    assert inserted_list == [(0, 3), (4, 7), (8, 9)]
+    assert model.data_generator is None
+
+
+def test_set_data_list_with_generator(qtbot):
+    """Python 3 generator should be streamed into the model in batch."""
+    model = _make_model()
+    reset_list = []
+    model.modelReset.connect(lambda: reset_list.append(True))
+    model.set_data_list({"name": str(i), "age": i} for i in range(1000))
+    assert reset_list == [True]
+    assert model.rowCount() == 0
+    qtbot.waitUntil(lambda: model.rowCount() == 1000)
+    assert model.data_generator is None
+    assert reset_list == [True]
+    assert model.data(model.index(999, 1)) == 999
+
+
+def test_set_data_list_with_async_generator(qtbot):
+    """Async iterator should be consumed in background and streamed into the model."""
+
+    async def _fetch():
+        for i in range(100):
+            yield {"name": str(i), "age": i}
+
+    model = _make_model()
+    model.set_data_list(_fetch())
+    qtbot.waitUntil(lambda: model.rowCount() == 100)
+    qtbot.waitUntil(lambda: model.data_generator is None)
+    assert model.data(model.index(99, 0)) == "99"
+
+
+def test_set_data_list_with_failed_generator(qtbot):
+    """The rows got before the iterator raises are inserted, and the feed stops."""
+
+    def _fetch():
+        for i in range(10):
+            yield {"name": str(i), "age": i}
+        raise ValueError("lost connection")
+
+    async def _async_fetch():
+        for i in range(10):
+            yield {"name": str(i), "age": i}
+        raise ValueError("lost connection")
+
+    for data_list in (_fetch(), _async_fetch()):
+        model = _make_model()
+        with qtbot.capture_exceptions() as exception_list:
+            model.set_data_list(data_list)
+            qtbot.waitUntil(lambda: model.data_generator is None)
+        assert model.rowCount() == 10
+        assert not model.timer.isActive()
+        assert [type(exception[1]) for exception in exception_list] == [ValueError]
+
+
+def test_tree_parent_index(qtbot):
+    """parent() and index() should work with the row cache, also after rows are removed."""
+    leaf = {"name": "leaf", "age": 3}
+    child_list = [{"name": "child_{}".format(i), "age": i} for i in range(5)]
+    child_list[3]["children"] = [leaf]
+    top_list = [{"name": "top_{}".format(i), "age": i, "children": []} for i in range(3)]
+    top_list[1]["children"] = child_list
+    model = _make_model(top_list)
+
+    # _parent is written at load time
+    assert leaf["_parent"] is child_list[3]
+    assert child_list[3]["_parent"] is top_list[1]
+
+    top_index = model.index(1, 0)
+    child_index = model.index(3, 0, top_index)
+    leaf_index = model.index(0, 1, child_index)
+    assert leaf_index.internalPointer() is leaf
+    assert leaf_index.parent() == child_index
+    assert child_index.parent() == top_index
+    assert not top_index.parent().isValid()
+
+    model.remove(top_list[0])
+    assert model.index(0, 0).internalPointer() is top_list[0]
+    assert model.parent(model.index(3, 0, model.index(0, 0))).row() == 0
+
+    # data changed outside the model should still be found
+    child_list.insert(0, {"name": "new", "age": 0})
+    assert model.parent(model.index(0, 0, model.index(4, 0, model.index(0, 0)))).row() == 4
+
+
+def test_data_with_header_formatter(qtbot):
+    """data() should apply the header config and the model formatter of each role."""
+    header_list = [
+        {
+            "key": "name",
+            "label": "Name",
+            "checkable": True,
+            "color": lambda x, y: "#ff0000" if y["age"] > 10 else None,
+            "icon": "user_fill.svg",
+            "tooltip": lambda x, y: "{} is {}".format(x, y["age"]),
+        },
+        {"key": "age", "label": "Age", "display": lambda x, y: x * 2, "alignment": "right"},
+        {"key": "score", "label": "Score", "bg_color": {1.5: "#00ff00"}},
+    ]
+    model = MTableModel()
+    model.set_header_list(header_list)
+    model.set_data_list([{"name": "a", "age": 18, "score": 1.5}, {"name": "b", "age": 2, "score": None}])
+
+    name_index = model.index(0, 0)
+    assert model.data(name_index) == "a"
+    assert model.data(name_index, QtCore.Qt.ToolTipRole) == "a is 18"
+    assert model.data(name_index, QtCore.Qt.ForegroundRole).name() == "#ff0000"
+    assert not model.data(model.index(1, 0), QtCore.Qt.ForegroundRole).isValid()
+    assert model.data(name_index, QtCore.Qt.CheckStateRole) == QtCore.Qt.Unchecked
+    assert not model.data(name_index, QtCore.Qt.DecorationRole).isNull()
+    assert model.data(name_index, QtCore.Qt.FontRole) is None
+    assert model.data(model.index(0, 1)) == 36
+    assert model.data(model.index(0, 1), QtCore.Qt.EditRole) == 18
+    assert model.data(model.index(0, 1), QtCore.Qt.TextAlignmentRole) == QtCore.Qt.AlignRight
+    assert model.data(model.index(0, 1), QtCore.Qt.CheckStateRole) is None
+    assert model.data(model.index(0, 2)) == "1.50"
+    assert model.data(model.index(1, 2)) == "--"
+    assert model.data(model.index(0, 2), QtCore.Qt.BackgroundRole).name() == "#00ff00"
+
+
+def test_value_cache(qtbot):
+    """The cell value cache should be bounded and invalidated by setData/remove/set_data_list."""
+    model = _make_model([{"name": str(i), "age": i} for i in range(5)])
+    assert model.cache_info() == (0, 0, 0, 0)
+    model.data(model.index(0, 0))
+    assert model.cache_info().misses == 0
+
+    model.set_cache_size(4)
+    index = model.index(0, 0)
+    assert model.data(index) == "0"
+    assert model.data(index) == "0"
+    assert model.data(index, QtCore.Qt.EditRole) == "0"
+    assert model.cache_info() == (1, 2, 4, 2)
+
+    model.setData(index, "new")
+    assert model.data(index) == "new"
+    assert model.data(index, QtCore.Qt.EditRole) == "new"
+    assert model.cache_info() == (1, 4, 4, 2)
+
+    for row in range(5):
+        model.data(model.index(row, 1))
+    assert model.cache_info().currsize == 4
+
+    last_obj = model.get_data_list()[4]
+    model.data(model.index(4, 0))
+    currsize = model.cache_info().currsize
+    model.remove(last_obj)
+    assert model.cache_info().currsize == currsize - 2
+
+    model.set_data_list([{"name": "x", "age": 1}])
+    assert model.cache_info().currsize == 0
+    assert model.data(model.index(0, 0)) == "x"
+
+
+def test_value_cache_header_select_all(qtbot):
+    """The cache is cleared when the data is changed directly and the model is reset, eg. select all of the header."""
+    # Import local modules
+    from dayu_widgets.header_view import MHeaderView
+
+    header_list = [{"key": "name", "label": "Name", "checkable": True}]
+    model = MTableModel()
+    model.set_header_list(header_list)
+    model.set_data_list([{"name": str(i)} for i in range(5)])
+    model.set_cache_size(100)
+    header_view = MHeaderView(QtCore.Qt.Horizontal)
+    header_view.setModel(model)
+
+    def check_state_list():
+        return [model.data(model.index(row, 0), QtCore.Qt.CheckStateRole) for row in range(5)]
+
+    assert check_state_list() == [QtCore.Qt.Unchecked] * 5
+    header_view._slot_set_select(0, QtCore.Qt.Checked)
+    assert check_state_list() == [QtCore.Qt.Checked] * 5
+
+    # dataChanged without a valid range clears the whole cache
+    model.get_data_list()[0]["name_checked"] = QtCore.Qt.Unchecked
+    model.dataChanged.emit(QtCore.QModelIndex(), QtCore.QModelIndex())
+    assert check_state_list() == [QtCore.Qt.Unchecked] + [QtCore.Qt.Checked] * 4
+
+
+def test_set_data_columns(qtbot):
+    """Columnar data should work the same as a list of dict."""
+    # Import built-in modules
+    import array
+
+    header_list = [
+        {"key": "name", "label": "Name", "checkable": True},
+        {"key": "age", "label": "Age", "color": lambda x, y: "#ff0000" if y["name"] == "b" else "#00ff00"},
+    ]
+    model = MTableModel()
+    model.set_header_list(header_list)
+    model.set_data_columns({"name": ["a", "b", "c"], "age": array.array("q", [1, 2, 3])})
+
+    assert model.rowCount() == 3
+    assert model.columnCount() == 2
+    index = model.index(1, 1)
+    assert index.isValid()
+    assert not index.parent().isValid()
+    assert not model.hasChildren(index)
+    assert not model.index(3, 0).isValid()
+    assert model.data(index) == 2
+    assert model.data(index, QtCore.Qt.ForegroundRole).name() == "#ff0000"
+    assert model.get_data_obj(index) == {"name": "b", "age": 2}
+
+    model.set_cache_size(10)
+    assert model.data(model.index(0, 0)) == "a"
+    model.setData(model.index(0, 0), "new")
+    model.setData(model.index(0, 0), QtCore.Qt.Checked, QtCore.Qt.CheckStateRole)
+    assert model.data(model.index(0, 0)) == "new"
+    assert model.data(model.index(0, 0), QtCore.Qt.CheckStateRole) == QtCore.Qt.Checked
+    assert model.data(model.index(1, 0), QtCore.Qt.CheckStateRole) == QtCore.Qt.Unchecked
+
+    model.append_many([{"name": "d", "age": 4}])
+    assert model.rowCount() == 4
+    assert model.data(model.index(3, 1)) == 4
+
+    # a value that does not fit the array column raises before the rows are inserted
+    insert_list = []
+    model.rowsAboutToBeInserted.connect(lambda *args: insert_list.append(args))
+    with pytest.raises(TypeError):
+        model.append_many([{"name": "e", "age": None}])
+    assert not insert_list
+    assert model.rowCount() == 4
+
+    assert model.data(model.index(2, 0)) == "c"
+    model.remove(model.get_data_obj(model.index(1, 0)))
+    assert model.rowCount() == 3
+    assert [model.data(model.index(row, 0)) for row in range(3)] == ["new", "c", "d"]
+    assert list(model.get_data_list().columns["age"]) == [1, 3, 4]
+    with pytest.raises(ValueError):
+        model.remove({"name": "b", "age": 2})
+
+    model.set_data_list([{"name": "x", "age": 1}])
+    assert model.data(model.index(0, 0)) == "x"
+
+
+def test_set_data_columns_header_select(qtbot):
+    """Select all and invert of the header write the check state of columnar rows."""
+    # Import local modules
+    from dayu_widgets.header_view import MHeaderView
+
+    source_model = MTableModel()
+    source_model.set_header_list([{"key": "name", "label": "Name", "checkable": True}])
+    source_model.set_data_columns({"name": ["a", "b", "c"]})
+    model = MSortFilterModel()
+    model.set_header_list(source_model.header_list)
+    model.setSourceModel(source_model)
+    header_view = MHeaderView(QtCore.Qt.Horizontal)
+    header_view.setModel(model)
+
+    def check_state_list():
+        return [source_model.data(source_model.index(row, 0), QtCore.Qt.CheckStateRole) for row in range(3)]
+
+    header_view._slot_set_select(0, QtCore.Qt.Checked)
+    assert check_state_list() == [QtCore.Qt.Checked] * 3
+    source_model.setData(source_model.index(1, 0), QtCore.Qt.Unchecked, QtCore.Qt.CheckStateRole)
+    header_view._slot_set_select(0, None)
+    assert check_state_list() == [QtCore.Qt.Unchecked, QtCore.Qt.Checked, QtCore.Qt.Unchecked]
+
+
+def test_set_data_columns_numpy(qtbot):
+    """numpy columns keep their dtype when rows are appended and removed."""
+    numpy = pytest.importorskip("numpy")
+    model = MTableModel()
+    model.set_header_list([{"key": "name", "label": "Name"}, {"key": "frame", "label": "Frame"}])
+    model.set_data_columns({"name": ["a", "b", "c"], "frame": numpy.array([3, 1, 2])})
+    model.append_many([{"name": "d", "frame": 4}])
+    frame_column = model.get_data_list().columns["frame"]
+    assert isinstance(frame_column, numpy.ndarray)
+    assert frame_column.dtype == numpy.array([3]).dtype
+    assert frame_column.tolist() == [3, 1, 2, 4]
+    with pytest.raises(TypeError):
+        model.append_many([{"name": "e", "frame": None}])
+    assert model.rowCount() == 4
+
+    model.remove({"name": "b", "frame": 1})
+    assert model.get_data_list().columns["frame"].tolist() == [3, 2, 4]
+    assert model.get_sort_key_list(1) is None
+
+
+def test_sort_filter_model_columnar_remove(qtbot):
+    """The search index of columnar data follows the rows after a row in the middle is removed or appended."""
+    header_list = [{"key": "name", "label": "Name", "searchable": True}]
+    source_model = MTableModel()
+    source_model.set_header_list(header_list)
+    source_model.set_data_columns({"name": ["apple", "banana", "cherry", "mango"]})
+    model = MSortFilterModel()
+    model.set_header_list(header_list)
+    model.setSourceModel(source_model)
+    model.set_search_pattern("an")
+    assert [model.index(row, 0).data() for row in range(model.rowCount())] == ["banana", "mango"]
+    source_model.remove({"name": "apple"})
+    model.set_search_pattern("ch")
+    assert [model.index(row, 0).data() for row in range(model.rowCount())] == ["cherry"]
+    source_model.append_many([{"name": "peach"}])
+    assert [model.index(row, 0).data() for row in range(model.rowCount())] == ["cherry", "peach"]
+
+
+def _make_sort_filter_model(data_list):
+    header_list = [dict(attr_dict) for attr_dict in HEADER_LIST]
+    header_list.append({"key": "city", "label": "City", "searchable": True})
+    source_model = MTableModel()
+    source_model.set_header_list(header_list)
+    model = MSortFilterModel()
+    model.set_header_list(header_list)
+    model.setSourceModel(source_model)
+    source_model.set_data_list(data_list)
+    return source_model, model
+
+
+def _proxy_names(model, ordered=False):
+    name_list = [model.index(row, 0).data() for row in range(model.rowCount())]
+    return name_list if ordered else sorted(name_list)
+
+
+def test_sort_filter_model_search(qtbot):
+    """Search with plain text, regex and column filter, also after the source data changed."""
+    source_model, model = _make_sort_filter_model(
+        [
+            {"name": "Charles", "age": 18, "city": "Beijing"},
+            {"name": "Chad", "age": 20, "city": "Shanghai"},
+            {"name": "Alice", "age": 30, "city": "Chengdu"},
+            {"name": "Bob", "age": 40, "city": None},
+        ]
+    )
+    model.set_search_pattern("CH")
+    assert model.search_text == "ch"
+    assert _proxy_names(model) == ["Alice", "Chad", "Charles"]
+    model.set_search_pattern("^ch.*s$")
+    assert model.search_text is None
+    assert _proxy_names(model) == ["Charles"]
+    model.set_search_pattern("")
+    assert _proxy_names(model) == ["Alice", "Bob", "Chad", "Charles"]
+
+    model.set_filter_attr_pattern("age", "^[23]")
+    assert _proxy_names(model) == ["Alice", "Chad"]
+    model.set_filter_attr_pattern("age", "")
+
+    # the index should be updated when the source data changed or rows inserted
+    model.set_search_pattern("bo")
+    assert _proxy_names(model) == ["Bob"]
+    source_model.setData(source_model.index(3, 0), "Tom")
+    source_model.append({"name": "Bond", "age": 1, "city": "London"})
+    assert _proxy_names(model) == ["Bond"]
+
+
+class _CountingStr(str):
+    """A str which records the row name when it is searched."""
+
+    tested_list = []
+
+    def __contains__(self, item):
+        self.tested_list.append(self.split("\0")[0])
+        return super(_CountingStr, self).__contains__(item)
+
+
+def test_sort_filter_model_incremental_search(qtbot):
+    """Refining or loosening the search text should only test the rows which may change."""
+    source_model, model = _make_sort_filter_model(
+        [
+            {"name": "Charles", "age": 18, "city": "Beijing"},
+            {"name": "Chad", "age": 20, "city": "Shanghai"},
+            {"name": "Alice", "age": 30, "city": "Chengdu"},
+        ]
+    )
+    tested_list = _CountingStr.tested_list
+    model.set_search_pattern("ch")
+    assert _proxy_names(model) == ["Alice", "Chad", "Charles"]
+    for row_entry in model._text_index.values():
+        row_entry[1] = _CountingStr(row_entry[1])
+
+    model.set_search_pattern("cha")
+    assert _proxy_names(model) == ["Chad", "Charles"]
+    assert sorted(tested_list) == ["alice", "chad", "charles"]
+
+    del tested_list[:]
+    model.set_search_pattern("char")
+    assert _proxy_names(model) == ["Charles"]
+    assert sorted(tested_list) == ["chad", "charles"]
+
+    del tested_list[:]
+    model.set_search_pattern("ch")
+    assert _proxy_names(model) == ["Alice", "Chad", "Charles"]
+    assert sorted(tested_list) == ["alice", "chad"]
+
+
+def test_sort_filter_model_search_tree(qtbot):
+    """The parent should be kept when one of its children matches."""
+    source_model, model = _make_sort_filter_model(
+        [
+            {"name": "Seq", "age": 1, "city": None, "children": [{"name": "Shot", "age": 2, "city": None}]},
+            {"name": "Asset", "age": 3, "city": None},
+        ]
+    )
+    model.set_search_pattern("sho")
+    assert _proxy_names(model) == ["Seq"]
+    assert model.index(0, 0, model.index(0, 0)).data() == "Shot"
+
+    source_model.set_data_list([{"name": "Shot", "age": 1, "city": None}, {"name": "Asset", "age": 3, "city": None}])
+    assert _proxy_names(model) == ["Shot"]
+
+
+def test_sort_filter_model_standard_item_model(qtbot):
+    """The search index keeps a separate entry for each row of sources other than MTableModel."""
+    source_model = QtGui.QStandardItemModel()
+    for name in ("apple", "banana", "cherry"):
+        source_model.appendRow(QtGui.QStandardItem(name))
+    model = MSortFilterModel()
+    model.set_header_list([{"key": "name", "label": "Name", "searchable": True}])
+    model.setSourceModel(source_model)
+    model.set_search_pattern("an")
+    assert [model.index(row, 0).data() for row in range(model.rowCount())] == ["banana"]
+    source_model.insertRow(0, QtGui.QStandardItem("mango"))
+    assert sorted(model.index(row, 0).data() for row in range(model.rowCount())) == ["banana", "mango"]
+
+
+def test_sort_filter_model_async_standard_item_model(qtbot):
+    """Sources other than MTableModel are filtered and sorted synchronously in async mode."""
+    source_model = QtGui.QStandardItemModel()
+    for name in ("cherry", "apple", "banana", "mango"):
+        source_model.appendRow(QtGui.QStandardItem(name))
+    model = MSortFilterModel()
+    model.set_header_list([{"key": "name", "label": "Name", "searchable": True}])
+    model.setSourceModel(source_model)
+    loading_list = []
+    model.sig_loading_changed.connect(loading_list.append)
+    model.set_async(True)
+    model.set_search_pattern("an")
+    assert _proxy_names(model) == ["banana", "mango"]
+    model.sort(0, QtCore.Qt.DescendingOrder)
+    assert _proxy_names(model, ordered=True) == ["mango", "banana"]
+    source_model.appendRow(QtGui.QStandardItem("orange"))
+    assert _proxy_names(model, ordered=True) == ["orange", "mango", "banana"]
+    assert loading_list == []
+
+    # 换成 MTableModel 后，之后的筛选在后台线程计算
+    table_model = _make_model([{"name": "banana", "age": 1}, {"name": "apple", "age": 2}])
+    model.setSourceModel(table_model)
+    assert _proxy_names(model) == ["banana"]
+    model.set_search_pattern("pp")
+    qtbot.waitUntil(lambda: loading_list == [True, False])
+    assert _proxy_names(model) == ["apple"]
+    model.set_async(False)
+
+
+def test_sort_filter_model_async(qtbot):
+    """Filter and sort in the worker thread, then apply the result at once."""
+    source_model, model = _make_sort_filter_model(
+        [{"name": "item_{}".format(i), "age": i % 7, "city": "city_{}".format(i % 3)} for i in range(1000)]
+    )
+    loading_list = []
+    progress_list = []
+    model.sig_loading_changed.connect(loading_list.append)
+    model.sig_progress.connect(progress_list.append)
+    assert model.rowCount() == 1000
+    model.set_async(True)
+
+    model.set_search_pattern("city_1")
+    # the old result is kept until the new one is ready
+    assert model.rowCount() == 1000
+    qtbot.waitUntil(lambda: loading_list == [True, False])
+    assert model.rowCount() == 333
+    assert progress_list[-1] == 100
+
+    model.sort(1, QtCore.Qt.DescendingOrder)
+    qtbot.waitUntil(lambda: loading_list == [True, False, True, False])
+    age_list = [model.index(row, 1).data() for row in range(model.rowCount())]
+    assert model.rowCount() == 333
+    assert age_list == sorted(age_list, reverse=True)
+    # the source rows keep their order
+    assert source_model.index(0, 1).data() == 0
+
+    # stale jobs are dropped
+    model.set_search_pattern("item_99")
+    model.set_search_pattern("item_999")
+    qtbot.waitUntil(lambda: not model._async_loading)
+    assert [model.index(row, 0).data() for row in range(model.rowCount())] == ["item_999"]
+
+    model.set_search_pattern("")
+    assert model.rowCount() == 1000
+    model.set_async(False)
+
+
+def test_sort_filter_model_async_tree(qtbot):
+    """The async sort keys the top level rows, the children are sorted by the proxy too."""
+    source_model, model = _make_sort_filter_model(
+        [
+            {"name": "a", "age": 2, "children": [{"name": "a1", "age": 10}, {"name": "a2", "age": 9}]},
+            {"name": "b", "age": 1, "children": [{"name": "b1", "age": 3}, {"name": "b2", "age": 4}]},
+        ]
+    )
+    loading_list = []
+    model.sig_loading_changed.connect(loading_list.append)
+    model.set_async(True)
+    model.sort(1, QtCore.Qt.DescendingOrder)
+    qtbot.waitUntil(lambda: loading_list == [True, False])
+    assert _proxy_names(model, ordered=True) == ["a", "b"]
+    assert [model.index(row, 0, model.index(0, 0)).data() for row in range(2)] == ["a1", "a2"]
+    assert [model.index(row, 0, model.index(1, 0)).data() for row in range(2)] == ["b2", "b1"]
+    assert [source_model.index(row, 0).data() for row in range(2)] == ["a", "b"]
+    model.set_async(False)
+
+
+def test_sort_key(qtbot):
+    """Columns with sort_key are sorted by the raw value, the source rows keep their order."""
+    header_list = [
+        {"key": "name", "label": "Name", "searchable": True},
+        {"key": "age", "label": "Age", "sort_key": True, "display": lambda x, y: "{} years".format(x)},
+        {"key": "city", "label": "City", "sort_key": lambda value, data_obj: (value, data_obj["age"] or 0)},
+    ]
+    data_list = [
+        {"name": "a", "age": 10, "city": "x"},
+        {"name": "b", "age": 9, "city": "y"},
+        {"name": "c", "age": None, "city": "x"},
+        {"name": "d", "age": 100, "city": "y"},
+    ]
+    source_model = MTableModel()
+    source_model.set_header_list(header_list)
+    source_model.set_data_list(data_list)
+    model = MSortFilterModel()
+    model.set_header_list(header_list)
+    model.setSourceModel(source_model)
+    other_model = MSortFilterModel()
+    other_model.set_header_list(header_list)
+    other_model.setSourceModel(source_model)
+
+    # the display text "100 years" < "9 years", the raw value is used instead
+    model.sort(1, QtCore.Qt.AscendingOrder)
+    assert _proxy_names(model, ordered=True) == ["c", "b", "a", "d"]
+    model.sort(1, QtCore.Qt.DescendingOrder)
+    assert _proxy_names(model, ordered=True) == ["d", "a", "b", "c"]
+    model.sort(2, QtCore.Qt.AscendingOrder)
+    assert _proxy_names(model, ordered=True) == ["c", "a", "b", "d"]
+    # the source and the other proxy of the same source are not affected
+    assert [data_obj["name"] for data_obj in source_model.get_data_list()] == ["a", "b", "c", "d"]
+    assert _proxy_names(other_model, ordered=True) == ["a", "b", "c", "d"]
+
+    # columns without sort_key still use lessThan of the proxy
+    model.sort(0, QtCore.Qt.DescendingOrder)
+    assert _proxy_names(model, ordered=True) == ["d", "c", "b", "a"]
+
+    # -1 restores the source order
+    model.sort(-1)
+    assert _proxy_names(model, ordered=True) == ["a", "b", "c", "d"]
+
+
+def test_sort_key_dynamic(qtbot):
+    """The rows inserted or changed after sorting by a sort_key column are sorted again."""
+    header_list = [{"key": "name", "label": "Name"}, {"key": "age", "label": "Age", "sort_key": True}]
+    source_model = MTableModel()
+    source_model.set_header_list(header_list)
+    source_model.set_data_list([{"name": "a", "age": 3}, {"name": "b", "age": 1}, {"name": "c", "age": 2}])
+    model = MSortFilterModel()
+    model.set_header_list(header_list)
+    model.setSourceModel(source_model)
+    model.setDynamicSortFilter(True)
+
+    def age_list():
+        return [model.index(row, 1).data() for row in range(model.rowCount())]
+
+    model.sort(1)
+    assert age_list() == [1, 2, 3]
+    source_model.append({"name": "d", "age": 0})
+    assert age_list() == [0, 1, 2, 3]
+    key_list = model._sort_key_dict[1]
+    source_model.setData(source_model.index(3, 1), 5)
+    assert age_list() == [1, 2, 3, 5]
+    # only the key of the changed row is extracted again
+    assert model._sort_key_dict[1] is key_list
+    assert key_list == source_model.get_sort_key_list(1)
+    source_model.dataChanged.emit(None, None)
+    assert not model._sort_key_dict
+    model.sort(-1)
+    assert [model.index(row, 0).data() for row in range(4)] == ["a", "b", "c", "d"]
+
+
+def test_sort_key_columnar(qtbot):
+    """sort_key works with columnar data and tree data."""
+    header_list = [{"key": "name", "label": "Name"}, {"key": "age", "label": "Age", "sort_key": True}]
+    source_model = MTableModel()
+    source_model.set_header_list(header_list)
+    source_model.set_data_columns({"name": ["a", "b", "c", "d"], "age": array.array("i", [3, 1, 4, 2])})
+    model = MSortFilterModel()
+    model.set_header_list(header_list)
+    model.setSourceModel(source_model)
+    model.sort(1, QtCore.Qt.DescendingOrder)
+    assert _proxy_names(model, ordered=True) == ["c", "a", "d", "b"]
+    model.sort(1)
+    assert _proxy_names(model, ordered=True) == ["b", "d", "a", "c"]
+    source_model.append_many([{"name": "e", "age": 0}])
+    model.sort(1)
+    assert _proxy_names(model, ordered=True) == ["e", "b", "d", "a", "c"]
+    assert [source_model.index(row, 0).data() for row in range(5)] == ["a", "b", "c", "d", "e"]
+
+    source_model.set_data_list(
+        [
+            {"name": "a", "age": 2, "children": [{"name": "a1", "age": 10}, {"name": "a2", "age": 9}]},
+            {"name": "b", "age": 1, "children": []},
+        ]
+    )
+    model.sort(1)
+    assert _proxy_names(model, ordered=True) == ["b", "a"]
+    parent_index = model.index(1, 0)
+    assert [model.index(row, 0, parent_index).data() for row in range(2)] == ["a2", "a1"]
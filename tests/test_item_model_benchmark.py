@@ -0,0 +1,300 @@
+"""
+Benchmark MTableModel and MSortFilterModel.
+Run with `pytest tests/test_item_model_benchmark.py -s` to see the result.
+"""
+
+# Import built-in modules
+import re
+import time
+
+# Import third-party modules
+import pytest
+from qtpy import QtCore
+
+# Import local modules
+from dayu_widgets.item_model import MTableModel
+from dayu_widgets.item_model import SETTING_MAP
+from dayu_widgets.utils import apply_formatter
+from dayu_widgets.utils import get_obj_value
+
+
+pytestmark = pytest.mark.benchmark
+
+ROLE_LIST = (
+    QtCore.Qt.DisplayRole,
+    QtCore.Qt.DecorationRole,
+    QtCore.Qt.EditRole,
+    QtCore.Qt.ToolTipRole,
+    QtCore.Qt.FontRole,
+    QtCore.Qt.TextAlignmentRole,
+    QtCore.Qt.BackgroundRole,
+    QtCore.Qt.ForegroundRole,
+    QtCore.Qt.CheckStateRole,
+    QtCore.Qt.SizeHintRole,
+)
+
+
+def _legacy_data(model, index, role=QtCore.Qt.DisplayRole):
+    """The data() implementation before the accessors were compiled, as the baseline."""
+    attr_dict = model.header_list[index.column()]
+    data_obj = index.internalPointer()
+    attr = attr_dict.get("key")
+    if role in SETTING_MAP.keys():
+        formatter_from_config = attr_dict.get(SETTING_MAP[role].get("config"))
+        if not formatter_from_config and role not in [
+            QtCore.Qt.DisplayRole,
+            QtCore.Qt.EditRole,
+            QtCore.Qt.ToolTipRole,
+        ]:
+            return None
+        value = apply_formatter(formatter_from_config, get_obj_value(data_obj, attr), data_obj)
+        return apply_formatter(SETTING_MAP[role].get("formatter", None), value)
+    if role == QtCore.Qt.CheckStateRole and attr_dict.get("checkable", False):
+        state = get_obj_value(data_obj, attr + "_checked")
+        return QtCore.Qt.Unchecked if state is None else state
+    return None
+
+
+def _make_grid_model(row_count, column_count):
+    header_list = [{"key": "col_{}".format(c), "label": str(c)} for c in range(column_count)]
+    header_list[0].update({"checkable": True, "color": lambda x, y: "#f00"})
+    header_list[1].update({"alignment": "right"})
+    header_list[2].update({"display": lambda x, y: x * 100})
+    model = MTableModel()
+    model.set_header_list(header_list)
+    model.set_data_list(
+        [{"col_{}".format(c): (r * c if c % 2 else "text {}".format(r)) for c in range(column_count)}
+         for r in range(row_count)]
+    )
+    return model
+
+
+def _paint_grid(model, index_list, data_func):
+    start = time.perf_counter()
+    for index in index_list:
+        for role in ROLE_LIST:
+            data_func(index, role)
+    return time.perf_counter() - start
+
+
+def test_benchmark_repaint_visible_grid(qtbot):
+    """Repaint cost of a 100x20 visible grid, every cell is asked for all the common roles."""
+    model = _make_grid_model(100, 20)
+    index_list = [model.index(r, c) for r in range(100) for c in range(20)]
+    for index in index_list:
+        for role in ROLE_LIST:
+            if role != QtCore.Qt.DecorationRole:
+                assert model.data(index, role) == _legacy_data(model, index, role)
+
+    repeat = 5
+    legacy = min(_paint_grid(model, index_list, lambda i, r: _legacy_data(model, i, r)) for _ in range(repeat))
+    compiled = min(_paint_grid(model, index_list, model.data) for _ in range(repeat))
+    print("\n100x20 grid repaint, legacy: {:.2f} ms, compiled: {:.2f} ms".format(legacy * 1000, compiled * 1000))
+    assert compiled < legacy
+
+
+def test_benchmark_columnar_memory(qtbot):
+    """Memory of 200k flat rows, list of dict vs array columns."""
+    # Import built-in modules
+    import array
+    import tracemalloc
+
+    row_count = 200000
+    header_list = [{"key": key, "label": key} for key in ("id", "frame", "width", "height", "ratio")]
+
+    tracemalloc.start()
+    model = MTableModel()
+    model.set_header_list(header_list)
+    model.set_data_list(
+        [{"id": i, "frame": 1001 + i, "width": 1920, "height": 1080, "ratio": 1.5 * i} for i in range(row_count)]
+    )
+    dict_size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del model
+
+    tracemalloc.start()
+    model = MTableModel()
+    model.set_header_list(header_list)
+    model.set_data_columns(
+        {
+            "id": array.array("q", range(row_count)),
+            "frame": array.array("q", range(1001, 1001 + row_count)),
+            "width": array.array("q", [1920]) * row_count,
+            "height": array.array("q", [1080]) * row_count,
+            "ratio": array.array("d", (1.5 * i for i in range(row_count))),
+        }
+    )
+    columnar_size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(
+        "\n200k rows memory, list of dict: {:.1f} MB, columnar: {:.1f} MB".format(
+            dict_size / 1024.0 / 1024, columnar_size / 1024.0 / 1024
+        )
+    )
+    assert model.data(model.index(row_count - 1, 1)) == 1000 + row_count
+    assert columnar_size * 10 < dict_size
+
+
+class _LegacySortFilterModel(QtCore.QSortFilterProxyModel):
+    """The filterAcceptsRow of MSortFilterModel before the search index, as the baseline."""
+
+    def __init__(self, parent=None):
+        super(_LegacySortFilterModel, self).__init__(parent)
+        self.header_list = []
+        self.search_reg = None
+
+    def set_header_list(self, header_list):
+        self.header_list = header_list
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if self.search_reg:
+            for index, data_dict in enumerate(self.header_list):
+                if data_dict.get("searchable", False):
+                    model_index = self.sourceModel().index(source_row, index, source_parent)
+                    value = self.sourceModel().data(model_index)
+                    if value is not None and self.search_reg.search(str(value)) is not None:
+                        break
+            else:
+                return False
+        for index, data_dict in enumerate(self.header_list):
+            model_index = self.sourceModel().index(source_row, index, source_parent)
+            value = self.sourceModel().data(model_index)
+            reg_exp = data_dict.get("reg", None)
+            if reg_exp and value is not None and not reg_exp.search(str(value)):
+                return False
+        return True
+
+    def set_search_pattern(self, pattern):
+        self.search_reg = re.compile(pattern, re.IGNORECASE) if pattern else None
+        self.invalidateFilter()
+
+
+def test_benchmark_search_100k_rows(qtbot):
+    """Typing in the search box of 100k rows, every keystroke filters all the rows again."""
+    # Import local modules
+    from dayu_widgets.item_model import MSortFilterModel
+
+    header_list = [
+        {"key": "name", "label": "Name", "searchable": True},
+        {"key": "path", "label": "Path", "searchable": True},
+        {"key": "frame", "label": "Frame"},
+    ]
+    source_model = MTableModel()
+    source_model.set_header_list(header_list)
+    source_model.set_data_list(
+        [
+            {"name": "shot_{:06d}".format(i), "path": "/proj/seq_{}/shot_{}".format(i % 97, i), "frame": i}
+            for i in range(100000)
+        ]
+    )
+    time_dict = {}
+    for model_cls in (_LegacySortFilterModel, MSortFilterModel):
+        model = model_cls()
+        model.set_header_list(header_list)
+        model.setSourceModel(source_model)
+        model.rowCount()
+        time_list = []
+        for pattern in ("s", "sh", "sho", "shot_0001", "shot_00012"):
+            start = time.perf_counter()
+            model.set_search_pattern(pattern)
+            model.rowCount()
+            time_list.append(time.perf_counter() - start)
+        assert model.rowCount() == 10
+        time_dict[model_cls] = time_list
+        model.setSourceModel(None)
+    for model_cls, name in ((_LegacySortFilterModel, "filterAcceptsRow with data()"), (MSortFilterModel, "index")):
+        # 第一次输入时要建立搜索索引
+        time_list = time_dict[model_cls]
+        print(
+            "\n100k rows search, {}, first keystroke: {:.1f} ms, each next keystroke: {}".format(
+                name, time_list[0] * 1000, ", ".join("{:.1f} ms".format(t * 1000) for t in time_list[1:])
+            )
+        )
+    assert sum(time_dict[MSortFilterModel][1:]) < sum(time_dict[_LegacySortFilterModel][1:])
+
+
+def test_benchmark_async_search_500k_rows(qtbot):
+    """Filter and sort 500k rows in the worker thread, measure how long the GUI thread is blocked."""
+    # Import local modules
+    from dayu_widgets.item_model import MSortFilterModel
+
+    header_list = [
+        {"key": "name", "label": "Name", "searchable": True},
+        {"key": "frame", "label": "Frame"},
+    ]
+    source_model = MTableModel()
+    source_model.set_header_list(header_list)
+    model = MSortFilterModel()
+    model.set_header_list(header_list)
+    model.setSourceModel(source_model)
+    source_model.set_data_list([{"name": "shot_{:06d}".format(i), "frame": i % 1000} for i in range(500000)])
+    model.rowCount()
+    model.set_async(True)
+
+    # the longest gap between two ticks of a 1ms timer is the longest freeze of the GUI
+    gap_list = []
+    last_tick = [time.perf_counter()]
+
+    def _tick():
+        now = time.perf_counter()
+        gap_list.append(now - last_tick[0])
+        last_tick[0] = now
+
+    timer = QtCore.QTimer()
+    timer.timeout.connect(_tick)
+    timer.start(1)
+
+    for pattern in ("shot_00", "shot_001"):
+        start = time.perf_counter()
+        model.set_search_pattern(pattern)
+        call_time = time.perf_counter() - start
+        qtbot.waitUntil(lambda: not model._async_loading, timeout=60000)
+        print(
+            "\n500k rows async search {!r}, call: {:.1f} ms, until applied: {:.1f} ms".format(
+                pattern, call_time * 1000, (time.perf_counter() - start) * 1000
+            )
+        )
+    start = time.perf_counter()
+    model.sort(1, QtCore.Qt.DescendingOrder)
+    qtbot.waitUntil(lambda: not model._async_loading, timeout=60000)
+    print("500k rows async sort, until applied: {:.1f} ms".format((time.perf_counter() - start) * 1000))
+    timer.stop()
+    print("longest GUI freeze: {:.1f} ms".format(max(gap_list) * 1000))
+    assert model.rowCount() == 1000
+    model.set_async(False)
+
+
+def test_benchmark_sort_key_100k_rows(qtbot):
+    """Sort 100k rows by a formatted column, lessThan with data() against extracting the sort keys once."""
+    # Import local modules
+    from dayu_widgets.item_model import MSortFilterModel
+
+    time_dict = {}
+    for sort_key in (None, True):
+        header_list = [
+            {"key": "name", "label": "Name"},
+            {"key": "frame", "label": "Frame", "display": lambda x, y: "{} f".format(x), "sort_key": sort_key},
+        ]
+        source_model = MTableModel()
+        source_model.set_header_list(header_list)
+        model = MSortFilterModel()
+        model.set_header_list(header_list)
+        model.setSourceModel(source_model)
+        source_model.set_data_list(
+            [{"name": "shot_{:06d}".format(i), "frame": (i * 7919) % 100000} for i in range(100000)]
+        )
+        model.rowCount()
+        start = time.perf_counter()
+        model.sort(1, QtCore.Qt.AscendingOrder)
+        model.rowCount()
+        time_dict[sort_key] = time.perf_counter() - start
+        if sort_key:
+            assert model.index(0, 1).data() == "0 f"
+            assert model.index(99999, 1).data() == "99999 f"
+    print(
+        "\n100k rows sort, lessThan: {:.1f} ms, sort_key: {:.1f} ms".format(
+            time_dict[None] * 1000, time_dict[True] * 1000
+        )
+    )
+    assert time_dict[True] < time_dict[None]
@@ -0,0 +1,281 @@
+"""
+Test the thumbnail loading of MBigView.
+"""
+
+# Import built-in modules
+import os
+
+# Import third-party modules
+from qtpy import QtCore
+from qtpy import QtGui
+from qtpy import QtWidgets
+
+# Import local modules
+from dayu_widgets.item_model import MSortFilterModel
+from dayu_widgets.item_model import MTableModel
+from dayu_widgets.item_model import THUMBNAIL_ROLE
+from dayu_widgets.item_view import MBigView
+from dayu_widgets.item_view import MListView
+from dayu_widgets.item_view import MTableView
+from dayu_widgets.item_view import MThumbnailLoader
+from dayu_widgets.item_view import MTreeView
+from dayu_widgets.item_view import _get_sample_row_list
+from dayu_widgets.item_view import get_mip_level
+
+
+def _create_images(tmpdir, count, width=200, height=100):
+    path_list = []
+    for index in range(count):
+        image = QtGui.QImage(width, height, QtGui.QImage.Format_RGB32)
+        image.fill(QtGui.QColor(index % 256, 0, 0))
+        path = str(tmpdir.join("{}.png".format(index)))
+        image.save(path)
+        path_list.append(path)
+    return path_list
+
+
+def test_thumbnail_loader(qtbot, tmpdir):
+    """The thumbnails are scaled, cached by (path, mtime, size), and the failed ones are not loaded again."""
+    path_list = _create_images(tmpdir, 3)
+    loader = MThumbnailLoader()
+    assert loader.get(path_list[0], 64) is None
+    loader.request(path_list[0], 64)
+    loader.request(path_list[1], 32, priority=1)
+    loader.request("not_exists.png", 64)
+    with qtbot.waitSignal(loader.sig_loaded, timeout=5000):
+        pass
+    loader.wait()
+    assert loader.pending_count() == 0
+    assert loader.get(path_list[0], 64).size() == QtCore.QSize(64, 32)
+    assert loader.get(path_list[1], 32).size() == QtCore.QSize(32, 16)
+    assert loader.get(path_list[2], 32) is None
+    assert loader.is_failed("not_exists.png", 64)
+
+    # 缓存超出预算时，丢掉最久没用的
+    loader.get(path_list[0], 64)
+    loader.set_max_bytes(64 * 32 * 4)
+    assert loader.get(path_list[1], 32) is None
+    assert loader.get(path_list[0], 64) is not None
+
+    loader.clear()
+    assert loader.get(path_list[0], 64) is None
+    assert not loader.is_failed("not_exists.png", 64)
+
+
+def test_thumbnail_loader_file_changed(qtbot, tmpdir):
+    """The thumbnails of the file changed since loaded are dropped and loaded again when requested."""
+    path = _create_images(tmpdir, 1)[0]
+    loader = MThumbnailLoader()
+    loader.request(path, 64)
+    loader.request(path, 256)
+    loader.wait()
+    assert loader.get(path, 64).size() == QtCore.QSize(64, 32)
+
+    image = QtGui.QImage(100, 100, QtGui.QImage.Format_RGB32)
+    image.fill(QtGui.QColor(0, 255, 0))
+    image.save(path)
+    mtime = os.path.getmtime(path) + 10
+    os.utime(path, (mtime, mtime))
+    # 没到检查的间隔时还用旧的
+    loader.request(path, 64)
+    assert loader.get(path, 64).size() == QtCore.QSize(64, 32)
+
+    loader.mtime_check_interval = 0.0
+    loader.request(path, 64)
+    assert loader.get(path, 64) is None
+    assert loader.get(path, 256) is None
+    loader.wait()
+    assert loader.get(path, 64).size() == QtCore.QSize(64, 64)
+
+
+def test_thumbnail_mip_level(qtbot, tmpdir):
+    """The thumbnails are loaded at the mip levels, the other sizes are scaled from the nearest level."""
+    assert get_mip_level(100) == 128
+    assert get_mip_level(128) == 128
+    assert get_mip_level(5000) == 1024
+    path = _create_images(tmpdir, 1, 400, 200)[0]
+    loader = MThumbnailLoader()
+    loader.request(path, 100)
+    loader.wait()
+    assert loader.get(path, 128).size() == QtCore.QSize(128, 64)
+
+    # 缩放的过程中快速缩放，不缓存
+    assert loader.get(path, 100, smooth=False).size() == QtCore.QSize(100, 50)
+    assert loader.get(path, 100, smooth=False) is not loader.get(path, 100, smooth=False)
+    # 平滑缩放的结果缓存起来
+    assert loader.get(path, 100).size() == QtCore.QSize(100, 50)
+    assert loader.get(path, 100) is loader.get(path, 100)
+
+    # 没有大的一级时先放大，加载后用大的一级缩小
+    assert loader.get(path, 200).size() == QtCore.QSize(200, 100)
+    assert loader.get(path, 200) is not loader.get(path, 200)
+    loader.request(path, 200)
+    loader.wait()
+    assert loader.get(path, 256).size() == QtCore.QSize(256, 128)
+    assert loader.get(path, 200) is loader.get(path, 200)
+
+
+def test_thumbnail_loader_cancel(qtbot, tmpdir):
+    """The pending loads are cancelled, except the kept ones."""
+    path_list = _create_images(tmpdir, 20, 800, 600)
+    loader = MThumbnailLoader(thread_count=1)
+    for path in path_list:
+        loader.request(path, 64)
+    loader.cancel({(path_list[-1], 64)})
+    loader.wait()
+    assert loader.pending_count() == 0
+    assert loader.get(path_list[-1], 64) is not None
+    loaded_list = [path for path in path_list if loader.get(path, 64) is not None]
+    assert len(loaded_list) < len(path_list)
+    # 被取消的可以再次请求
+    loader.request(path_list[-2], 64)
+    loader.wait()
+    assert loader.get(path_list[-2], 64) is not None
+
+
+def test_fast_layout(qtbot):
+    """The rows have the same height, and the columns are sized by the visible rows only."""
+    model = MTableModel()
+    model.set_header_list([{"key": "name", "label": "Name"}, {"key": "frame", "label": "Frame"}])
+    model.set_data_columns(
+        {"name": ["a"] * 500 + ["a very very very very very long name"] + ["a"] * 500, "frame": list(range(1001))}
+    )
+    for view_cls in (MTableView, MTreeView):
+        view = view_cls()
+        qtbot.addWidget(view)
+        view.setModel(model)
+        view.resize(400, 300)
+        view.show()
+        qtbot.waitExposed(view)
+        view.resizeColumnToContents(0)
+        width = view.columnWidth(0)
+        view.set_fast_layout(True)
+        view.resizeColumnToContents(0)
+        assert view.columnWidth(0) < width
+        view.set_fast_layout(False)
+        assert view.header_view.resizeContentsPrecision() == 1000
+
+    table_view = MTableView()
+    table_view.set_fast_layout(True)
+    assert table_view.verticalHeader().sectionResizeMode(0) == QtWidgets.QHeaderView.Fixed
+    tree_view = MTreeView()
+    tree_view.set_fast_layout(True)
+    assert tree_view.uniformRowHeights()
+    list_view = MListView()
+    list_view.set_fast_layout(True)
+    assert list_view.uniformItemSizes()
+    qtbot.addWidget(table_view)
+    qtbot.addWidget(tree_view)
+    qtbot.addWidget(list_view)
+
+
+def test_auto_width(qtbot):
+    """The auto_width columns fit the sampled rows after the data is loaded, the other columns keep their width."""
+    model = MTableModel()
+    proxy_model = MSortFilterModel()
+    proxy_model.setSourceModel(model)
+    header_list = [
+        {"key": "name", "label": "Name", "width": 50, "auto_width": True},
+        {"key": "frame", "label": "Frame", "width": 80},
+    ]
+    model.set_header_list(header_list)
+    proxy_model.set_header_list(header_list)
+    for view_cls in (MTableView, MTreeView):
+        view = view_cls()
+        qtbot.addWidget(view)
+        view.setModel(proxy_model)
+        view.set_header_list(header_list)
+        model.set_data_list(
+            [{"name": "a very very very very very long name", "frame": 0}]
+            + [{"name": "a", "frame": i} for i in range(1, 1000)]
+        )
+        qtbot.waitUntil(lambda: view.columnWidth(0) > 50)
+        metrics = QtGui.QFontMetrics(view.font())
+        assert view.columnWidth(0) > metrics.horizontalAdvance("a very very very very very long name")
+        assert view.columnWidth(1) == 80
+
+        model.set_data_list([{"name": "a", "frame": i} for i in range(1000)])
+        qtbot.waitUntil(lambda: view.columnWidth(0) < metrics.horizontalAdvance("a very very very very very long name"))
+        width = view.columnWidth(0)
+        view.setColumnWidth(0, 300)
+        view.auto_fit_columns()
+        assert view.columnWidth(0) == width
+
+
+def test_auto_width_streamed(qtbot):
+    """The auto_width columns are fitted again while the rows of an iterator are streamed in."""
+    model = MTableModel()
+    proxy_model = MSortFilterModel()
+    proxy_model.setSourceModel(model)
+    header_list = [{"key": "name", "label": "Name", "width": 50, "auto_width": True}]
+    model.set_header_list(header_list)
+    proxy_model.set_header_list(header_list)
+    model.fetch_count = 100
+    long_name = "a very very very very very long name"
+    for view_cls in (MTableView, MTreeView):
+        view = view_cls()
+        qtbot.addWidget(view)
+        view.setModel(proxy_model)
+        view.set_header_list(header_list)
+        model.set_data_list(iter([{"name": "a"} for _ in range(999)] + [{"name": long_name}]))
+        qtbot.waitUntil(lambda: model.rowCount() == 1000)
+        metrics = QtGui.QFontMetrics(view.font())
+        qtbot.waitUntil(lambda: view.columnWidth(0) > metrics.horizontalAdvance(long_name))
+
+
+def test_auto_width_sample_row_list():
+    """The head and tail rows are always sampled, and the sample is bounded and repeatable."""
+    assert list(_get_sample_row_list(10, 200)) == list(range(10))
+    row_list = _get_sample_row_list(1000000, 200)
+    assert len(row_list) == len(set(row_list)) == 200
+    assert 0 in row_list and 999999 in row_list
+    assert row_list == _get_sample_row_list(1000000, 200)
+
+
+def test_big_view_thumbnail(qtbot, tmpdir):
+    """MBigView shows the placeholder, loads the visible thumbnails in background, and the next screen."""
+    path_list = _create_images(tmpdir, 200)
+    model = MTableModel()
+    model.set_header_list([{"key": "name", "label": "Name", "thumbnail": lambda x, y: y["path"]}])
+    model.set_data_list([{"name": "image {}".format(i), "path": path} for i, path in enumerate(path_list)])
+    proxy_model = MSortFilterModel()
+    proxy_model.setSourceModel(model)
+    view = MBigView()
+    view.setModel(proxy_model)
+    view.setIconSize(QtCore.QSize(64, 64))
+    view.resize(400, 300)
+    qtbot.addWidget(view)
+    assert proxy_model.index(3, 0).data(THUMBNAIL_ROLE) == path_list[3]
+
+    view.show()
+    qtbot.waitExposed(view)
+    placeholder = view.get_thumbnail_placeholder()
+    assert not placeholder.isNull()
+    qtbot.waitUntil(lambda: view.thumbnail_loader.get(path_list[0], 64) is not None, timeout=5000)
+
+    # 加载看得到的 item 和临近的一屏，其他的不加载
+    view._slot_update_thumbnail_request()
+    view.thumbnail_loader.wait()
+    visible_list = [
+        path
+        for row, path in enumerate(path_list)
+        if view.visualRect(proxy_model.index(row, 0)).intersects(view.viewport().rect())
+    ]
+    loaded_list = [path for path in path_list if view.thumbnail_loader.get(path, 64) is not None]
+    assert set(visible_list) < set(loaded_list)
+    assert len(loaded_list) < len(path_list)
+
+    # 滚动到最后，加载最后的 item
+    view.scrollToBottom()
+    qtbot.waitUntil(lambda: view.thumbnail_loader.get(path_list[-1], 64) is not None, timeout=5000)
+
+    # 缩放停下来后才加载新的一级
+    view.scale_size(2.5)
+    assert view.is_zooming()
+    view._slot_update_thumbnail_request()
+    assert view.thumbnail_loader.pending_count() == 0
+    qtbot.waitUntil(lambda: not view.is_zooming(), timeout=2000)
+    # 从大的一级缩小的结果才会缓存
+    loader = view.thumbnail_loader
+    path = path_list[view.indexAt(QtCore.QPoint(20, 20)).row()]
+    qtbot.waitUntil(lambda: loader.get(path, 160) is loader.get(path, 160), timeout=5000)
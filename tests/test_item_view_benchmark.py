@@ -0,0 +1,218 @@
+"""
+Benchmark MBigView and MTableView.
+Run with `pytest tests/test_item_view_benchmark.py -s` to see the result.
+"""
+
+# Import built-in modules
+import array
+import time
+
+# Import third-party modules
+import pytest
+from qtpy import QtGui
+from qtpy import QtWidgets
+
+# Import local modules
+from dayu_widgets.item_model import MTableModel
+from dayu_widgets.item_view import MListView
+from dayu_widgets.item_view import MTableView
+from dayu_widgets.item_view import MThumbnailLoader
+from dayu_widgets.item_view import MTreeView
+
+
+pytestmark = pytest.mark.benchmark
+
+
+def _create_photos(tmpdir, count):
+    path_list = []
+    gradient = QtGui.QLinearGradient(0, 0, 1600, 1200)
+    for index in range(count):
+        image = QtGui.QImage(1600, 1200, QtGui.QImage.Format_RGB32)
+        gradient.setColorAt(0, QtGui.QColor(index % 256, 80, 160))
+        gradient.setColorAt(1, QtGui.QColor(20, index % 256, 60))
+        painter = QtGui.QPainter(image)
+        painter.fillRect(image.rect(), gradient)
+        painter.end()
+        path = str(tmpdir.join("{}.jpg".format(index)))
+        image.save(path, "JPG")
+        path_list.append(path)
+    return path_list
+
+
+def test_benchmark_thumbnail_gui_thread_time(qtbot, tmpdir):
+    """Show 300 photos at 120px, GUI thread time decoding them in paint against the thumbnails loaded in background."""
+    path_list = _create_photos(tmpdir, 300)
+
+    # 之前的实现：icon 配置的 QIcon 在绘制时解码
+    start = time.perf_counter()
+    for path in path_list:
+        QtGui.QIcon(path).pixmap(120, 120)
+    sync_cost = time.perf_counter() - start
+
+    loader = MThumbnailLoader()
+    start = time.perf_counter()
+    for path in path_list:
+        loader.request(path, 120, priority=1)
+    async_cost = time.perf_counter() - start
+    with loader._condition:
+        while loader._pending_dict or loader._running_count:
+            loader._condition.wait(0.05)
+    start = time.perf_counter()
+    loader._slot_collect()
+    async_cost += time.perf_counter() - start
+    assert all(loader.get(path, 120) is not None for path in path_list)
+    print(
+        "\n300 photos, GUI thread time decoded in paint: {:.1f} ms, thumbnails in background: {:.1f} ms".format(
+            sync_cost * 1000, async_cost * 1000
+        )
+    )
+    assert async_cost < sync_cost
+
+
+def test_benchmark_thumbnail_zoom(qtbot, tmpdir):
+    """Zoom 100 visible thumbnails from 130px to 250px in 20 steps, smooth scaled each step against the mip level."""
+    path_list = _create_photos(tmpdir, 100)
+    loader = MThumbnailLoader()
+    for path in path_list:
+        loader.request(path, 256)
+    loader.wait()
+    size_list = list(range(130, 250, 6))
+
+    def zoom(smooth):
+        start = time.perf_counter()
+        for size in size_list:
+            for path in path_list:
+                loader.get(path, size, smooth=smooth)
+        return time.perf_counter() - start
+
+    # 之前的实现：每一步都平滑缩放所有的图
+    smooth_cost = zoom(True)
+    fast_cost = zoom(False)
+    print(
+        "\nzoom 100 thumbnails in 20 steps, smooth scaled: {:.1f} ms, scaled fast from the mip level: {:.1f} ms".format(
+            smooth_cost * 1000, fast_cost * 1000
+        )
+    )
+    assert fast_cost < smooth_cost
+
+
+def _make_columnar_model(row_count):
+    model = MTableModel()
+    model.set_header_list([{"key": "name", "label": "Name"}, {"key": "frame", "label": "Frame"}])
+    model.set_data_columns(
+        {"name": ["shot_{:07d}".format(i) for i in range(row_count)], "frame": array.array("q", range(row_count))}
+    )
+    return model
+
+
+def _show_and_scroll(qtbot, view, model):
+    start = time.perf_counter()
+    view.setModel(model)
+    view.resize(600, 400)
+    view.show()
+    qtbot.waitExposed(view)
+    scroll_bar = view.verticalScrollBar()
+    for step in range(21):
+        scroll_bar.setValue(scroll_bar.maximum() * step // 20)
+        QtWidgets.QApplication.processEvents()
+    if not isinstance(view, MListView):
+        view.resizeColumnToContents(0)
+    cost = time.perf_counter() - start
+    view.close()
+    return cost
+
+
+def test_benchmark_scroll_1m_rows(qtbot):
+    """Show, scroll and size the columns of 1M columnar rows in MTableView, the default against the fast layout."""
+    model = _make_columnar_model(1000000)
+    time_list = []
+    for fast in (False, True):
+        view = MTableView()
+        qtbot.addWidget(view)
+        view.set_fast_layout(fast)
+        time_list.append(_show_and_scroll(qtbot, view, model))
+    print(
+        "\nMTableView 1M rows, default layout: {:.1f} ms, fast layout: {:.1f} ms".format(*[t * 1000 for t in time_list])
+    )
+    assert time_list[1] < time_list[0]
+
+
+def test_benchmark_tree_size_columns_100k_rows(qtbot):
+    """Size the columns of 100k columnar rows in MTreeView after it is shown, the default layout against the fast."""
+    # QTreeView.setModel 不管什么布局都会逐行调用 flags/index/hasChildren，1M 行要 20s，
+    # 所以只用 100k 行，并且只统计显示之后调整列宽的时间
+    tree_model = _make_columnar_model(100000)
+    time_list = []
+    for fast in (False, True):
+        view = MTreeView()
+        qtbot.addWidget(view)
+        view.set_fast_layout(fast)
+        view.setModel(tree_model)
+        view.resize(600, 400)
+        view.show()
+        qtbot.waitExposed(view)
+        start = time.perf_counter()
+        view.resizeColumnToContents(0)
+        time_list.append(time.perf_counter() - start)
+        view.close()
+    print(
+        "\nMTreeView 100k rows, size columns, default layout: {:.1f} ms, fast layout: {:.1f} ms".format(
+            *[t * 1000 for t in time_list]
+        )
+    )
+    assert time_list[1] < time_list[0]
+
+
+def test_benchmark_scroll_list_100k_rows(qtbot):
+    """Show and scroll 100k columnar rows in MListView, the default layout against the fast layout."""
+    # QListView 即使统一了 item 大小，布局时仍会逐行调用两次 index，所以也只用 100k 行比较
+    list_model = _make_columnar_model(100000)
+    time_list = []
+    for fast in (False, True):
+        view = MListView()
+        qtbot.addWidget(view)
+        view.set_fast_layout(fast)
+        time_list.append(_show_and_scroll(qtbot, view, list_model))
+    print(
+        "\nMListView 100k rows, default layout: {:.1f} ms, fast layout: {:.1f} ms".format(
+            *[t * 1000 for t in time_list]
+        )
+    )
+    assert time_list[1] < time_list[0]
+
+
+def test_benchmark_auto_width_1m_rows(qtbot):
+    """Fit the auto_width columns of 1M columnar rows from a bounded sample, against Qt measuring every row."""
+    header_list = [
+        {"key": "name", "label": "Name", "auto_width": True},
+        {"key": "frame", "label": "Frame", "auto_width": True},
+    ]
+    model = _make_columnar_model(1000000)
+    model.set_header_list(header_list)
+    view = MTableView()
+    qtbot.addWidget(view)
+    view.setModel(model)
+    view.set_header_list(header_list)
+    view.auto_fit_columns()
+    start = time.perf_counter()
+    for _ in range(10):
+        view.auto_fit_columns()
+    auto_cost = (time.perf_counter() - start) / 10
+
+    # precision 为 -1 时 Qt 的 resizeColumnsToContents 会计算每一行，太慢，只用 10k 行比较
+    small_model = _make_columnar_model(10000)
+    small_model.set_header_list(header_list)
+    view = MTableView()
+    qtbot.addWidget(view)
+    view.setModel(small_model)
+    view.header_view.setResizeContentsPrecision(-1)
+    start = time.perf_counter()
+    view.resizeColumnsToContents()
+    qt_cost = time.perf_counter() - start
+    print(
+        "\nauto_width 1M rows: {:.1f} ms, resizeColumnsToContents 10k rows: {:.1f} ms".format(
+            auto_cost * 1000, qt_cost * 1000
+        )
+    )
+    assert auto_cost < 0.01
+    assert auto_cost < qt_cost
@@ -0,0 +1,137 @@
+"""
+Test MCacheDict.
+"""
+
+# Import built-in modules
+import os
+
+# Import third-party modules
+import pytest
+from qtpy import QtGui
+
+# Import local modules
+from dayu_widgets.qt import MCacheDict
+
+
+def test_cache_dict_size(qtbot):
+    """The svg is rendered at the requested size, and the size is part of the key."""
+    cache = MCacheDict(QtGui.QPixmap)
+    assert cache("check.svg").width() == MCacheDict.default_size
+    assert cache("check.svg", size=24).size() == QtGui.QPixmap(24, 24).size()
+    assert cache("check.svg", "#ff0000", 24) is not cache("check.svg", size=24)
+    assert cache("app-houdini.png", size=16).height() <= 16
+    assert cache("not_exists.svg").isNull()
+    info = cache.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 4, 4)
+    assert info.curr_bytes == 128 * 128 * 4 + 24 * 24 * 4 * 2 + cache("app-houdini.png", size=16).width() * 16 * 4
+
+
+def test_cache_dict_lru(qtbot):
+    """The least recently used pixmaps are dropped when the byte budget is exceeded."""
+    cache = MCacheDict(QtGui.QPixmap, max_bytes=32 * 32 * 4 * 2)
+    first = cache("check.svg", size=32)
+    cache("minus.svg", size=32)
+    assert cache("check.svg", size=32) is first
+    cache("circle.svg", size=32)
+    info = cache.cache_info()
+    assert info.evictions == 1
+    assert info.currsize == 2
+    assert info.curr_bytes <= info.max_bytes
+    # minus.svg is the least recently used one
+    assert cache("check.svg", size=32) is first
+    assert cache.cache_info().misses == 3
+
+    cache.set_max_bytes(0)
+    assert cache.cache_info().currsize == 1
+    cache.clear()
+    assert cache.cache_info() == (0, 0, 0, 0, 0, 0)
+
+
+def test_cache_dict_disk_cache(qtbot, tmpdir, monkeypatch):
+    """The rendered svg is saved as png, and loaded from the disk cache by a new MCacheDict."""
+    monkeypatch.setattr(MCacheDict, "disk_cache_folder", None)
+    MCacheDict.set_disk_cache_folder(str(tmpdir))
+    origin = MCacheDict(QtGui.QPixmap)("check.svg", "#ff0000", 32)
+    assert len(tmpdir.listdir()) == 1
+
+    def render_fail(*args):
+        raise AssertionError("svg should not be parsed")
+
+    monkeypatch.setattr(MCacheDict._render, "load", render_fail)
+    icon = MCacheDict(QtGui.QIcon)("check.svg", "#ff0000", 32)
+    pix = MCacheDict(QtGui.QPixmap)("check.svg", "#ff0000", 32)
+    assert pix.size() == origin.size()
+    assert pix.toImage() == origin.toImage().convertToFormat(pix.toImage().format())
+    assert not icon.isNull()
+    assert len(tmpdir.listdir()) == 1
+
+    MCacheDict.set_disk_cache_folder(None)
+    with pytest.raises(AssertionError):
+        MCacheDict(QtGui.QPixmap)("check.svg", "#ff0000", 32)
+
+
+def test_cache_dict_atlas(qtbot, tmpdir, monkeypatch):
+    """The svg icons are copied from the atlas, which is saved to and loaded from the disk cache."""
+    monkeypatch.setattr(MCacheDict, "disk_cache_folder", str(tmpdir))
+    monkeypatch.setattr(MCacheDict, "_atlas_dict", {})
+    origin = MCacheDict(QtGui.QPixmap)("check.svg", "#ff0000", 24).toImage()
+    atlas = MCacheDict.load_atlas("#ff0000", 24)
+    assert atlas.width() % 24 == 0
+    assert len(tmpdir.listdir()) == 3  # check.svg 的缓存，图集和索引
+
+    def render_fail(*args):
+        raise AssertionError("svg should not be parsed")
+
+    monkeypatch.setattr(MCacheDict._render, "load", render_fail)
+    pix = MCacheDict(QtGui.QPixmap)("check.svg", "#ff0000", 24)
+    assert pix.size() == origin.size()
+    assert pix.toImage().convertToFormat(origin.format()) == origin
+    assert not MCacheDict(QtGui.QIcon)("minus.svg", "#ff0000", 24).isNull()
+
+    # 新的会话从磁盘读取图集
+    MCacheDict.clear_atlas()
+    monkeypatch.setattr("dayu_widgets.qt.build_icon_atlas", render_fail)
+    assert MCacheDict.load_atlas("#ff0000", 24).toImage() == atlas.toImage()
+    assert MCacheDict(QtGui.QPixmap)("circle.svg", "#ff0000", 24).width() == 24
+
+
+def test_cache_dict_prewarm(qtbot, tmpdir, monkeypatch):
+    """The icons are rendered in a worker thread, and put in the cache before sig_finished."""
+    monkeypatch.setattr(MCacheDict, "disk_cache_folder", str(tmpdir))
+    cache = MCacheDict(QtGui.QPixmap)
+    origin = MCacheDict(QtGui.QPixmap)("check.svg", "#ff0000", 24)
+    prewarmer = cache.prewarm(
+        ["check.svg", "minus.svg", "app-maya.png", "not_exists.svg"], ["#ff0000", "#00ff00"], [24, 32], slice_count=3
+    )
+    with qtbot.waitSignal(prewarmer.sig_finished, timeout=5000):
+        pass
+    assert prewarmer.is_finished()
+    assert cache.cache_info().currsize == 12
+
+    pix = cache("check.svg", "#ff0000", 24)
+    assert pix.toImage().convertToFormat(origin.toImage().format()) == origin.toImage()
+    assert cache("app-maya.png", "#00ff00", 32).height() <= 32
+    assert cache.cache_info().misses == 0
+
+    # 已经在缓存中的不再加载
+    prewarmer = cache.prewarm(["check.svg"], ["#ff0000"], [24])
+    with qtbot.waitSignal(prewarmer.sig_finished, timeout=1000):
+        pass
+    prewarmer = cache.prewarm(["circle.svg"], ["#ff0000"], [24])
+    prewarmer.cancel()
+    assert prewarmer.is_finished()
+    assert cache.cache_info().currsize == 12
+
+
+def test_cache_dict_hit_without_file_system(qtbot, monkeypatch):
+    """The file system is not touched when the icon is in the cache."""
+    cache = MCacheDict(QtGui.QPixmap)
+    pix = cache("check.svg", size=24)
+
+    def fail(*args):
+        raise AssertionError("file system should not be touched")
+
+    monkeypatch.setattr(os.path, "isfile", fail)
+    monkeypatch.setattr(os, "scandir", fail)
+    monkeypatch.setattr(os, "stat", fail)
+    assert cache("check.svg", size=24) is pix
@@ -0,0 +1,144 @@
+"""
+Benchmark loading the icons of the static folder, cold against the disk cache.
+Run with `pytest tests/test_qt_benchmark.py -s` to see the result.
+"""
+
+# Import built-in modules
+import os
+import time
+
+# Import third-party modules
+import pytest
+from qtpy import QtGui
+
+# Import local modules
+from dayu_widgets import DEFAULT_STATIC_FOLDER
+from dayu_widgets.qt import MCacheDict
+
+
+pytestmark = pytest.mark.benchmark
+
+
+def test_benchmark_load_static_icons(qtbot, tmpdir, monkeypatch):
+    """Load every svg of the static folder in a new session, with and without the png disk cache."""
+    svg_list = [name for name in os.listdir(DEFAULT_STATIC_FOLDER) if name.endswith(".svg")]
+
+    def load():
+        start = time.perf_counter()
+        cache = MCacheDict(QtGui.QPixmap)
+        for name in svg_list:
+            cache(name, size=32)
+        return time.perf_counter() - start
+
+    monkeypatch.setattr(MCacheDict, "disk_cache_folder", None)
+    load()
+    cold = min(load() for _ in range(3))
+    MCacheDict.set_disk_cache_folder(str(tmpdir))
+    first = load()
+    warm = min(load() for _ in range(3))
+    print(
+        "\n{} svg icons, no disk cache: {:.1f} ms, writing the cache: {:.1f} ms, warm: {:.1f} ms".format(
+            len(svg_list), cold * 1000, first * 1000, warm * 1000
+        )
+    )
+    assert len(tmpdir.listdir()) == len(svg_list)
+    assert warm < cold
+
+
+def test_benchmark_load_static_icons_atlas(qtbot, tmpdir, monkeypatch):
+    """Warm up every svg of the static folder in a new session, rendered, one cached file per icon, and the atlas."""
+    svg_list = [name for name in os.listdir(DEFAULT_STATIC_FOLDER) if name.endswith(".svg")]
+    monkeypatch.setattr(MCacheDict, "_atlas_dict", {})
+    monkeypatch.setattr(MCacheDict, "disk_cache_folder", None)
+
+    def load(use_atlas):
+        start = time.perf_counter()
+        MCacheDict.clear_atlas()
+        if use_atlas:
+            MCacheDict.load_atlas("#ff0000", 32)
+        cache = MCacheDict(QtGui.QPixmap)
+        for name in svg_list:
+            cache(name, "#ff0000", 32)
+        return time.perf_counter() - start
+
+    load(False)
+    rendered = min(load(False) for _ in range(3))
+    MCacheDict.set_disk_cache_folder(str(tmpdir))
+    load(False)
+    load(True)
+    single = min(load(False) for _ in range(5))
+    atlas = min(load(True) for _ in range(5))
+    print(
+        "\n{} svg icons, rendered: {:.1f} ms, one cached file per icon: {:.1f} ms, atlas: {:.1f} ms".format(
+            len(svg_list), rendered * 1000, single * 1000, atlas * 1000
+        )
+    )
+    assert atlas < rendered
+
+
+def test_benchmark_prewarm_40_icons(qtbot, monkeypatch):
+    """Load 40 svg icons for a menu, on the GUI thread against prewarmed in a worker thread."""
+    svg_list = sorted(name for name in os.listdir(DEFAULT_STATIC_FOLDER) if name.endswith(".svg"))[:40]
+    monkeypatch.setattr(MCacheDict, "disk_cache_folder", None)
+
+    start = time.perf_counter()
+    cache = MCacheDict(QtGui.QPixmap)
+    for name in svg_list:
+        cache(name, size=64)
+    sync_cost = time.perf_counter() - start
+
+    cache = MCacheDict(QtGui.QPixmap)
+    start = time.perf_counter()
+    prewarmer = cache.prewarm(svg_list, size_list=[64])
+    call_cost = time.perf_counter() - start
+    with qtbot.waitSignal(prewarmer.sig_finished, timeout=5000):
+        pass
+    start = time.perf_counter()
+    for name in svg_list:
+        cache(name, size=64)
+    hot_cost = time.perf_counter() - start
+    print(
+        "\n40 svg icons, loaded on the GUI thread: {:.1f} ms, prewarm call: {:.1f} ms, "
+        "got after prewarmed: {:.1f} ms".format(sync_cost * 1000, call_cost * 1000, hot_cost * 1000)
+    )
+    assert cache.cache_info().misses == 0
+    assert hot_cost < sync_cost
+
+
+def test_benchmark_cache_hit_static_file(qtbot, monkeypatch):
+    """Get 79 cached svg icons 100 times, resolving the path on every call against the indexed path cache."""
+    # Import local modules
+    from dayu_widgets import CUSTOM_STATIC_FOLDERS
+    from dayu_widgets import utils
+
+    def get_static_file(path):
+        # 之前的实现：每次都检查所有 static 目录
+        full_path = next(
+            (
+                os.path.join(prefix, path)
+                for prefix in ["", DEFAULT_STATIC_FOLDER] + CUSTOM_STATIC_FOLDERS
+                if os.path.isfile(os.path.join(prefix, path))
+            ),
+            path,
+        )
+        return full_path if os.path.isfile(full_path) else None
+
+    svg_list = [name for name in os.listdir(DEFAULT_STATIC_FOLDER) if name.endswith(".svg")]
+    cache = MCacheDict(QtGui.QPixmap)
+    for name in svg_list:
+        cache(name, size=32)
+
+    def get_all():
+        start = time.perf_counter()
+        for _ in range(100):
+            for name in svg_list:
+                cache(name, size=32)
+        return time.perf_counter() - start
+
+    indexed = get_all()
+    with monkeypatch.context() as patch:
+        patch.setattr(utils, "get_static_file", get_static_file)
+        patch.setattr(utils, "get_static_index_key", lambda: object())
+        resolved = get_all()
+    print("\n7900 cache hits, resolve the path: {:.1f} ms, indexed: {:.1f} ms".format(resolved * 1000, indexed * 1000))
+    assert indexed < resolved
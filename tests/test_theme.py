@@ -0,0 +1,175 @@
+"""
+Test the theme size setting cache.
+"""
+
+# Import local modules
+from dayu_widgets import dayu_theme
+from dayu_widgets import theme
+
+
+def test_theme_size_cache(qtbot, monkeypatch):
+    """The size setting is computed once, and again only after the screen DPI changed."""
+    theme.clear_theme_size_cache()
+    call_list = []
+    scale_factor = [(1.0, 1.0)]
+
+    def fake_get_scale_factor():
+        call_list.append(True)
+        return scale_factor[0]
+
+    monkeypatch.setattr(theme, "get_scale_factor", fake_get_scale_factor)
+    assert dayu_theme.default_size == 32
+    assert dayu_theme.small == 24
+    assert dayu_theme.not_a_size == 0
+    assert len(call_list) == 1
+
+    # the returned dict is a copy
+    size_dict = theme.get_theme_size()
+    size_dict["small"] = 1
+    assert dayu_theme.small == 24
+
+    scale_factor[0] = (2.0, 2.0)
+    assert dayu_theme.small == 24
+    theme.clear_theme_size_cache()
+    assert dayu_theme.small == 48
+    assert len(call_list) == 2
+    theme.clear_theme_size_cache()
+
+
+def test_stylesheet_cache(qtbot):
+    """The stylesheet is rendered once, and again after the theme setting changed."""
+    test_theme = theme.MTheme("light")
+    stylesheet = test_theme.get_stylesheet()
+    assert test_theme.get_stylesheet() is stylesheet
+    assert "@" not in stylesheet
+
+    test_theme.set_primary_color(theme.MTheme.red)
+    new_stylesheet = test_theme.get_stylesheet()
+    assert new_stylesheet is not stylesheet
+    assert test_theme.primary_6 in new_stylesheet
+
+
+def test_deco_inherit_application_stylesheet(qtbot):
+    """The decorated widgets style their children, or inherit the stylesheet applied to the application."""
+    # Import third-party modules
+    from qtpy import QtWidgets
+
+    # Import local modules
+    from dayu_widgets.label import MLabel
+    from dayu_widgets.push_button import MPushButton
+
+    test_theme = theme.MTheme("light", primary_color=theme.MTheme.orange)
+
+    @test_theme.deco
+    class MyWidget(QtWidgets.QWidget):
+        def __init__(self, parent=None):
+            super(MyWidget, self).__init__(parent)
+            self.label = MLabel("x").h1()
+            self.button = MPushButton("x").primary()
+            layout = QtWidgets.QVBoxLayout(self)
+            layout.addWidget(self.label)
+            layout.addWidget(self.button)
+
+    widget = MyWidget()
+    qtbot.addWidget(widget)
+    assert widget.styleSheet() == test_theme.get_stylesheet()
+    widget.label.ensurePolished()
+    widget.button.ensurePolished()
+    assert widget.label.font().pointSize() == test_theme.h1_size
+    assert widget.button.palette().color(widget.button.backgroundRole()).name() == theme.MTheme.orange
+
+    app = QtWidgets.QApplication.instance()
+    old_stylesheet = app.styleSheet()
+    try:
+        test_theme.apply(app)
+        widget = MyWidget()
+        qtbot.addWidget(widget)
+        assert widget.styleSheet() == ""
+    finally:
+        app.setStyleSheet(old_stylesheet)
+        test_theme._application_stylesheet = None
+
+
+def test_widgets_inherit_application_stylesheet(qtbot):
+    """The built-in widgets do not set their own stylesheet once the theme is applied to the application."""
+    # Import third-party modules
+    from qtpy import QtWidgets
+
+    # Import local modules
+    from dayu_widgets.combo_box import MComboBox
+    from dayu_widgets.completer import MCompleter
+    from dayu_widgets.splitter import MSplitter
+
+    app = QtWidgets.QApplication.instance()
+    old_stylesheet = app.styleSheet()
+    old_count = len(dayu_theme._styled_widget_set)
+    try:
+        dayu_theme.apply(app)
+        combo_box = MComboBox()
+        splitter = MSplitter()
+        qtbot.addWidget(combo_box)
+        qtbot.addWidget(splitter)
+        completer = MCompleter()
+        for widget in (combo_box, splitter, completer.popup()):
+            assert widget.styleSheet() == ""
+        assert len(dayu_theme._styled_widget_set) == old_count
+    finally:
+        app.setStyleSheet(old_stylesheet)
+        dayu_theme._application_stylesheet = None
+
+
+def test_switch_theme(qtbot):
+    """switch should restyle the widgets styled by the theme and clear the icon cache."""
+    # Import third-party modules
+    from qtpy import QtWidgets
+
+    # Import local modules
+    from dayu_widgets.qt import MPixmap
+
+    test_theme = theme.MTheme("light")
+    widget = QtWidgets.QWidget()
+    qtbot.addWidget(widget)
+    test_theme.apply(widget)
+    deleted_widget = QtWidgets.QWidget()
+    test_theme.apply(deleted_widget)
+    del deleted_widget
+    assert len(test_theme._styled_widget_set) == 1
+
+    MPixmap("check.svg")
+    assert MPixmap._cache_pix_dict
+    test_theme.switch("dark", theme.MTheme.green)
+    assert not MPixmap._cache_pix_dict
+    assert test_theme.background_color == "#323232"
+    assert test_theme.primary_color == theme.MTheme.green
+    assert widget.styleSheet() == test_theme.get_stylesheet()
+    assert "#323232" in widget.styleSheet()
+
+    # keep the current theme, only change the primary color
+    test_theme.switch(primary_color=theme.MTheme.red)
+    assert test_theme.background_color == "#323232"
+    assert test_theme.primary_color in widget.styleSheet()
+
+
+def test_lazy_init():
+    """MTheme is initialized on first use, the attributes set before are kept."""
+    test_theme = theme.MTheme("light", primary_color=theme.MTheme.green)
+    assert test_theme._init_args is not None
+    assert test_theme.blue == "#1890ff"
+    assert test_theme._init_args is not None
+
+    test_theme.title_color = "#000000"
+    assert test_theme._init_args is None
+    assert test_theme.title_color == "#000000"
+    assert test_theme.primary_color == theme.MTheme.green
+
+    test_theme = theme.MTheme("dark")
+    assert test_theme.background_color == "#323232"
+    assert "#323232" in theme.MTheme("dark").get_stylesheet()
+
+
+def test_get_setting():
+    """get initializes the theme and returns the setting like dict.get."""
+    test_theme = theme.MTheme("light")
+    assert test_theme.get("error_color") == theme.MTheme.red
+    assert test_theme.get("default_color") is None
+    assert test_theme.get("default_color", "#000") == "#000"
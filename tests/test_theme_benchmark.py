@@ -0,0 +1,121 @@
+"""
+Benchmark the theme size setting cache.
+Run with `pytest tests/test_theme_benchmark.py -s` to see the result.
+"""
+
+# Import built-in modules
+import time
+
+# Import third-party modules
+import pytest
+
+# Import local modules
+from dayu_widgets import theme
+from dayu_widgets.push_button import MPushButton
+from dayu_widgets.qt import get_scale_factor
+
+
+pytestmark = pytest.mark.benchmark
+
+
+def _create_buttons(count):
+    start = time.perf_counter()
+    button_list = [MPushButton("button") for _ in range(count)]
+    cost = time.perf_counter() - start
+    for button in button_list:
+        button.deleteLater()
+    return cost
+
+
+def test_benchmark_create_1000_push_buttons(qtbot, monkeypatch):
+    """Create 1000 MPushButton, with the size setting cached against computed on every access."""
+    _create_buttons(10)
+    cached = min(_create_buttons(1000) for _ in range(3))
+    with monkeypatch.context() as patch:
+        # 之前的实现：每次访问尺寸属性都重新查询屏幕并生成尺寸表
+        patch.setattr(theme, "_get_theme_size", lambda: theme._make_theme_size(*get_scale_factor()))
+        uncached = min(_create_buttons(1000) for _ in range(3))
+    print("\n1000 MPushButton, uncached: {:.1f} ms, cached: {:.1f} ms".format(uncached * 1000, cached * 1000))
+    assert cached < uncached
+
+
+def test_benchmark_stylesheet_300_widgets(qtbot):
+    """Style a dialog of 300 buttons, one stylesheet per widget against one inherited from the top level widget."""
+    # Import third-party modules
+    from qtpy import QtWidgets
+
+    # Import local modules
+    from dayu_widgets import dayu_theme
+
+    def build(per_widget):
+        start = time.perf_counter()
+        dialog = QtWidgets.QWidget()
+        layout = QtWidgets.QVBoxLayout(dialog)
+        for _ in range(300):
+            button = MPushButton("button")
+            if per_widget:
+                # 之前的实现：每个控件都重新渲染并设置一份完整的样式表
+                size_dict = theme.get_theme_size()
+                size_dict.update(vars(dayu_theme))
+                button.setStyleSheet(dayu_theme.default_qss.substitute(size_dict))
+            layout.addWidget(button)
+        if not per_widget:
+            dayu_theme.apply(dialog)
+        for button in dialog.findChildren(MPushButton):
+            button.ensurePolished()
+        cost = time.perf_counter() - start
+        dialog.deleteLater()
+        return cost
+
+    build(False)
+    per_widget = build(True)
+    shared = build(False)
+    print("\n300 buttons, stylesheet per widget: {:.1f} ms, shared: {:.1f} ms".format(per_widget * 1000, shared * 1000))
+    assert shared < per_widget
+
+
+def test_benchmark_switch_theme_300_widgets(qtbot):
+    """Switch the theme of a window of 300 buttons, the stylesheet is rendered and applied once."""
+    # Import third-party modules
+    from qtpy import QtWidgets
+
+    test_theme = theme.MTheme("light")
+    window = QtWidgets.QWidget()
+    qtbot.addWidget(window)
+    layout = QtWidgets.QVBoxLayout(window)
+    button_list = [MPushButton("button") for _ in range(300)]
+    for button in button_list:
+        layout.addWidget(button)
+    test_theme.apply(window)
+    window.show()
+    QtWidgets.QApplication.processEvents()
+
+    time_list = []
+    for theme_name in ("dark", "light", "dark"):
+        start = time.perf_counter()
+        test_theme.switch(theme_name)
+        QtWidgets.QApplication.processEvents()
+        time_list.append(time.perf_counter() - start)
+    print("\nswitch theme of 300 buttons: {}".format(", ".join("{:.1f} ms".format(t * 1000) for t in time_list)))
+    assert "#323232" in window.styleSheet()
+
+
+def test_benchmark_create_theme(qtbot):
+    """Create MTheme, with the palettes generated from scratch against cached."""
+    # Import local modules
+    from dayu_widgets import utils
+
+    def create(count, clear):
+        start = time.perf_counter()
+        for _ in range(count):
+            if clear:
+                utils.generate_color_palette.cache_clear()
+                utils.fade_color.cache_clear()
+            # MTheme 在第一次使用时才初始化，读取一个设置让它生成调色板
+            assert theme.MTheme("dark", primary_color=theme.MTheme.orange).primary_color == theme.MTheme.orange
+        return (time.perf_counter() - start) / count
+
+    uncached = create(20, True)
+    cached = create(20, False)
+    print("\ncreate MTheme, uncached palette: {:.2f} ms, cached: {:.2f} ms".format(uncached * 1000, cached * 1000))
+    assert cached < uncached
@@ -39,3 +39,19 @@ COLOR_CONFIG_DICT = {"error": "#f00", "ok": "#0f0", "warning": "#ff0"}
 def test_apply_formatter(formatter, result, args, kwargs):
     """Test for apply_formatter with all situation."""
     assert utils.apply_formatter(formatter, *args, **kwargs) == result
+
+
+@pytest.mark.parametrize(
+    "formatter,args",
+    (
+        (None, ("xiaoming",)),
+        (COLOR_CONFIG_DICT, ("error", 3)),
+        (COLOR_CONFIG_DICT, ("other",)),
+        (lambda x, y: x + y, (1, 2)),
+        ("Show Me", ("xiaoming",)),
+        (100, (1, 2)),
+    ),
+)
+def test_compile_formatter(formatter, args):
+    """compile_formatter should give the same result as apply_formatter."""
+    assert utils.compile_formatter(formatter)(*args) == utils.apply_formatter(formatter, *args)
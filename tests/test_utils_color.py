@@ -74,3 +74,50 @@ def compile_color(color1, color2):
         and (abs(q_color_1.greenF() - q_color_2.greenF()) < delta)
         and (abs(q_color_1.blueF() - q_color_2.blueF()) < delta)
     )
+
+
+@pytest.mark.parametrize("color", ("#f5222d", "#a0d911", "#722ed1", "#ffb7b2", "#888888", "#fff", "#80ff8800", "red"))
+def test_generate_color_palette(color):
+    """The cached palette is the same as generating each step from QColor."""
+    palette = utils.generate_color_palette(color)
+    assert len(palette) == 10
+    assert utils.generate_color_palette(color) is palette
+    q_color = QtGui.QColor(color)
+    for index in range(1, 11):
+        assert utils.generate_color(color, index) == palette[index - 1]
+        assert utils.generate_color(q_color, index) == palette[index - 1]
+
+
+@pytest.mark.parametrize(
+    "color, rgb",
+    (("#ff0000", (255, 0, 0)), ("#AbC", (170, 187, 204)), ("#80102030", (16, 32, 48)), ("blue", (0, 0, 255))),
+)
+def test_get_color_rgb(color, rgb):
+    """Test get_color_rgb."""
+    assert utils.get_color_rgb(color) == rgb
+
+
+def test_rgb_to_hsv_same_as_q_color():
+    """The HSV of the colors is the same as QColor of the installed Qt, also on the rounding boundaries."""
+    rgb_list = [(red, green, blue) for red in range(0, 256, 15) for green in range(0, 256, 15) for blue in (0, 30, 255)]
+    rgb_list.extend(utils.HSV_PROBE_RGB_LIST)
+    for rgb in rgb_list:
+        q_color = QtGui.QColor(*rgb)
+        assert utils._rgb_to_hsv(*rgb) == (q_color.hue(), q_color.saturationF(), q_color.valueF()), rgb
+
+
+def test_hsv_to_name_same_as_q_color():
+    """The color name of the HSV is the same as QColor.fromHsvF of the installed Qt."""
+    hsv_list = [(hue / 359.0, step / 20.0, step / 20.0) for hue in range(0, 360, 7) for step in range(21)]
+    hsv_list.extend(utils.HSV_PROBE_HSV_LIST)
+    for hsv in hsv_list:
+        assert utils._hsv_to_name(*hsv) == QtGui.QColor.fromHsvF(*hsv).name(), hsv
+
+
+@pytest.mark.parametrize("color", ("#1890ff", "#f5222d", "#a0d911", "#faad14", "#09091e", "#888888"))
+def test_generate_color_palette_same_as_q_color(monkeypatch, color):
+    """The palette is the same as the one computed with QColor only."""
+    palette = utils.generate_color_palette(color)
+    monkeypatch.setattr(utils, "_use_python_hsv", lambda: False)
+    hsv = utils._rgb_to_hsv(*utils.get_color_rgb(color))
+    assert palette == tuple(utils._generate_color(hsv, index) for index in range(1, 11))
@@ -89,3 +89,28 @@ def test_with_wrong_type(input_file, error_type):
     exception_msg = exc_info.value.args[0]
     print(exception_msg)
     assert exception_msg == "Input argument 'path' should be str type, but get {}".format(error_type)
+
+
+def test_static_file_index(tmpdir, monkeypatch):
+    """The static folders are listed once, new files are found after rescan or CUSTOM_STATIC_FOLDERS changes."""
+    monkeypatch.setattr(utils, "CUSTOM_STATIC_FOLDERS", [])
+    utils.rescan_static_files()
+    assert utils.get_static_file("check.svg") == os.path.join(DEFAULT_STATIC_FOLDER, "check.svg")
+
+    checked_list = []
+    origin_isfile = os.path.isfile
+    monkeypatch.setattr(os.path, "isfile", lambda p: checked_list.append(p) or origin_isfile(p))
+    assert utils.get_static_file("check.svg") == os.path.join(DEFAULT_STATIC_FOLDER, "check.svg")
+    assert utils.get_static_file("a_not_exists_file") is None
+    # 只检查了相对当前目录的路径
+    assert checked_list == ["check.svg", "a_not_exists_file"]
+
+    utils.CUSTOM_STATIC_FOLDERS.append(str(tmpdir))
+    tmpdir.join("my_icon.svg").ensure()
+    assert utils.get_static_file("my_icon.svg") == os.path.join(str(tmpdir), "my_icon.svg")
+    tmpdir.join("my_new_icon.svg").ensure()
+    assert utils.get_static_file("my_new_icon.svg") is None
+    index_key = utils.get_static_index_key()
+    utils.rescan_static_files()
+    assert utils.get_static_index_key() != index_key
+    assert utils.get_static_file("my_new_icon.svg") == os.path.join(str(tmpdir), "my_new_icon.svg")